@@ -0,0 +1,78 @@
+"""
+Measure event-loop latency while encrypted files are loaded.
+
+A ticker coroutine sleeps for 1 ms in a loop and records how late it wakes
+up, while the loop loads a few large .env bundles either with the blocking
+`load_encrypted_env` or with `aload_encrypted_envs`.
+
+    python benchmarks/bench_async.py
+"""
+
+import os
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+from envcloak.constants import KEY_SIZE
+from envcloak.encryptor import write_encrypted_file
+from envcloak.loader import load_encrypted_env, aload_encrypted_envs
+
+FILES = 3
+VARIABLES = 1_000
+TICK = 0.001
+
+
+async def _ticker(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def _measure(load):
+    lags, stop = [], asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await load()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    return elapsed, max(lags), sum(lags) / len(lags)
+
+
+def main():
+    key = os.urandom(KEY_SIZE)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp = Path(temp_dir)
+        key_file = temp / "mykey.key"
+        key_file.write_bytes(key)
+        paths = []
+        for i in range(FILES):
+            text = "".join(
+                f"LAYER{i}_VAR{j}={os.urandom(16).hex()}\n" for j in range(VARIABLES)
+            )
+            paths.append(temp / f"layer{i}.env.enc")
+            write_encrypted_file(text.encode(), paths[-1], key, "binary", "env")
+
+        async def blocking():
+            for path in paths:
+                load_encrypted_env(path, key_file=key_file)
+
+        async def non_blocking():
+            await aload_encrypted_envs(paths, key_file=key_file)
+
+        print(f"{FILES} files x {VARIABLES} variables")
+        print(f"{'loader':<22} {'load ms':>8} {'max lag ms':>11} {'mean lag ms':>12}")
+        for name, load in (
+            ("load_encrypted_env", blocking),
+            ("aload_encrypted_envs", non_blocking),
+        ):
+            elapsed, worst, mean = asyncio.run(_measure(load))
+            print(
+                f"{name:<22} {elapsed * 1000:8.1f} {worst * 1000:11.1f} {mean * 1000:12.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
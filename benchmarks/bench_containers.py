@@ -0,0 +1,71 @@
+"""
+Compare the legacy JSON format with the binary container.
+
+Reports on-disk size and the time needed to load (parse + decrypt) a file of
+each container for a few payload sizes.
+
+    python benchmarks/bench_containers.py
+"""
+
+import os
+import base64
+import json
+import tempfile
+import timeit
+from pathlib import Path
+from envcloak.constants import KEY_SIZE, CONTAINER_JSON, CONTAINER_BINARY
+from envcloak.encryptor import write_encrypted_file, read_encrypted_file
+from envcloak.container import read_header
+
+SIZES = [1024, 64 * 1024, 1024 * 1024, 16 * 1024 * 1024]
+
+
+def _payload(size: int) -> bytes:
+    line = b"SOME_SECRET_VALUE=0123456789abcdef0123456789abcdef\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+def _best(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def _parse_json(path: Path):
+    with open(path, "rb") as f:
+        document = json.loads(f.read())
+    return base64.b64decode(document["ciphertext"])
+
+
+def _parse_binary(path: Path):
+    with open(path, "rb") as f:
+        data = f.read()
+    return read_header(data), memoryview(data)
+
+
+def main():
+    key = os.urandom(KEY_SIZE)
+    print(
+        f"{'size':>10} {'container':>9} {'bytes':>10} {'overhead':>9} "
+        f"{'parse ms':>9} {'load ms':>9}"
+    )
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size in SIZES:
+            data = _payload(size)
+            number = max(1, (4 * 1024 * 1024) // size)
+            for container, parse in (
+                (CONTAINER_JSON, _parse_json),
+                (CONTAINER_BINARY, _parse_binary),
+            ):
+                path = Path(temp_dir) / f"{size}.{container}.enc"
+                write_encrypted_file(data, path, key, container)
+                on_disk = path.stat().st_size
+                parse_time = _best(lambda: parse(path), number)
+                load_time = _best(lambda: read_encrypted_file(path, key), number)
+                print(
+                    f"{size:>10} {container:>9} {on_disk:>10} "
+                    f"{(on_disk - size) / size:>8.1%} "
+                    f"{parse_time * 1000:>9.3f} {load_time * 1000:>9.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Measure `encrypt --directory --incremental` on a tree of small files.
+
+Times a full first run, a repeat run with nothing changed, a run after one
+file changed, and a run after every file was touched (same content, new
+mtime, as after a fresh checkout).
+
+    python benchmarks/bench_incremental.py
+"""
+
+import os
+import time
+import tempfile
+from pathlib import Path
+from click.testing import CliRunner
+from envcloak.cli import main as cli
+from envcloak.constants import KEY_SIZE
+
+FILES = 10_000
+OLD = time.time_ns() - 3600 * 10**9  # Outside the manifest's racy window
+
+
+def _run(runner, command) -> float:
+    start = time.perf_counter()
+    result = runner.invoke(cli, command)
+    elapsed = time.perf_counter() - start
+    assert result.exit_code == 0, result.output
+    return elapsed
+
+
+def main():
+    runner = CliRunner()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp = Path(temp_dir)
+        source = temp / "configs"
+        for i in range(FILES):
+            path = source / f"team{i % 50}" / f"service{i}.env"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(f"SERVICE_{i}_TOKEN={os.urandom(16).hex()}\n")
+            os.utime(path, ns=(OLD, OLD))
+        key_file = temp / "mykey.key"
+        key_file.write_bytes(os.urandom(KEY_SIZE))
+        command = [
+            "encrypt",
+            "--directory",
+            str(source),
+            "--output",
+            str(temp / "encrypted"),
+            "--key-file",
+            str(key_file),
+            "--incremental",
+        ]
+
+        print(f"{FILES} files")
+        print(f"{'run':<14} {'ms':>9}")
+        print(f"{'first':<14} {_run(runner, command) * 1000:9.1f}")
+        print(f"{'unchanged':<14} {_run(runner, command) * 1000:9.1f}")
+        changed = source / "team0" / "service0.env"
+        changed.write_text("SERVICE_0_TOKEN=rotated\n")
+        os.utime(changed, ns=(OLD + 10**9, OLD + 10**9))
+        print(f"{'one changed':<14} {_run(runner, command) * 1000:9.1f}")
+        for path in source.rglob("*.env"):
+            os.utime(path, ns=(OLD + 2 * 10**9, OLD + 2 * 10**9))
+        print(f"{'all touched':<14} {_run(runner, command) * 1000:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare plain reads with memory-mapped input for file encryption/decryption.
+
+For each payload size the binary container is encrypted and decrypted with
+`use_mmap=False` and `use_mmap=True`. Reports the best wall time and the peak
+Python heap allocation (tracemalloc) of each path.
+
+    python benchmarks/bench_mmap.py
+"""
+
+import os
+import tempfile
+import timeit
+import tracemalloc
+from pathlib import Path
+from envcloak.constants import KEY_SIZE
+from envcloak.encryptor import encrypt_file_binary, decrypt_file
+
+SIZES = [256 * 1024, 4 * 1024 * 1024, 64 * 1024 * 1024]
+
+
+def _best(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def _peak(func) -> int:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    key = os.urandom(KEY_SIZE)
+    print(f"{'size':>10} {'operation':>9} {'path':>5} {'ms':>9} {'peak heap MiB':>14}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp = Path(temp_dir)
+        for size in SIZES:
+            plaintext = temp / f"{size}.env"
+            encrypted = temp / f"{size}.env.enc"
+            decrypted = temp / f"{size}.env.out"
+            plaintext.write_bytes(os.urandom(size))
+            encrypt_file_binary(plaintext, encrypted, key)
+            number = max(1, (32 * 1024 * 1024) // size)
+
+            for use_mmap in (False, True):
+                path = "mmap" if use_mmap else "read"
+                operations = {
+                    "encrypt": lambda: encrypt_file_binary(
+                        plaintext, temp / "tmp.enc", key, use_mmap=use_mmap
+                    ),
+                    "decrypt": lambda: decrypt_file(
+                        encrypted, decrypted, key, use_mmap=use_mmap
+                    ),
+                }
+                for name, operation in operations.items():
+                    elapsed = _best(operation, number)
+                    peak = _peak(operation)
+                    print(
+                        f"{size:>10} {name:>9} {path:>5} "
+                        f"{elapsed * 1000:>9.3f} {peak / 2**20:>14.2f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Compare the records container with the binary container on a large .env
+bundle: reading one variable, changing one variable, and loading it all.
+
+    python benchmarks/bench_records.py
+"""
+
+import os
+import time
+import tempfile
+from pathlib import Path
+from envcloak.constants import KEY_SIZE
+from envcloak.encryptor import write_encrypted_file, read_encrypted_file
+from envcloak.loader import EncryptedEnvLoader
+from envcloak.records import RecordFile, append_records, pack_records
+
+VARIABLES = 5_000
+ROUNDS = 20
+
+
+def _time(func) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    key = os.urandom(KEY_SIZE)
+    entries = {f"SERVICE_{i}_TOKEN": os.urandom(24).hex() for i in range(VARIABLES)}
+    plaintext = "".join(f"{name}={value}\n" for name, value in entries.items())
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp = Path(temp_dir)
+        key_file = temp / "mykey.key"
+        key_file.write_bytes(key)
+        binary = temp / "bundle.env.enc"
+        records = temp / "bundle.records.enc"
+        write_encrypted_file(plaintext.encode(), binary, key, "binary", "env")
+        records.write_bytes(pack_records(entries, key))
+
+        def binary_get():
+            EncryptedEnvLoader(binary, key_file=key_file).load()
+
+        def records_get():
+            with RecordFile(records, key) as f:
+                f.get("SERVICE_42_TOKEN")
+
+        def binary_set():
+            data = read_encrypted_file(binary, key).replace(
+                b"SERVICE_42_TOKEN=", b"SERVICE_42_TOKEN=x", 1
+            )
+            write_encrypted_file(data, binary, key, "binary", "env")
+
+        def records_set():
+            append_records(records, {"SERVICE_42_TOKEN": os.urandom(24).hex()}, key)
+
+        def records_load():
+            EncryptedEnvLoader(records, key_file=key_file).load()
+
+        print(f"{VARIABLES} variables")
+        print(f"{'operation':<12} {'container':<9} {'ms':>8}")
+        print(f"{'get one':<12} {'binary':<9} {_time(binary_get):8.3f}")
+        print(f"{'get one':<12} {'records':<9} {_time(records_get):8.3f}")
+        print(f"{'set one':<12} {'binary':<9} {_time(binary_set):8.3f}")  # No parsing
+        print(f"{'set one':<12} {'records':<9} {_time(records_set):8.3f}")
+        print(f"{'load all':<12} {'binary':<9} {_time(binary_get):8.3f}")
+        print(f"{'load all':<12} {'records':<9} {_time(records_load):8.3f}")
+
+
+if __name__ == "__main__":
+    main()
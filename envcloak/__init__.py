@@ -1,3 +1,56 @@
-from .loader import load_encrypted_env
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ["load_encrypted_env"]
+if TYPE_CHECKING:
+    # For type checkers and linters only; at runtime these stay lazy
+    from envcloak.keys import CloakKey
+    from envcloak.loader import (
+        LayeredEnv,
+        LazyEncryptedEnv,
+        aload_encrypted_env,
+        aload_encrypted_envs,
+        load_encrypted_env,
+        load_encrypted_envs,
+    )
+    from envcloak.preload import preload_encrypted_env, preload_stats
+    from envcloak.watcher import EnvFileWatcher
+
+# Public name -> module defining it. Modules are imported on first access
+# (PEP 562), so `import envcloak` itself imports nothing else.
+_EXPORTS = {
+    "load_encrypted_env": "envcloak.loader",
+    "load_encrypted_envs": "envcloak.loader",
+    "aload_encrypted_env": "envcloak.loader",
+    "aload_encrypted_envs": "envcloak.loader",
+    "LazyEncryptedEnv": "envcloak.loader",
+    "LayeredEnv": "envcloak.loader",
+    "CloakKey": "envcloak.keys",
+    "EnvFileWatcher": "envcloak.watcher",
+    "preload_encrypted_env": "envcloak.preload",
+    "preload_stats": "envcloak.preload",
+}
+
+__all__ = [
+    "load_encrypted_env",
+    "load_encrypted_envs",
+    "aload_encrypted_env",
+    "aload_encrypted_envs",
+    "LazyEncryptedEnv",
+    "LayeredEnv",
+    "CloakKey",
+    "EnvFileWatcher",
+    "preload_encrypted_env",
+    "preload_stats",
+]
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
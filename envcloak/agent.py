@@ -0,0 +1,431 @@
+"""
+Local key agent.
+
+`envcloak agent` keeps keys in memory and serves requests over a Unix
+socket that only its user can connect to. Key files are read once, and
+keys derived from passwords are cached, so PBKDF2 or scrypt runs once per
+file salt instead of once per call. When ENVCLOAK_AGENT_SOCK names the
+socket, the loader and the `encrypt`, `decrypt`, `get` and `run` commands
+send their work to the agent instead of reading keys themselves. If the
+agent cannot be reached, they fall back to doing the work locally.
+
+Protocol: every message is a frame `>I length | body`. A request body is
+`>B opcode` followed by fields, a response body is `>B status` followed by
+fields, and every field is `>I length | bytes`. Requests start with the key
+(kind `k` + key file path, or `p` + password). Paths must be absolute. An
+error response carries the exception's class name, message and details.
+"""
+
+# pylint: disable=import-outside-toplevel
+import os
+import json
+import struct
+import socket
+import hashlib
+import threading
+import socketserver
+from envcloak.constants import AGENT_SOCK_ENV, AGENT_MAX_FRAME_SIZE
+from envcloak import exceptions
+from envcloak.exceptions import (
+    AgentUnavailableException,
+    EncryptedEnvLoaderException,
+    FileDecryptionException,
+    FileEncryptionException,
+)
+
+OP_PING = 0
+OP_LOAD = 1
+OP_DECRYPT = 2
+OP_ENCRYPT = 3
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+KEY_FILE = b"k"
+KEY_PASSWORD = b"p"
+
+_LENGTH = struct.Struct(">I")
+_CODE = struct.Struct(">B")
+
+
+def agent_socket():
+    """
+    :return: Agent socket path from ENVCLOAK_AGENT_SOCK, or None.
+    """
+    return os.environ.get(AGENT_SOCK_ENV) or None
+
+
+def encode_message(code: int, fields) -> bytes:
+    """
+    Frame a request or response.
+    :param code: Opcode or status.
+    :param fields: Iterable of bytes or str fields.
+    :return: Frame bytes.
+    """
+    parts = [_CODE.pack(code)]
+    for field in fields:
+        if isinstance(field, str):
+            field = field.encode("utf-8")
+        parts += [_LENGTH.pack(len(field)), field]
+    body = b"".join(parts)
+    return _LENGTH.pack(len(body)) + body
+
+
+def decode_body(body: bytes):
+    """
+    Split a frame body into its code and fields.
+    :return: (code, list of bytes fields)
+    """
+    if not body:
+        raise ValueError("Empty message.")
+    fields = []
+    offset = _CODE.size
+    while offset < len(body):
+        if offset + _LENGTH.size > len(body):
+            raise ValueError("Truncated field length.")
+        (length,) = _LENGTH.unpack_from(body, offset)
+        offset += _LENGTH.size
+        if offset + length > len(body):
+            raise ValueError("Truncated field.")
+        fields.append(body[offset : offset + length])
+        offset += length
+    return body[0], fields
+
+
+def _read_exact(sock, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise EOFError("Connection closed.")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def read_message(sock):
+    """
+    Read one frame.
+    :return: (code, fields), or None at end of stream.
+    """
+    header = sock.recv(_LENGTH.size, socket.MSG_WAITALL)
+    if not header:
+        return None
+    if len(header) < _LENGTH.size:
+        header += _read_exact(sock, _LENGTH.size - len(header))
+    (length,) = _LENGTH.unpack(header)
+    if length > AGENT_MAX_FRAME_SIZE:
+        raise ValueError(f"Message of {length} bytes exceeds the frame limit.")
+    return decode_body(_read_exact(sock, length))
+
+
+def _key_fields(key_file, password):
+    if key_file is None and password is None:
+        raise EncryptedEnvLoaderException("Provide either a key file or a password.")
+    if key_file is not None and password is not None:
+        raise EncryptedEnvLoaderException(
+            "Provide either a key file or a password, not both."
+        )
+    if password is not None:
+        return [KEY_PASSWORD, password]
+    return [KEY_FILE, os.path.abspath(key_file)]
+
+
+class AgentClient:
+    """
+    Client of a running agent; each call uses its own connection.
+    """
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+
+    def _call(self, op: int, fields, error=EncryptedEnvLoaderException):
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        except (AttributeError, OSError) as e:
+            raise AgentUnavailableException(details=str(e)) from e
+        with sock:
+            try:
+                sock.connect(self.socket_path)
+                sock.sendall(encode_message(op, fields))
+                response = read_message(sock)
+            except (OSError, EOFError, ValueError) as e:
+                # Includes an agent that died or hung up mid-request
+                raise AgentUnavailableException(details=str(e)) from e
+        if response is None:
+            raise AgentUnavailableException(details="The agent closed the connection.")
+        status, fields = response
+        if status == STATUS_OK:
+            return fields
+        name, message, details = (field.decode("utf-8") for field in fields)
+        # Re-raise the agent's exception type when it is one of ours
+        cls = getattr(exceptions, name, None)
+        if not (
+            isinstance(cls, type)
+            and issubclass(
+                cls, (EncryptedEnvLoaderException, exceptions.CryptographyException)
+            )
+        ):
+            cls = error
+        raise cls(message, details or None)
+
+    def ping(self) -> bool:
+        """
+        :return: True if the agent answers.
+        """
+        self._call(OP_PING, [])
+        return True
+
+    def load(self, file_path, key_file=None, password=None) -> dict:
+        """
+        Load and parse an encrypted file in the agent.
+        :return: Dictionary of environment variables.
+        """
+        fields = _key_fields(key_file, password) + [os.path.abspath(file_path)]
+        (data,) = self._call(OP_LOAD, fields)
+        return json.loads(data)
+
+    def decrypt_file(self, input_file, output_file, key_file=None, password=None):
+        """
+        Have the agent decrypt `input_file` into `output_file`.
+        """
+        fields = _key_fields(key_file, password) + [
+            os.path.abspath(input_file),
+            os.path.abspath(output_file),
+        ]
+        self._call(OP_DECRYPT, fields, FileDecryptionException)
+
+    def encrypt_file(
+        self,
+        input_file,
+        output_file,
+        container: str,
+        key_file=None,
+        password=None,
+        kdf=None,
+    ):
+        """
+        Have the agent encrypt `input_file` into `output_file`.
+        :param kdf: KDF for password-protected files (default KDF if None).
+        """
+        fields = _key_fields(key_file, password) + [
+            os.path.abspath(input_file),
+            os.path.abspath(output_file),
+            container,
+            json.dumps(kdf.to_dict()) if kdf is not None else "",
+        ]
+        self._call(OP_ENCRYPT, fields, FileEncryptionException)
+
+
+def default_client():
+    """
+    :return: AgentClient for ENVCLOAK_AGENT_SOCK, or None if it is not set.
+    """
+    path = agent_socket()
+    return AgentClient(path) if path else None
+
+
+class KeyStore:
+    """
+    Keys held by the agent: key file contents by real path, and password
+    keys by password digest and KDF.
+    """
+
+    def __init__(self):
+        self._key_files = {}  # real path -> (stat signature, key bytes)
+        self._passwords = {}  # (digest, kdf json) -> PasswordKey
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signature(path):
+        info = os.stat(path)
+        return (info.st_ino, info.st_size, info.st_mtime_ns)
+
+    def add_key_file(self, path):
+        """
+        Read a key file now; the key stays available if the file is removed.
+        """
+        path = os.path.realpath(path)
+        with open(path, "rb") as kf:
+            key = kf.read()
+        with self._lock:
+            self._key_files[path] = (self._signature(path), key)
+
+    def key_file(self, path) -> bytes:
+        """
+        :return: Contents of a key file, read again only if it changed.
+        """
+        path = os.path.realpath(path)
+        with self._lock:
+            cached = self._key_files.get(path)
+        try:
+            signature = self._signature(path)
+        except FileNotFoundError:
+            if cached is None:
+                raise exceptions.KeyFileNotFoundException(details=path) from None
+            return cached[1]
+        if cached is None or cached[0] != signature:
+            with open(path, "rb") as kf:
+                cached = (signature, kf.read())
+            with self._lock:
+                self._key_files[path] = cached
+        return cached[1]
+
+    def password(self, password: bytes, kdf_json: bytes = b""):
+        """
+        :return: Cached PasswordKey; its derived keys are cached per salt.
+        """
+        from envcloak.kdf import PasswordKey, get_kdf
+
+        cache_key = (hashlib.sha256(password).digest(), kdf_json)
+        with self._lock:
+            key = self._passwords.get(cache_key)
+            if key is None:
+                kdf = None
+                if kdf_json:
+                    params = json.loads(kdf_json)
+                    kdf = get_kdf(params.pop("kdf"), **params)
+                    kdf.check_params()
+                key = self._passwords[cache_key] = PasswordKey(password, kdf)
+        return key
+
+    def resolve(self, kind: bytes, value: bytes, kdf_json: bytes = b""):
+        """
+        :return: Raw key bytes or a PasswordKey for a request's key fields.
+        """
+        if kind == KEY_FILE:
+            return self.key_file(os.fsdecode(value))
+        if kind == KEY_PASSWORD:
+            return self.password(value, kdf_json)
+        raise ValueError(f"Unknown key kind {kind!r}.")
+
+
+def _handle(keys: KeyStore, op: int, fields):
+    """
+    Run one request.
+    :return: Response fields.
+    """
+    from envcloak.loader import EncryptedEnvLoader
+    from envcloak.encryptor import decrypt_file, file_encryptor
+
+    if op == OP_PING:
+        return []
+    kind, value, *args = fields
+    if op == OP_LOAD:
+        (path,) = args
+        option = "key_file" if kind == KEY_FILE else "password"
+        loader = EncryptedEnvLoader(os.fsdecode(path), **{option: os.fsdecode(value)})
+        data = loader.load(keys.resolve(kind, value)).decrypted_data
+        # Only send what JSON represents exactly (no dates, no non-string
+        # keys), so values have the same types as when loaded locally
+        try:
+            encoded = json.dumps(data)
+            exact = json.loads(encoded) == data
+        except (TypeError, ValueError):
+            exact = False
+        if not exact:
+            raise exceptions.AgentUnavailableException(
+                "The agent cannot send the values of this file; load it locally.",
+                os.fsdecode(path),
+            )
+        return [encoded]
+    if op == OP_DECRYPT:
+        input_file, output_file = map(os.fsdecode, args)
+        decrypt_file(input_file, output_file, keys.resolve(kind, value))
+        return []
+    if op == OP_ENCRYPT:
+        input_file, output_file, container, kdf_json = args
+        encrypt_one = file_encryptor(container.decode("utf-8"))
+        key = keys.resolve(kind, value, kdf_json)
+        encrypt_one(os.fsdecode(input_file), os.fsdecode(output_file), key)
+        return []
+    raise ValueError(f"Unknown opcode {op}.")
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        if not self.server.peer_allowed(self.request):
+            return
+        while True:
+            try:
+                message = read_message(self.request)
+            except (OSError, EOFError, ValueError):
+                return
+            if message is None:
+                return
+            try:
+                response = encode_message(
+                    STATUS_OK, _handle(self.server.keys, *message)
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                response = encode_message(
+                    STATUS_ERROR,
+                    [
+                        type(e).__name__,
+                        getattr(e, "message", str(e)),
+                        str(getattr(e, "details", None) or ""),
+                    ],
+                )
+            self.request.sendall(response)
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Agent listening on a Unix socket readable and writable by its owner only.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, keys: KeyStore = None):
+        self.socket_path = os.path.abspath(socket_path)
+        self.keys = keys or KeyStore()
+        if os.path.exists(self.socket_path):
+            try:
+                AgentClient(self.socket_path).ping()
+            except AgentUnavailableException:
+                os.unlink(self.socket_path)  # Left over by a dead agent
+            else:
+                raise OSError(f"An agent is already listening on {self.socket_path}.")
+        umask = os.umask(0o177)
+        try:
+            super().__init__(self.socket_path, _Handler)
+        finally:
+            os.umask(umask)
+        os.chmod(self.socket_path, 0o600)
+
+    def peer_allowed(self, sock) -> bool:
+        """
+        :return: False if the peer runs as another user (where the OS tells).
+        """
+        if not hasattr(socket, "SO_PEERCRED"):
+            return True
+        creds = sock.getsockopt(
+            socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+        )
+        _, uid, _ = struct.unpack("3i", creds)
+        return uid == os.getuid()
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+def default_socket_path() -> str:
+    """
+    :return: `envcloak-agent.sock` in XDG_RUNTIME_DIR, or in a directory
+        private to the user under the temp directory.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "envcloak-agent.sock")
+    import tempfile
+
+    directory = os.path.join(tempfile.gettempdir(), f"envcloak-{os.getuid()}")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise OSError(f"{directory} is not a private directory of this user.")
+    return os.path.join(directory, "agent.sock")
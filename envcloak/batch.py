@@ -0,0 +1,401 @@
+"""
+Batches of encrypt, decrypt and rotate-keys operations run in one process,
+used by `envcloak batch`.
+
+A batch manifest (YAML or JSON) lists the operations. The whole batch is
+checked before anything runs: every operation's fields, inputs, outputs and
+key files, and the disk space needed by all outputs on each filesystem.
+Operations are then grouped into levels: an operation that reads a file
+written by an earlier one (or writes a file an earlier one reads) runs in a
+later level, and the operations within a level run in parallel. Key files
+are read, and password keys derived, once for the whole batch.
+"""
+
+import os
+import json
+from collections import namedtuple
+import yaml
+from envcloak.agent import KeyStore
+from envcloak.encryptor import decrypt_file, file_encryptor, rotate_file
+from envcloak.kdf import get_kdf
+from envcloak.workers import FileJob, run_file_jobs
+from envcloak.validation import check_file_exists, check_disk_space
+from envcloak.exceptions import KeyFileNotFoundException
+from envcloak.constants import (
+    DEFAULT_KDF,
+    CONTAINERS,
+    CONTAINER_JSON,
+    CONTAINER_BINARY,
+    CONTAINER_RECORDS,
+)
+
+OP_ENCRYPT = "encrypt"
+OP_DECRYPT = "decrypt"
+OP_ROTATE_KEYS = "rotate-keys"
+BATCH_OPERATIONS = (OP_ENCRYPT, OP_DECRYPT, OP_ROTATE_KEYS)
+
+# Fields accepted by each operation, besides "op", "input", "output" and
+# "force". Dashes in field names are read as underscores.
+_OPERATION_FIELDS = {
+    OP_ENCRYPT: {"key_file", "password", "container", "kdf", "kdf_params"},
+    OP_DECRYPT: {"key_file", "password"},
+    OP_ROTATE_KEYS: {"old_key_file", "new_key_file"},
+}
+_COMMON_FIELDS = {"op", "input", "output", "force"}
+
+Operation = namedtuple("Operation", ["number", "op", "input", "output", "options"])
+OperationResult = namedtuple("OperationResult", ["operation", "error"])
+
+
+def _normalize(fields: dict) -> dict:
+    return {str(name).replace("-", "_"): value for name, value in fields.items()}
+
+
+def parse_manifest(text: str, password: str = None):
+    """
+    Parse a batch manifest.
+
+    The manifest is either a list of operations or a mapping with an
+    `operations` list, optional `defaults` merged into every operation and
+    an optional `jobs` count. JSON manifests are read as YAML.
+
+    :param text: Manifest contents.
+    :param password: Password for encrypt and decrypt operations that give
+        neither a key file nor a password, e.g. from `--password`.
+    :return: Tuple of (list of `Operation`, jobs or None).
+    :raises ValueError: If the manifest or one of its operations is invalid.
+    """
+    try:
+        data = yaml.safe_load(text)
+    except yaml.YAMLError as e:
+        raise ValueError(f"Invalid batch manifest: {e}") from e
+    if isinstance(data, list):
+        data = {"operations": data}
+    if not isinstance(data, dict) or not isinstance(data.get("operations"), list):
+        raise ValueError(
+            "The batch manifest must be a list of operations or a mapping "
+            "with an 'operations' list."
+        )
+    manifest_defaults = data.get("defaults") or {}
+    if not isinstance(manifest_defaults, dict):
+        raise ValueError("The batch manifest 'defaults' must be a mapping.")
+    jobs = data.get("jobs")
+    if jobs is not None and (not isinstance(jobs, int) or jobs < 1):
+        raise ValueError("The batch manifest 'jobs' must be a positive integer.")
+    manifest_defaults = _normalize(manifest_defaults)
+    operations = [
+        _parse_operation(number, fields, manifest_defaults, password)
+        for number, fields in enumerate(data["operations"], 1)
+    ]
+    return operations, jobs
+
+
+def _parse_operation(number: int, fields, defaults: dict, password=None):
+    if not isinstance(fields, dict):
+        raise ValueError(f"Operation #{number}: expected a mapping of fields.")
+    fields = _normalize(fields)
+    op = fields.get("op")
+    if op not in BATCH_OPERATIONS:
+        raise ValueError(
+            f"Operation #{number}: 'op' must be one of {', '.join(BATCH_OPERATIONS)}."
+        )
+    allowed = _OPERATION_FIELDS[op] | _COMMON_FIELDS
+    unknown = sorted(set(fields) - allowed)
+    if unknown:
+        raise ValueError(f"Operation #{number} ({op}): unknown field(s) {unknown}.")
+    # Defaults only fill in the fields this kind of operation uses
+    fields = {
+        **{k: v for k, v in defaults.items() if k in allowed and k != "op"},
+        **fields,
+    }
+    for name in ("input", "output"):
+        if not isinstance(fields.get(name), str) or not fields[name]:
+            raise ValueError(f"Operation #{number} ({op}): '{name}' is required.")
+    options = {
+        name: value
+        for name, value in fields.items()
+        if name not in ("op", "input", "output")
+    }
+    options["force"] = bool(options.get("force", False))
+    if op != OP_ROTATE_KEYS and not options.get("key_file"):
+        options.setdefault("password", password)
+    error = _check_options(op, options)
+    if error:
+        raise ValueError(f"Operation #{number} ({op}): {error}")
+    return Operation(number, op, fields["input"], fields["output"], options)
+
+
+def _check_options(op: str, options: dict) -> str:
+    """
+    Check the key and container fields of an operation and fill in defaults.
+    :return: Error message, or an empty string.
+    """
+    if op == OP_ROTATE_KEYS:
+        if not options.get("old_key_file") or not options.get("new_key_file"):
+            return "'old_key_file' and 'new_key_file' are required."
+        return ""
+    if options.get("key_file") and options.get("password"):
+        # A manifest default must not clash with an operation's own key
+        return "give either 'key_file' or 'password', not both."
+    if not options.get("key_file") and not options.get("password"):
+        return "'key_file' or 'password' is required."
+    if op == OP_DECRYPT:
+        return ""
+    container = options.get("container")
+    if container is not None and container not in CONTAINERS:
+        return f"'container' must be one of {', '.join(CONTAINERS)}."
+    if options.get("password"):
+        if container not in (None, CONTAINER_BINARY, CONTAINER_RECORDS):
+            return (
+                "'password' is only supported with the binary and records containers."
+            )
+        options["container"] = container or CONTAINER_BINARY
+        try:
+            _kdf(options)
+        except (TypeError, ValueError) as e:
+            return str(e)
+    else:
+        options["container"] = container or CONTAINER_JSON
+    return ""
+
+
+def _kdf(options: dict):
+    """
+    :return: KDF configured by an encrypt operation's `kdf` and `kdf_params`.
+    """
+    params = options.get("kdf_params") or {}
+    if not isinstance(params, dict) or not all(
+        isinstance(value, int) for value in params.values()
+    ):
+        raise ValueError("'kdf_params' must map parameter names to integers.")
+    kdf = get_kdf(options.get("kdf") or DEFAULT_KDF, **params)
+    kdf.check_params()
+    return kdf
+
+
+def _path_key(path: str) -> str:
+    return os.path.realpath(path)
+
+
+def check_batch(operations) -> list:
+    """
+    Check the paths of a whole batch before running it.
+
+    Inputs must exist unless an earlier operation writes them, outputs must
+    not exist unless the operation sets `force`, no two operations may
+    write the same file and no operation may write its own input.
+
+    :param operations: List of `Operation`.
+    :return: List of error messages, empty if the batch can run.
+    """
+    errors = []
+    written = {}  # real output path -> operation number
+    for operation in operations:
+        label = f"Operation #{operation.number} ({operation.op})"
+        source = _path_key(operation.input)
+        target = _path_key(operation.output)
+        if target == source:
+            errors.append(f"{label}: output is the same file as the input.")
+        if target in written:
+            errors.append(
+                f"{label}: output {operation.output} is also written by "
+                f"operation #{written[target]}."
+            )
+        if source not in written:
+            try:
+                check_file_exists(operation.input)
+            except KeyFileNotFoundException as e:
+                errors.append(f"{label}: {e}")
+        if os.path.exists(operation.output) and not operation.options["force"]:
+            errors.append(f"{label}: output already exists: {operation.output}")
+        for name in ("key_file", "old_key_file", "new_key_file"):
+            if operation.options.get(name):
+                try:
+                    check_file_exists(operation.options[name])
+                except KeyFileNotFoundException as e:
+                    errors.append(f"{label}: {e}")
+        written.setdefault(target, operation.number)
+    return errors
+
+
+def required_space(operations) -> dict:
+    """
+    Estimate the disk space the outputs of a batch need, per filesystem.
+
+    An output is assumed to be as large as its input; inputs written by an
+    earlier operation take that operation's estimate.
+
+    :param operations: List of `Operation`.
+    :return: Mapping of a path in an existing directory of each filesystem
+        -> bytes needed by all outputs on that filesystem.
+    """
+    estimates = {}  # real path -> estimated size
+    per_device = {}  # st_dev -> [output path, bytes]
+    for operation in operations:
+        source = _path_key(operation.input)
+        size = estimates.get(source)
+        if size is None:
+            try:
+                size = os.path.getsize(operation.input)
+            except OSError:
+                size = 0
+        estimates[_path_key(operation.output)] = size
+        # Outputs may go to directories that do not exist yet; their space
+        # comes from the nearest existing ancestor's filesystem
+        parent = os.path.dirname(os.path.abspath(operation.output))
+        while not os.path.isdir(parent) and os.path.dirname(parent) != parent:
+            parent = os.path.dirname(parent)
+        try:
+            device = os.stat(parent).st_dev
+        except OSError:
+            continue
+        probe = os.path.join(parent, os.path.basename(operation.output))
+        per_device.setdefault(device, [probe, 0])[1] += size
+    return {path: size for path, size in per_device.values()}
+
+
+def check_batch_disk_space(operations):
+    """
+    Check that every filesystem has room for all the outputs written to it.
+    :raises DiskSpaceException: If one of them does not.
+    """
+    for path, size in required_space(operations).items():
+        check_disk_space(path, size)
+
+
+def plan_levels(operations) -> list:
+    """
+    Group operations into levels that can each run in parallel.
+
+    An operation goes one level after the latest earlier operation it
+    conflicts with: one that writes its input, or reads or writes its
+    output. Otherwise the manifest order is kept.
+
+    :param operations: List of `Operation`.
+    :return: List of levels, each a list of `Operation` in manifest order.
+    """
+    levels = []
+    placed = []  # (real input, real output, level)
+    for operation in operations:
+        source = _path_key(operation.input)
+        target = _path_key(operation.output)
+        level = 0
+        for earlier_source, earlier_target, earlier_level in placed:
+            if earlier_target in (source, target) or earlier_source == target:
+                level = max(level, earlier_level + 1)
+        placed.append((source, target, level))
+        if level == len(levels):
+            levels.append([])
+        levels[level].append(operation)
+    return levels
+
+
+def _key(keys: KeyStore, options: dict, kdf=None):
+    if options.get("key_file"):
+        return keys.key_file(options["key_file"])
+    kdf_json = json.dumps(kdf.to_dict(), sort_keys=True).encode() if kdf else b""
+    return keys.password(str(options["password"]).encode("utf-8"), kdf_json)
+
+
+def run_operation(operation: Operation, keys: KeyStore):
+    """
+    Run one operation, taking its keys from `keys`.
+    """
+    options = operation.options
+    parent = os.path.dirname(operation.output)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    if operation.op == OP_ENCRYPT:
+        kdf = _kdf(options) if options.get("password") else None
+        file_encryptor(options["container"])(
+            operation.input, operation.output, _key(keys, options, kdf)
+        )
+    elif operation.op == OP_DECRYPT:
+        decrypt_file(operation.input, operation.output, _key(keys, options))
+    else:
+        rotate_file(
+            operation.input,
+            operation.output,
+            keys.key_file(options["old_key_file"]),
+            keys.key_file(options["new_key_file"]),
+        )
+
+
+def run_batch(operations, workers: int = None, on_result=None, keys=None):
+    """
+    Run a checked batch level by level, in parallel within each level.
+
+    An operation whose input was to be written by a failed (or skipped)
+    operation is skipped and reported as failed.
+
+    :param operations: List of `Operation`.
+    :param workers: Number of worker threads; see `run_file_jobs`.
+    :param on_result: Optional callable invoked with each `OperationResult`.
+    :param keys: `KeyStore` shared by the operations; a new one by default.
+    :return: List of `OperationResult` in manifest order.
+    """
+    keys = keys or KeyStore()
+    results = []
+    failed_outputs = set()
+
+    def record(operation, error):
+        result = OperationResult(operation, error)
+        results.append(result)
+        if error is not None:
+            failed_outputs.add(_path_key(operation.output))
+        if on_result is not None:
+            on_result(result)
+
+    for level in plan_levels(operations):
+        by_job = {}
+        for operation in level:
+            if _path_key(operation.input) in failed_outputs:
+                record(
+                    operation,
+                    RuntimeError("Skipped: its input was not produced."),
+                )
+                continue
+            try:
+                size = os.path.getsize(operation.input)
+            except OSError:
+                size = 0
+            job = FileJob(operation.input, operation.output, size)
+            by_job[job] = operation
+        run_file_jobs(
+            by_job,
+            lambda job, by_job=by_job: run_operation(by_job[job], keys),
+            workers,
+            lambda result, by_job=by_job: record(by_job[result.job], result.error),
+        )
+    return sorted(results, key=lambda result: result.operation.number)
+
+
+def summarize_batch(results) -> str:
+    """
+    Build the report printed after a batch.
+    :param results: Results returned by `run_batch`.
+    :return: Summary text with per-operation counts and the failures.
+    """
+    failed = [result for result in results if result.error is not None]
+    counts = []
+    for op in BATCH_OPERATIONS:
+        total = sum(1 for result in results if result.operation.op == op)
+        if total:
+            ok = sum(
+                1
+                for result in results
+                if result.operation.op == op and result.error is None
+            )
+            counts.append(f"{op} {ok}/{total}")
+    lines = [
+        f"Completed {len(results) - len(failed)} of {len(results)} operation(s)"
+        + (f" ({', '.join(counts)})." if counts else ".")
+    ]
+    if failed:
+        lines.append(f"{len(failed)} operation(s) failed:")
+        lines.extend(
+            f"  #{result.operation.number} {result.operation.op} "
+            f"{result.operation.input}: {result.error}"
+            for result in failed
+        )
+    return "\n".join(lines)
@@ -1,13 +1,51 @@
+import importlib
 import click
-from envcloak.commands.encrypt import encrypt
-from envcloak.commands.decrypt import decrypt
-from envcloak.commands.generate_key import generate_key
-from envcloak.commands.generate_key_from_password import generate_key_from_password
-from envcloak.commands.rotate_keys import rotate_keys
-from envcloak.commands.compare import compare
 
+# Command name -> "module:attribute". Modules are imported only when their
+# command runs (or for --help), so `envcloak --version` and light commands
+# don't pay for the crypto, parser and diff imports of the others.
+COMMANDS = {
+    "encrypt": "envcloak.commands.encrypt:encrypt",
+    "decrypt": "envcloak.commands.decrypt:decrypt",
+    "generate-key": "envcloak.commands.generate_key:generate_key",
+    "generate-key-from-password": (
+        "envcloak.commands.generate_key_from_password:generate_key_from_password"
+    ),
+    "kdf-calibrate": "envcloak.commands.kdf_calibrate:kdf_calibrate",
+    "rotate-keys": "envcloak.commands.rotate_keys:rotate_keys",
+    "compare": "envcloak.commands.compare:compare",
+    "convert": "envcloak.commands.convert:convert",
+    "get": "envcloak.commands.get:get",
+    "run": "envcloak.commands.run:run",
+    "set": "envcloak.commands.records:set_variable",
+    "unset": "envcloak.commands.records:unset_variable",
+    "compact": "envcloak.commands.records:compact",
+    "agent": "envcloak.commands.agent:agent",
+    "batch": "envcloak.commands.batch:batch",
+}
 
-@click.group()
+
+class LazyGroup(click.Group):
+    """
+    Click group that imports the module of a command when it is dispatched.
+    """
+
+    def __init__(self, *args, lazy_commands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = dict(lazy_commands or {})
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_commands and cmd_name not in self.commands:
+            module_name, attribute = self.lazy_commands[cmd_name].split(":")
+            command = getattr(importlib.import_module(module_name), attribute)
+            self.add_command(command, cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+
+@click.group(cls=LazyGroup, lazy_commands=COMMANDS)
 @click.version_option(prog_name="EnvCloak")
 def main():
     """
@@ -15,14 +53,5 @@ def main():
     """
 
 
-# Add all commands to the main group
-main.add_command(encrypt)
-main.add_command(decrypt)
-main.add_command(generate_key)
-main.add_command(generate_key_from_password)
-main.add_command(rotate_keys)
-main.add_command(compare)
-
-
 if __name__ == "__main__":
     main()
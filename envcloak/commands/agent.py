@@ -0,0 +1,60 @@
+import signal
+import sys
+import click
+from envcloak.utils import debug_log
+from envcloak.decorators.common_decorators import debug_option
+from envcloak.validation import check_file_exists, check_permissions
+from envcloak.agent import AgentServer, KeyStore, default_socket_path
+from envcloak.constants import AGENT_SOCK_ENV
+
+
+@click.command()
+@debug_option
+@click.option(
+    "--socket",
+    "-s",
+    "socket_path",
+    required=False,
+    help="Path of the Unix socket (default: envcloak-agent.sock in "
+    "XDG_RUNTIME_DIR, or a private directory in the temp directory).",
+)
+@click.option(
+    "--key-file",
+    "-k",
+    "key_files",
+    multiple=True,
+    help="Key file to load at startup (repeatable); other key files are "
+    "read on first use.",
+)
+def agent(socket_path, key_files, debug):
+    """
+    Run a key agent that serves encrypt, decrypt and load requests.
+
+    Keys stay in the agent's memory, and keys derived from passwords are
+    cached. Export the printed ENVCLOAK_AGENT_SOCK setting so that the CLI
+    and the loader use the agent. Stop it with Ctrl-C or SIGTERM.
+    """
+    debug_log("Debug mode is enabled", debug)
+    keys = KeyStore()
+    for key_file in key_files:
+        debug_log(f"Debug: Loading key file {key_file}.", debug)
+        check_file_exists(key_file)
+        check_permissions(key_file)
+        keys.add_key_file(key_file)
+
+    try:
+        server = AgentServer(socket_path or default_socket_path(), keys)
+    except (OSError, AttributeError) as e:
+        click.echo(f"Error starting the agent: {e}", err=True)
+        click.get_current_context().exit(1)
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    click.echo(f"{AGENT_SOCK_ENV}={server.socket_path}; export {AGENT_SOCK_ENV};")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        debug_log("Debug: Agent stopped.", debug)
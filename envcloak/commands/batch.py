@@ -0,0 +1,95 @@
+import click
+from envcloak.utils import debug_log
+from envcloak.decorators.common_decorators import (
+    debug_option,
+    dry_run_option,
+    force_option,
+    password_option,
+    jobs_option,
+)
+from envcloak.batch import (
+    parse_manifest,
+    check_batch,
+    check_batch_disk_space,
+    plan_levels,
+    run_batch,
+    summarize_batch,
+)
+from envcloak.exceptions import DiskSpaceException
+
+
+@click.command()
+@debug_option
+@dry_run_option
+@force_option
+@password_option
+@jobs_option
+@click.option(
+    "--manifest",
+    "-m",
+    required=True,
+    type=click.File("r", encoding="utf-8"),
+    help="YAML or JSON file listing the operations ('-' reads standard input).",
+)
+def batch(manifest, jobs, password, force, dry_run, debug):
+    """
+    Run a list of encrypt, decrypt and rotate-keys operations in one process.
+
+    The whole batch is checked first, including the disk space needed by
+    all outputs. Key files are read and password keys derived once, and
+    operations that don't depend on each other run in parallel.
+    """
+    debug_log("Debug mode is enabled", debug)
+    ctx = click.get_current_context()
+    try:
+        operations, manifest_jobs = parse_manifest(manifest.read(), password)
+    except ValueError as e:
+        click.echo(f"Error in batch manifest: {e}")
+        ctx.exit(1)
+    if force:
+        for operation in operations:
+            operation.options["force"] = True
+
+    errors = check_batch(operations)
+    if errors:
+        click.echo("Error: the batch cannot run:")
+        for error in errors:
+            click.echo(f"  {error}")
+        ctx.exit(1)
+    try:
+        check_batch_disk_space(operations)
+    except DiskSpaceException as e:
+        click.echo(f"Error: {e}")
+        ctx.exit(1)
+
+    levels = plan_levels(operations)
+    debug_log(
+        f"Debug: {len(operations)} operation(s) in {len(levels)} level(s).", debug
+    )
+    if dry_run:
+        for number, level in enumerate(levels, 1):
+            for operation in level:
+                click.echo(
+                    f"Level {number}: #{operation.number} {operation.op} "
+                    f"{operation.input} -> {operation.output}"
+                )
+        click.echo("Dry-run checks passed successfully.")
+        return
+
+    def report(result):
+        operation = result.operation
+        if result.error is None:
+            click.echo(
+                f"#{operation.number} {operation.op} "
+                f"{operation.input} -> {operation.output}"
+            )
+        else:
+            click.echo(
+                f"Error in #{operation.number} {operation.op} "
+                f"{operation.input}: {result.error}"
+            )
+
+    results = run_batch(operations, jobs or manifest_jobs, report)
+    click.echo(summarize_batch(results))
+    if any(result.error is not None for result in results):
+        ctx.exit(1)
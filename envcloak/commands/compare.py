@@ -5,9 +5,10 @@ from pathlib import Path
 import click
 from click import style
 from envcloak.utils import debug_log
-from envcloak.decorators.common_decorators import debug_option
+from envcloak.decorators.common_decorators import debug_option, walk_options
 from envcloak.validation import check_file_exists, check_directory_exists
 from envcloak.encryptor import decrypt_file
+from envcloak.walker import walk_files
 from envcloak.exceptions import FileDecryptionException
 
 
@@ -40,7 +41,8 @@ from envcloak.exceptions import FileDecryptionException
     help="Path to save the comparison result as a file.",
 )
 @debug_option
-def compare(file1, file2, key1, key2, output, debug):
+@walk_options
+def compare(file1, file2, key1, key2, output, include, exclude, debug):
     """
     Compare two encrypted environment files or directories.
     """
@@ -121,30 +123,26 @@ def compare(file1, file2, key1, key2, output, debug):
                 os.makedirs(file2_decrypted, exist_ok=True)
 
                 file1_files = {
-                    file.name: file
-                    for file in Path(file1).iterdir()
-                    if file.is_file() and file.suffix == ".enc"
+                    entry.relative: entry.path
+                    for entry in walk_files(file1, include, exclude, suffix=".enc")
                 }
                 file2_files = {
-                    file.name: file
-                    for file in Path(file2).iterdir()
-                    if file.is_file() and file.suffix == ".enc"
+                    entry.relative: entry.path
+                    for entry in walk_files(file2, include, exclude, suffix=".enc")
                 }
 
                 diff = []
                 for filename, file1_path in file1_files.items():
-                    file1_dec = os.path.join(
-                        file1_decrypted, filename.replace(".enc", "")
-                    )
+                    file1_dec = os.path.join(file1_decrypted, filename[: -len(".enc")])
                     if filename in file2_files:
                         file2_dec = os.path.join(
-                            file2_decrypted, filename.replace(".enc", "")
+                            file2_decrypted, filename[: -len(".enc")]
                         )
+                        os.makedirs(os.path.dirname(file1_dec), exist_ok=True)
+                        os.makedirs(os.path.dirname(file2_dec), exist_ok=True)
                         try:
-                            decrypt_file(str(file1_path), file1_dec, key1_bytes)
-                            decrypt_file(
-                                str(file2_files[filename]), file2_dec, key2_bytes
-                            )
+                            decrypt_file(file1_path, file1_dec, key1_bytes)
+                            decrypt_file(file2_files[filename], file2_dec, key2_bytes)
                         except FileDecryptionException as e:
                             raise click.ClickException(
                                 f"Decryption failed for {filename}: {e}"
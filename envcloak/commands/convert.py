@@ -0,0 +1,94 @@
+import os
+import click
+from click import style
+from envcloak.utils import debug_log, calculate_required_space
+from envcloak.decorators.common_decorators import (
+    debug_option,
+    dry_run_option,
+    force_option,
+)
+from envcloak.validation import (
+    check_file_exists,
+    check_permissions,
+    check_output_not_exists,
+    check_disk_space,
+)
+from envcloak.encryptor import convert_file
+from envcloak.constants import CONTAINERS
+from envcloak.exceptions import (
+    OutputFileExistsException,
+    DiskSpaceException,
+    FileDecryptionException,
+    FileEncryptionException,
+)
+
+
+@click.command()
+@debug_option
+@dry_run_option
+@force_option
+@click.option(
+    "--input", "-i", required=True, help="Path to the encrypted file to convert."
+)
+@click.option("--output", "-o", required=True, help="Path to save the converted file.")
+@click.option(
+    "--key-file", "-k", required=True, help="Path to the encryption key file."
+)
+@click.option(
+    "--to",
+    "container",
+    type=click.Choice(CONTAINERS),
+    required=True,
+    help="Target container of the converted file.",
+)
+def convert(input, output, key_file, container, dry_run, force, debug):
+    """
+    Convert an encrypted file to another container, keeping the same key.
+    """
+    try:
+        debug_log("Debug mode is enabled", debug)
+
+        # Always perform validation
+        debug_log(f"Debug: Validating input file {input}.", debug)
+        check_file_exists(input)
+        check_permissions(input)
+        debug_log(f"Debug: Validating key file {key_file}.", debug)
+        check_file_exists(key_file)
+        check_permissions(key_file)
+
+        if not force:
+            check_output_not_exists(output)
+        elif os.path.exists(output):
+            click.echo(
+                style(
+                    f"⚠️  Warning: Overwriting existing file {output} (--force used).",
+                    fg="yellow",
+                )
+            )
+
+        required_space = calculate_required_space(input)
+        check_disk_space(output, required_space)
+
+        if dry_run:
+            debug_log("Debug: Dry-run flag set. Skipping actual conversion.", debug)
+            click.echo("Dry-run checks passed successfully.")
+            return
+
+        with open(key_file, "rb") as kf:
+            key = kf.read()
+            debug_log(f"Debug: Key file {key_file} read successfully.", debug)
+
+        debug_log(
+            f"Debug: Converting file {input} -> {output} ({container} container).",
+            debug,
+        )
+        convert_file(input, output, key, container)
+        click.echo(f"File {input} converted -> {output} ({container} container)")
+    except (
+        OutputFileExistsException,
+        DiskSpaceException,
+        FileDecryptionException,
+        FileEncryptionException,
+    ) as e:
+        click.echo(f"Error during conversion: {str(e)}")
+        click.get_current_context().exit(1)
@@ -8,19 +8,29 @@ from envcloak.decorators.common_decorators import (
     debug_option,
     dry_run_option,
     force_option,
+    password_option,
+    jobs_option,
+    walk_options,
+    max_in_flight_option,
 )
 from envcloak.validation import (
     check_file_exists,
     check_directory_exists,
-    check_directory_not_empty,
     check_output_not_exists,
     check_permissions,
     check_disk_space,
+    check_key_options,
+    read_key,
 )
 from envcloak.encryptor import decrypt_file
+from envcloak.agent import default_client
+from envcloak.workers import FileJob, run_file_jobs, summarize
+from envcloak.walker import walk_files
 from envcloak.exceptions import (
+    AgentUnavailableException,
     OutputFileExistsException,
     DiskSpaceException,
+    DirectoryEmptyException,
     FileDecryptionException,
 )
 
@@ -48,9 +58,26 @@ from envcloak.exceptions import (
     help="Path to the output file or directory for decrypted files.",
 )
 @click.option(
-    "--key-file", "-k", required=True, help="Path to the decryption key file."
+    "--key-file", "-k", required=False, help="Path to the decryption key file."
 )
-def decrypt(input, directory, output, key_file, dry_run, force, debug):
+@password_option
+@jobs_option
+@walk_options
+@max_in_flight_option
+def decrypt(
+    input,
+    directory,
+    output,
+    key_file,
+    password,
+    jobs,
+    include,
+    exclude,
+    max_in_flight_mb,
+    dry_run,
+    force,
+    debug,
+):
     """
     Decrypt environment variables from a file or all files in a directory.
     """
@@ -72,10 +99,18 @@ def decrypt(input, directory, output, key_file, dry_run, force, debug):
         if directory:
             debug_log(f"Debug: Validating directory {directory}.", debug)
             check_directory_exists(directory)
-            check_directory_not_empty(directory)
-        debug_log(f"Debug: Validating key file {key_file}.", debug)
-        check_file_exists(key_file)
-        check_permissions(key_file)
+            entries = walk_files(
+                directory,
+                include,
+                exclude,
+                suffix=".enc",  # Only decrypt .enc files
+                skip=output,
+            )
+            if not entries:
+                raise DirectoryEmptyException(
+                    details=f"No files to decrypt in: {directory}"
+                )
+        check_key_options(key_file, password, debug)
 
         # Handle overwrite with --force
         debug_log("Debug: Handling overwrite logic with force flag.", debug)
@@ -104,7 +139,11 @@ def decrypt(input, directory, output, key_file, dry_run, force, debug):
             f"Debug: Calculating required space for input {input} or directory {directory}.",
             debug,
         )
-        required_space = calculate_required_space(input, directory)
+        required_space = (
+            sum(entry.size for entry in entries)
+            if directory
+            else calculate_required_space(input)
+        )
         check_disk_space(output, required_space)
 
         if dry_run:
@@ -113,19 +152,27 @@ def decrypt(input, directory, output, key_file, dry_run, force, debug):
             return
 
         # Actual decryption logic
-        with open(key_file, "rb") as kf:
-            key = kf.read()
-            debug_log(f"Debug: Key file {key_file} read successfully.", debug)
+        agent = default_client() if input else None
+        if agent is not None:
+            try:
+                agent.decrypt_file(input, output, key_file=key_file, password=password)
+                click.echo(f"File {input} decrypted -> {output} using the agent")
+                return
+            except AgentUnavailableException as e:
+                debug_log(f"Debug: {e.message} Decrypting locally.", debug)
+
+        # KDF and salt come from each file's header; repeats hit the cache
+        key = read_key(key_file, password, debug)
+        key_source = "password" if password else f"key {key_file}"
 
         if input:
             debug_log(
-                f"Debug: Decrypting file {input} -> {output} using key {key_file}.",
+                f"Debug: Decrypting file {input} -> {output} using {key_source}.",
                 debug,
             )
             decrypt_file(input, output, key)
-            click.echo(f"File {input} decrypted -> {output} using key {key_file}")
+            click.echo(f"File {input} decrypted -> {output} using {key_source}")
         elif directory:
-            input_dir = Path(directory)
             output_dir = Path(output)
             if not output_dir.exists():
                 debug_log(
@@ -134,17 +181,41 @@ def decrypt(input, directory, output, key_file, dry_run, force, debug):
                 )
                 output_dir.mkdir(parents=True)
 
-            for file in input_dir.iterdir():
-                if file.is_file() and file.suffix == ".enc":  # Only decrypt .enc files
-                    output_file = output_dir / file.stem  # Remove .enc from filename
-                    debug_log(
-                        f"Debug: Decrypting file {file} -> {output_file} using key {key_file}.",
-                        debug,
-                    )
-                    decrypt_file(str(file), str(output_file), key)
+            file_jobs = [
+                FileJob(
+                    entry.path,
+                    output_dir / entry.relative[: -len(".enc")],
+                    entry.size,
+                )
+                for entry in entries
+            ]
+
+            def decrypt_job(job):
+                debug_log(
+                    f"Debug: Decrypting file {job.source} -> {job.target} using {key_source}.",
+                    debug,
+                )
+                job.target.parent.mkdir(parents=True, exist_ok=True)
+                decrypt_file(str(job.source), str(job.target), key)
+
+            def report(result):
+                if result.error is None:
                     click.echo(
-                        f"File {file} decrypted -> {output_file} using key {key_file}"
+                        f"File {result.job.source} decrypted -> {result.job.target} using {key_source}"
                     )
+                else:
+                    click.echo(f"Error decrypting {result.job.source}: {result.error}")
+
+            results = run_file_jobs(
+                file_jobs,
+                decrypt_job,
+                jobs,
+                report,
+                max_bytes=max_in_flight_mb * 1024 * 1024,
+            )
+            click.echo(summarize(results, "Decrypted"))
+            if any(result.error is not None for result in results):
+                click.get_current_context().exit(1)
     except (
         OutputFileExistsException,
         DiskSpaceException,
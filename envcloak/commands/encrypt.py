@@ -8,20 +8,53 @@ from envcloak.decorators.common_decorators import (
     debug_option,
     force_option,
     dry_run_option,
+    password_option,
+    kdf_options,
+    jobs_option,
+    walk_options,
 )
 from envcloak.validation import (
     check_file_exists,
     check_directory_exists,
-    check_directory_not_empty,
     check_output_not_exists,
     check_permissions,
     check_disk_space,
+    check_key_options,
+    read_key,
+)
+from envcloak.encryptor import (
+    encrypt_file,
+    encrypt_file_stream,
+    encrypt_file_binary,
+    encrypt_file_records,
+)
+from envcloak.agent import default_client
+from envcloak.kdf import get_kdf, parse_kdf_params
+from envcloak.workers import FileJob, run_file_jobs, summarize
+from envcloak.walker import walk_files
+from envcloak.manifest import (
+    ManifestEntry,
+    manifest_path,
+    file_digest,
+    load_manifest,
+    save_manifest,
+    plan_changes,
+)
+from envcloak.constants import (
+    KEY_SIZE,
+    CONTAINERS,
+    CONTAINER_JSON,
+    CONTAINER_STREAM,
+    CONTAINER_BINARY,
+    CONTAINER_RECORDS,
 )
-from envcloak.encryptor import encrypt_file
 from envcloak.exceptions import (
+    AgentUnavailableException,
     OutputFileExistsException,
     DiskSpaceException,
+    DirectoryEmptyException,
     FileEncryptionException,
+    DecryptionException,
 )
 
 
@@ -45,9 +78,45 @@ from envcloak.exceptions import (
     help="Path to the output file or directory for encrypted files.",
 )
 @click.option(
-    "--key-file", "-k", required=True, help="Path to the encryption key file."
+    "--key-file", "-k", required=False, help="Path to the encryption key file."
+)
+@password_option
+@kdf_options
+@click.option(
+    "--container",
+    type=click.Choice(CONTAINERS),
+    default=None,
+    help="Layout of the encrypted output: 'stream' for large files, "
+    "'binary' for compact files without base64/JSON overhead, "
+    "'records' to seal each variable of a .env file separately. "
+    "Defaults to 'json', or 'binary' with --password.",
 )
-def encrypt(input, directory, output, key_file, dry_run, force, debug):
+@jobs_option
+@walk_options
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="With --directory, only encrypt files that changed since the last "
+    "run and remove outputs of deleted files, using an encrypted manifest "
+    "kept in the output directory.",
+)
+def encrypt(
+    input,
+    directory,
+    output,
+    key_file,
+    password,
+    kdf,
+    kdf_params,
+    container,
+    jobs,
+    include,
+    exclude,
+    incremental,
+    dry_run,
+    force,
+    debug,
+):
     """
     Encrypt environment variables from a file or all files in a directory.
     """
@@ -64,20 +133,45 @@ def encrypt(input, directory, output, key_file, dry_run, force, debug):
                 "You must provide either --input or --directory, not both."
             )
         if input:
+            if incremental:
+                raise click.UsageError("--incremental requires --directory.")
             debug_log(f"Debug: Validating input file {input}.", debug)
             check_file_exists(input)
             check_permissions(input)
         if directory:
             debug_log(f"Debug: Validating directory {directory}.", debug)
             check_directory_exists(directory)
-            check_directory_not_empty(directory)
-        debug_log(f"Debug: Validating key file {key_file}.", debug)
-        check_file_exists(key_file)
-        check_permissions(key_file)
+            entries = walk_files(
+                directory,
+                include,
+                exclude,
+                skip=output,
+            )
+            if not entries:
+                raise DirectoryEmptyException(
+                    details=f"No files to encrypt in: {directory}"
+                )
+        check_key_options(key_file, password, debug)
+        if password:
+            if container not in (None, CONTAINER_BINARY, CONTAINER_RECORDS):
+                raise click.UsageError(
+                    "--password is only supported with the binary and records containers."
+                )
+            container = container or CONTAINER_BINARY
+            try:
+                kdf = get_kdf(kdf, **parse_kdf_params(kdf_params))
+                kdf.check_params()
+            except ValueError as e:
+                raise click.BadParameter(str(e), param_hint="--kdf-param") from e
+        container = container or CONTAINER_JSON
 
         # Handle overwrite with --force
         debug_log("Debug: Handling overwrite logic with force flag.", debug)
-        if not force:
+        if incremental and not force:
+            # Earlier output is what makes incremental runs cheap; keep it
+            if os.path.isfile(output):
+                raise click.UsageError("--incremental requires an output directory.")
+        elif not force:
             check_output_not_exists(output)
         else:
             if os.path.exists(output):
@@ -102,7 +196,11 @@ def encrypt(input, directory, output, key_file, dry_run, force, debug):
             f"Debug: Calculating required space for input {input} and output directory {directory}.",
             debug,
         )
-        required_space = calculate_required_space(input, directory)
+        required_space = (
+            sum(entry.size for entry in entries)
+            if directory
+            else calculate_required_space(input)
+        )
         check_disk_space(output, required_space)
 
         if dry_run:
@@ -114,19 +212,57 @@ def encrypt(input, directory, output, key_file, dry_run, force, debug):
             return
 
         # Actual encryption logic
-        with open(key_file, "rb") as kf:
-            key = kf.read()
-            debug_log(f"Debug: Key file {key_file} read successfully.", debug)
+        agent = default_client() if input else None
+        if agent is not None:
+            try:
+                agent.encrypt_file(
+                    input,
+                    output,
+                    container,
+                    key_file=key_file,
+                    password=password,
+                    kdf=kdf if password else None,
+                )
+                click.echo(f"File {input} encrypted -> {output} using the agent")
+                return
+            except AgentUnavailableException as e:
+                debug_log(f"Debug: {e.message} Encrypting locally.", debug)
+
+        key = read_key(key_file, password, debug, kdf)
+        if password:
+            # One derivation (and salt) shared by every file in this run
+            key.cloak_key()  # Derive before any worker threads need it
+            key_source = f"password ({kdf.name})"
+            debug_log(f"Debug: Deriving key from password with {kdf!r}.", debug)
+        else:
+            key_source = f"key {key_file}"
+            if len(key) != KEY_SIZE:
+                click.echo(
+                    style(
+                        f"⚠️  Warning: {key_file} holds a {len(key) * 8}-bit key; "
+                        "generate a 256-bit one with `envcloak generate-key`.",
+                        fg="yellow",
+                    )
+                )
+
+        if container == CONTAINER_STREAM:
+            encrypt_one = encrypt_file_stream
+        elif container == CONTAINER_BINARY:
+            encrypt_one = encrypt_file_binary
+        elif container == CONTAINER_RECORDS:
+            encrypt_one = encrypt_file_records
+        else:
+            encrypt_one = encrypt_file
+        debug_log(f"Debug: Using the {container} container.", debug)
 
         if input:
             debug_log(
-                f"Debug: Encrypting file {input} -> {output} using key {key_file}.",
+                f"Debug: Encrypting file {input} -> {output} using {key_source}.",
                 debug,
             )
-            encrypt_file(input, output, key)
-            click.echo(f"File {input} encrypted -> {output} using key {key_file}")
+            encrypt_one(input, output, key)
+            click.echo(f"File {input} encrypted -> {output} using {key_source}")
         elif directory:
-            input_dir = Path(directory)
             output_dir = Path(output)
             if not output_dir.exists():
                 debug_log(
@@ -135,17 +271,76 @@ def encrypt(input, directory, output, key_file, dry_run, force, debug):
                 )
                 output_dir.mkdir(parents=True)
 
-            for file in input_dir.iterdir():
-                if file.is_file():  # Skip directories
-                    output_file = output_dir / (file.name + ".enc")
-                    debug_log(
-                        f"Debug: Encrypting file {file} -> {output_file} using key {key_file}.",
-                        debug,
+            def target_for(relative):
+                return output_dir / (relative + ".enc")
+
+            if incremental:
+                manifest_file = manifest_path(output_dir)
+                try:
+                    manifest = load_manifest(manifest_file, key)
+                except DecryptionException as e:
+                    click.echo(
+                        style(
+                            f"⚠️  Warning: Ignoring unreadable manifest {manifest_file} ({e}); "
+                            "encrypting all files.",
+                            fg="yellow",
+                        )
                     )
-                    encrypt_file(str(file), str(output_file), key)
+                    manifest = {}
+                # One listing of the output instead of a stat per file
+                outputs = {
+                    entry.relative[: -len(".enc")]
+                    for entry in walk_files(
+                        output_dir, suffix=".enc", use_ignore_file=False, stat=False
+                    )
+                }
+                entries, unchanged, removed = plan_changes(
+                    entries, manifest, container, outputs
+                )
+                for relative in removed:
+                    target_for(relative).unlink(missing_ok=True)
+                    click.echo(f"File {target_for(relative)} removed (source deleted)")
+                click.echo(f"Skipped {len(unchanged)} unchanged file(s).")
+            digests = {}
+
+            file_jobs = [
+                FileJob(entry.path, target_for(entry.relative), entry.size)
+                for entry in entries
+            ]
+
+            def encrypt_job(job):
+                debug_log(
+                    f"Debug: Encrypting file {job.source} -> {job.target} using {key_source}.",
+                    debug,
+                )
+                job.target.parent.mkdir(parents=True, exist_ok=True)
+                if incremental:
+                    digests[job.source] = file_digest(job.source)
+                encrypt_one(str(job.source), str(job.target), key)
+
+            def report(result):
+                if result.error is None:
                     click.echo(
-                        f"File {file} encrypted -> {output_file} using key {key_file}"
+                        f"File {result.job.source} encrypted -> {result.job.target} using {key_source}"
                     )
+                else:
+                    click.echo(f"Error encrypting {result.job.source}: {result.error}")
+
+            results = run_file_jobs(file_jobs, encrypt_job, jobs, report)
+            if incremental:
+                # Failed files are left out so that the next run retries them
+                updated = dict(unchanged)
+                failed = {r.job.source for r in results if r.error is not None}
+                for entry in entries:
+                    if entry.path not in failed:
+                        updated[entry.relative] = ManifestEntry(
+                            entry.size, entry.mtime_ns, digests[entry.path], container
+                        )
+                if updated != manifest:
+                    save_manifest(manifest_file, updated, key)
+            click.echo(summarize(results, "Encrypted"))
+            if any(result.error is not None for result in results):
+                click.get_current_context().exit(1)
     except (
         OutputFileExistsException,
         DiskSpaceException,
@@ -3,7 +3,13 @@ import click
 from envcloak.validation import check_output_not_exists, check_disk_space, validate_salt
 from envcloak.generator import generate_key_from_password_file
 from envcloak.utils import debug_log, add_to_gitignore
-from envcloak.decorators.common_decorators import debug_option, dry_run_option
+from envcloak.decorators.common_decorators import (
+    debug_option,
+    dry_run_option,
+    kdf_options,
+)
+from envcloak.kdf import get_kdf, parse_kdf_params
+from envcloak.constants import DEFAULT_KDF
 from envcloak.exceptions import (
     OutputFileExistsException,
     DiskSpaceException,
@@ -26,7 +32,10 @@ from envcloak.exceptions import (
 @click.option(
     "--no-gitignore", is_flag=True, help="Skip adding the key file to .gitignore."
 )
-def generate_key_from_password(password, salt, output, no_gitignore, dry_run, debug):
+@kdf_options
+def generate_key_from_password(
+    password, salt, output, no_gitignore, kdf, kdf_params, dry_run, debug
+):
     """
     Derive an encryption key from a password and salt.
     """
@@ -43,6 +52,14 @@ def generate_key_from_password(password, salt, output, no_gitignore, dry_run, de
         if salt:
             debug_log(f"Debug: Validating salt: {salt}.", debug)
             validate_salt(salt)
+        kdf_name = kdf
+        kdf = None  # Default PBKDF2 cost: derive as earlier versions did
+        if kdf_name != DEFAULT_KDF or kdf_params:
+            try:
+                kdf = get_kdf(kdf_name, **parse_kdf_params(kdf_params))
+                kdf.check_params()
+            except ValueError as e:
+                raise click.BadParameter(str(e), param_hint="--kdf-param") from e
 
         if dry_run:
             debug_log("Debug: Dry-run flag set. Skipping actual key derivation.", debug)
@@ -52,7 +69,11 @@ def generate_key_from_password(password, salt, output, no_gitignore, dry_run, de
         # Actual key derivation logic
         debug_log(f"Debug: Deriving key from password for output file {output}.", debug)
         output_path = Path(output)
-        generate_key_from_password_file(password, output_path, salt)
+        if kdf is None:
+            generate_key_from_password_file(password, output_path, salt)
+        else:
+            debug_log(f"Debug: Deriving key with {kdf!r}.", debug)
+            generate_key_from_password_file(password, output_path, salt, kdf)
         if not no_gitignore:
             debug_log(
                 f"Debug: Adding {output_path.name} to .gitignore in parent directory {output_path.parent}.",
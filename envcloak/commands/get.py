@@ -0,0 +1,45 @@
+import click
+from envcloak.utils import debug_log
+from envcloak.decorators.common_decorators import debug_option, password_option
+from envcloak.validation import (
+    check_file_exists,
+    check_key_options,
+    check_permissions,
+)
+from envcloak.loader import LazyEncryptedEnv
+from envcloak.exceptions import EncryptedEnvLoaderException
+
+
+@click.command()
+@debug_option
+@click.argument("name")
+@click.option("--input", "-i", required=True, help="Path to the encrypted file.")
+@click.option(
+    "--key-file", "-k", required=False, help="Path to the decryption key file."
+)
+@password_option
+def get(name, input, key_file, password, debug):
+    """
+    Print the value of one variable from an encrypted file.
+
+    Files encrypted with `--container records` only decrypt that variable;
+    other files are decrypted as a whole.
+    """
+    try:
+        debug_log("Debug mode is enabled", debug)
+
+        check_key_options(key_file, password, debug)
+        debug_log(f"Debug: Validating input file {input}.", debug)
+        check_file_exists(input)
+        check_permissions(input)
+
+        env = LazyEncryptedEnv(input, key_file=key_file, password=password)
+        debug_log(f"Debug: Looking up {name} in {input}.", debug)
+        value = env.get(name)
+        if value is None:
+            click.echo(f"Error: {name} is not set in {input}.", err=True)
+            click.get_current_context().exit(1)
+        click.echo(value)
+    except EncryptedEnvLoaderException as e:
+        click.echo(f"Error reading {input}: {str(e)}", err=True)
+        click.get_current_context().exit(1)
@@ -0,0 +1,50 @@
+import click
+from envcloak.utils import debug_log
+from envcloak.decorators.common_decorators import debug_option
+from envcloak.kdf import KDFS, calibrate
+from envcloak.constants import KDF_CALIBRATION_ROUNDS, KDF_CALIBRATION_TARGET_MS
+
+
+@click.command()
+@debug_option
+@click.option(
+    "--target-ms",
+    type=click.FloatRange(min=1),
+    default=KDF_CALIBRATION_TARGET_MS,
+    show_default=True,
+    help="Desired time for one key derivation, in milliseconds.",
+)
+@click.option(
+    "--kdf",
+    "kdfs",
+    type=click.Choice(list(KDFS)),
+    multiple=True,
+    help="KDF to calibrate (repeatable). Defaults to all of them.",
+)
+@click.option(
+    "--rounds",
+    type=click.IntRange(min=1),
+    default=KDF_CALIBRATION_ROUNDS,
+    show_default=True,
+    help="Derivations timed per candidate; the fastest one counts.",
+)
+def kdf_calibrate(target_ms, kdfs, rounds, debug):
+    """
+    Benchmark the key derivation functions on this machine and recommend
+    parameters that take about --target-ms per derivation.
+    """
+    debug_log("Debug mode is enabled", debug)
+    target = target_ms / 1000
+    for name in kdfs or KDFS:
+        debug_log(f"Debug: Calibrating {name} for {target_ms:g} ms.", debug)
+        kdf, elapsed = calibrate(name, target, rounds)
+        params = " ".join(f"--kdf-param {k}={v}" for k, v in kdf.params.items())
+        click.echo(
+            f"{name:<7} {elapsed * 1000:9.2f} ms  "
+            f"{1 / elapsed:12.1f} derivations/s  --kdf {name} {params}".rstrip()
+        )
+        if kdf.cost_param is None:
+            click.echo(
+                f"        {name} has no cost parameter; use it only for "
+                "high-entropy secrets, not passwords."
+            )
@@ -0,0 +1,133 @@
+import sys
+import click
+from envcloak.utils import debug_log
+from envcloak.decorators.common_decorators import debug_option, password_option
+from envcloak.validation import (
+    check_file_exists,
+    check_key_options,
+    check_permissions,
+    read_key,
+)
+from envcloak.records import (
+    is_records_container,
+    append_records,
+    compact_records,
+)
+from envcloak.constants import RECORDS_MAGIC
+from envcloak.exceptions import (
+    EncryptedEnvLoaderException,
+    CryptographyException,
+)
+
+
+def records_options(func):
+    """
+    Add the input and key options shared by the records commands.
+    """
+    func = password_option(func)
+    func = click.option(
+        "--key-file", "-k", required=False, help="Path to the encryption key file."
+    )(func)
+    return click.option(
+        "--input",
+        "-i",
+        required=True,
+        help="Path to a file encrypted with --container records.",
+    )(func)
+
+
+def _read_key(input, key_file, password, debug):
+    """
+    Validate the options of a records command and read the key.
+    :return: Raw key bytes or a PasswordKey.
+    """
+    check_key_options(key_file, password, debug)
+    debug_log(f"Debug: Validating input file {input}.", debug)
+    check_file_exists(input)
+    check_permissions(input)
+    with open(input, "rb") as f:
+        if not is_records_container(f.read(len(RECORDS_MAGIC))):
+            raise click.UsageError(
+                f"{input} is not a records container; "
+                "convert it with `envcloak convert --to records`."
+            )
+    return read_key(key_file, password, debug)
+
+
+def _apply(input, changes, key, compact_after, debug):
+    debug_log(f"Debug: Appending {len(changes)} change(s) to {input}.", debug)
+    if append_records(input, changes, key, auto_compact=compact_after):
+        click.echo(f"Compacted {input}.")
+
+
+@click.command(name="set")
+@debug_option
+@click.argument("name")
+@click.argument("value", required=False)
+@records_options
+@click.option(
+    "--no-compact",
+    is_flag=True,
+    help="Never compact the file, even if its log has grown large.",
+)
+def set_variable(name, value, input, key_file, password, no_compact, debug):
+    """
+    Set one variable in a records container.
+
+    The new value is appended to the file's log, so only that variable is
+    encrypted. Without VALUE, the value is read from stdin, which keeps it
+    out of the process list and shell history.
+    """
+    try:
+        debug_log("Debug mode is enabled", debug)
+        key = _read_key(input, key_file, password, debug)
+        if value is None:
+            value = sys.stdin.read()
+            value = value[:-1] if value.endswith("\n") else value
+        _apply(input, {name: value}, key, not no_compact, debug)
+        click.echo(f"Set {name} in {input}.")
+    except (EncryptedEnvLoaderException, CryptographyException) as e:
+        click.echo(f"Error updating {input}: {str(e)}", err=True)
+        click.get_current_context().exit(1)
+
+
+@click.command(name="unset")
+@debug_option
+@click.argument("name")
+@records_options
+@click.option(
+    "--no-compact",
+    is_flag=True,
+    help="Never compact the file, even if its log has grown large.",
+)
+def unset_variable(name, input, key_file, password, no_compact, debug):
+    """
+    Remove one variable from a records container.
+    """
+    try:
+        debug_log("Debug mode is enabled", debug)
+        key = _read_key(input, key_file, password, debug)
+        _apply(input, {name: None}, key, not no_compact, debug)
+        click.echo(f"Unset {name} in {input}.")
+    except (EncryptedEnvLoaderException, CryptographyException) as e:
+        click.echo(f"Error updating {input}: {str(e)}", err=True)
+        click.get_current_context().exit(1)
+
+
+@click.command()
+@debug_option
+@records_options
+def compact(input, key_file, password, debug):
+    """
+    Fold the log of a records container into its index.
+
+    Sealed values are copied as they are; only the index is encrypted again.
+    """
+    try:
+        debug_log("Debug mode is enabled", debug)
+        key = _read_key(input, key_file, password, debug)
+        compact_records(input, key)
+        click.echo(f"Compacted {input}.")
+    except (EncryptedEnvLoaderException, CryptographyException) as e:
+        click.echo(f"Error compacting {input}: {str(e)}", err=True)
+        click.get_current_context().exit(1)
@@ -1,17 +1,30 @@
 import os
+from pathlib import Path
 import click
 from envcloak.utils import debug_log
-from envcloak.decorators.common_decorators import debug_option, dry_run_option
+from envcloak.decorators.common_decorators import (
+    debug_option,
+    dry_run_option,
+    force_option,
+    jobs_option,
+    walk_options,
+    max_in_flight_option,
+)
 from envcloak.validation import (
     check_file_exists,
+    check_directory_exists,
     check_permissions,
     check_output_not_exists,
     check_disk_space,
 )
-from envcloak.encryptor import encrypt_file, decrypt_file
+from envcloak.encryptor import rotate_file, can_decrypt
+from envcloak.workers import FileJob, default_jobs, run_file_jobs, summarize
+from envcloak.walker import walk_files
+from envcloak.manifest import manifest_path
 from envcloak.exceptions import (
     OutputFileExistsException,
     DiskSpaceException,
+    DirectoryEmptyException,
     FileDecryptionException,
     FileEncryptionException,
 )
@@ -20,8 +33,15 @@ from envcloak.exceptions import (
 @click.command()
 @debug_option
 @dry_run_option
+@force_option
+@click.option(
+    "--input", "-i", required=False, help="Path to the encrypted file to re-encrypt."
+)
 @click.option(
-    "--input", "-i", required=True, help="Path to the encrypted file to re-encrypt."
+    "--directory",
+    "-d",
+    required=False,
+    help="Directory of encrypted (.enc) files to re-encrypt.",
 )
 @click.option(
     "--old-key-file", "-ok", required=True, help="Path to the old encryption key."
@@ -29,22 +49,83 @@ from envcloak.exceptions import (
 @click.option(
     "--new-key-file", "-nk", required=True, help="Path to the new encryption key."
 )
-@click.option("--output", "-o", required=True, help="Path to the re-encrypted file.")
-def rotate_keys(input, old_key_file, new_key_file, output, dry_run, debug):
+@click.option(
+    "--output",
+    "-o",
+    required=False,
+    help="Path to the re-encrypted file, or directory mirroring --directory. "
+    "Files are replaced in place when omitted.",
+)
+@jobs_option
+@walk_options
+@max_in_flight_option
+def rotate_keys(
+    input,
+    directory,
+    old_key_file,
+    new_key_file,
+    output,
+    jobs,
+    include,
+    exclude,
+    max_in_flight_mb,
+    dry_run,
+    force,
+    debug,
+):
     """
-    Rotate encryption keys by re-encrypting a file with a new key.
+    Rotate encryption keys by re-encrypting files with a new key.
+
+    Files are decrypted and re-encrypted in memory, keeping their container,
+    and each output is replaced atomically. A directory rotation that was
+    interrupted can be run again: files that already decrypt with the new
+    key are skipped. The manifest kept by `encrypt --incremental` is
+    re-encrypted along with the files.
     """
     try:
         debug_log("Debug mode is enabled", debug)
         # Always perform validation
-        check_file_exists(input)
-        check_permissions(input)
+        if not input and not directory:
+            raise click.UsageError("You must provide either --input or --directory.")
+        if input and directory:
+            raise click.UsageError(
+                "You must provide either --input or --directory, not both."
+            )
         check_file_exists(old_key_file)
         check_permissions(old_key_file)
         check_file_exists(new_key_file)
         check_permissions(new_key_file)
-        check_output_not_exists(output)
-        check_disk_space(output, required_space=1024 * 1024)
+        if input:
+            check_file_exists(input)
+            check_permissions(input)
+            if output and not force:
+                check_output_not_exists(output)
+            required_space = os.path.getsize(input)
+        else:
+            check_directory_exists(directory)
+            entries = walk_files(
+                directory, include, exclude, suffix=".enc", skip=output
+            )
+            if not entries:
+                raise DirectoryEmptyException(
+                    details=f"No files to rotate in: {directory}"
+                )
+            # The manifest of `encrypt --incremental` is sealed with the same
+            # key; left behind, it would pin the old key to the tree
+            manifest_file = Path(manifest_path(directory))
+            manifest_size = (
+                manifest_file.stat().st_size if manifest_file.is_file() else 0
+            )
+            if output:
+                # A mirrored tree holds every file once
+                required_space = sum(entry.size for entry in entries) + manifest_size
+            else:
+                # In place, each worker holds one temporary copy at a time
+                sizes = sorted(
+                    [entry.size for entry in entries] + [manifest_size], reverse=True
+                )
+                required_space = sum(sizes[: jobs or default_jobs()])
+        check_disk_space(output or input or directory, required_space)
 
         if dry_run:
             click.echo("Dry-run checks passed successfully.")
@@ -58,24 +139,86 @@ def rotate_keys(input, old_key_file, new_key_file, output, dry_run, debug):
         with open(new_key_file, "rb") as nkf:
             new_key = nkf.read()
 
-        temp_decrypted = f"{output}.tmp"
-        debug_log(
-            f"Debug: Decrypting file {input} to temporary file {temp_decrypted} using old key.",
-            debug,
+        if input:
+            target = output or input
+            debug_log(f"Debug: Re-encrypting {input} -> {target} in memory.", debug)
+            rotate_file(input, target, old_key, new_key, atomic=True)
+            click.echo(f"Keys rotated for {input} -> {target}")
+            return
+
+        file_jobs = [
+            FileJob(
+                entry.path,
+                Path(output) / entry.relative if output else entry.path,
+                entry.size,
+            )
+            for entry in entries
+        ]
+        if manifest_size:
+            file_jobs.append(
+                FileJob(
+                    manifest_file,
+                    Path(manifest_path(output)) if output else manifest_file,
+                    manifest_size,
+                )
+            )
+        already_rotated = set()
+
+        def rotate_job(job):
+            if output:
+                if os.path.exists(job.target):
+                    if can_decrypt(job.target, new_key):
+                        already_rotated.add(job.source)
+                        return
+                    if not force:
+                        raise OutputFileExistsException(
+                            details=f"Output path already exists: {job.target}"
+                        )
+                job.target.parent.mkdir(parents=True, exist_ok=True)
+            debug_log(f"Debug: Re-encrypting {job.source} -> {job.target}.", debug)
+            try:
+                rotate_file(job.source, job.target, old_key, new_key, atomic=True)
+            except FileDecryptionException:
+                # Replaced in place by an earlier, interrupted run
+                if not output and can_decrypt(job.source, new_key):
+                    already_rotated.add(job.source)
+                    return
+                raise
+
+        done = []
+
+        def report(result):
+            done.append(result)
+            progress = f"[{len(done)}/{len(file_jobs)}]"
+            if result.error is not None:
+                click.echo(
+                    f"{progress} Error rotating {result.job.source}: {result.error}"
+                )
+            elif result.job.source in already_rotated:
+                click.echo(f"{progress} Already rotated: {result.job.target}")
+            else:
+                click.echo(
+                    f"{progress} Keys rotated for {result.job.source} -> {result.job.target}"
+                )
+
+        results = run_file_jobs(
+            file_jobs,
+            rotate_job,
+            jobs,
+            report,
+            max_bytes=max_in_flight_mb * 1024 * 1024,
         )
-        decrypt_file(input, temp_decrypted, old_key)
-        debug_log(
-            f"Debug: Encrypting decrypted file {temp_decrypted} to {output} using new key.",
-            debug,
+        click.echo(
+            summarize(
+                results, "Rotated", len(already_rotated), "already under the new key"
+            )
         )
-        encrypt_file(temp_decrypted, output, new_key)
-
-        debug_log(f"Debug: Removing temporary decrypted file {temp_decrypted}.", debug)
-        os.remove(temp_decrypted)  # Clean up temporary file
-        click.echo(f"Keys rotated for {input} -> {output}")
+        if any(result.error is not None for result in results):
+            click.get_current_context().exit(1)
     except (
         OutputFileExistsException,
         DiskSpaceException,
+        DirectoryEmptyException,
         FileDecryptionException,
         FileEncryptionException,
     ) as e:
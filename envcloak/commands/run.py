@@ -0,0 +1,119 @@
+import os
+import sys
+import click
+from envcloak.utils import debug_log
+from envcloak.decorators.common_decorators import debug_option, password_option
+from envcloak.validation import (
+    check_file_exists,
+    check_key_options,
+    check_permissions,
+)
+from envcloak.loader import LayeredEnv, layer_loaders
+from envcloak.constants import MERGE_POLICIES, MERGE_OVERRIDE, MERGE_KEEP
+from envcloak.exceptions import EncryptedEnvLoaderException
+
+
+def build_child_env(values, policy=MERGE_OVERRIDE, parent=None) -> dict:
+    """
+    Build the environment of the child process.
+    :param values: Decrypted variables.
+    :param policy: `override` (decrypted values win), `keep` (the parent's
+        values win) or `replace` (only the decrypted values, no parent env).
+    :param parent: Parent environment (default: os.environ).
+    :return: New environment dict with str values. Variables without a
+        value (None) are left out.
+    :raises ValueError: If a value is a nested mapping or list, which has
+        no environment variable form.
+    """
+    nested = sorted(
+        name for name, value in values.items() if isinstance(value, (dict, list))
+    )
+    if nested:
+        raise ValueError(
+            f"Nested values cannot be passed as environment variables: "
+            f"{', '.join(nested)}"
+        )
+    values = {name: str(value) for name, value in values.items() if value is not None}
+    if policy not in MERGE_POLICIES:
+        raise ValueError(f"Unknown merge policy {policy!r}.")
+    parent = dict(os.environ if parent is None else parent)
+    # The password that opened the file is not the child's business
+    parent.pop("ENVCLOAK_PASSWORD", None)
+    if policy == MERGE_OVERRIDE:
+        return {**parent, **values}
+    if policy == MERGE_KEEP:
+        return {**values, **parent}
+    return values
+
+
+@click.command(context_settings={"allow_interspersed_args": False})
+@debug_option
+@click.option(
+    "--input",
+    "-i",
+    "inputs",
+    required=True,
+    multiple=True,
+    help="Path to an encrypted file; repeat to layer files (later files win).",
+)
+@click.option(
+    "--key-file", "-k", required=False, help="Path to the decryption key file."
+)
+@password_option
+@click.option(
+    "--merge",
+    type=click.Choice(MERGE_POLICIES),
+    default=MERGE_OVERRIDE,
+    show_default=True,
+    help="How to combine the decrypted variables with the current environment: "
+    "override it, keep its values, or replace it entirely.",
+)
+@click.argument("command", nargs=-1, required=True, type=click.UNPROCESSED)
+def run(inputs, key_file, password, merge, command, debug):
+    """
+    Run COMMAND with the variables of encrypted files in its environment.
+
+    The files are decrypted in memory and the command replaces this process
+    (exec), so no plaintext is written and os.environ is never modified:
+
+        envcloak run -i .env.enc -k mykey.key -- ./server --port 8080
+    """
+    try:
+        debug_log("Debug mode is enabled", debug)
+
+        check_key_options(key_file, password, debug)
+        for path in inputs:
+            debug_log(f"Debug: Validating input file {path}.", debug)
+            check_file_exists(path)
+            check_permissions(path)
+
+        env = LayeredEnv(
+            (loader.file_path, loader.load(key).decrypted_data)
+            for loader, key in layer_loaders(inputs, key_file, password)
+        )
+        try:
+            child_env = build_child_env(env, merge)
+        except ValueError as e:
+            click.echo(f"Error loading {', '.join(inputs)}: {str(e)}", err=True)
+            click.get_current_context().exit(1)
+        debug_log(
+            f"Debug: Running {command[0]} with {len(env)} decrypted variable(s) "
+            f"({merge}).",
+            debug,
+        )
+    except EncryptedEnvLoaderException as e:
+        click.echo(f"Error loading {', '.join(inputs)}: {str(e)}", err=True)
+        click.get_current_context().exit(1)
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    try:
+        # Running the user's own argv is the point of this command; it is
+        # exec'd directly, never through a shell
+        os.execvpe(command[0], command, child_env)  # nosec B606
+    except OSError as e:
+        click.echo(f"Error running {command[0]}: {e.strerror}", err=True)
+        # Shell convention: 127 for a missing command, 126 if it can't run
+        click.get_current_context().exit(
+            127 if isinstance(e, FileNotFoundError) else 126
+        )
@@ -2,6 +2,74 @@
 AES_BLOCK_SIZE = 128  # Block size for AES
 NONCE_SIZE = 12  # Recommended size for GCM nonce
 KEY_SIZE = 32  # 256-bit key
+KEY_SIZES = (16, 24, 32)  # Accepted by AES-GCM; new keys are KEY_SIZE
+NONCE_BATCH_SIZE = 1024  # Nonces drawn per os.urandom call in batch APIs
 
 # Key Derivation
 SALT_SIZE = 16  # Salt size for key derivation
+PBKDF2_ITERATIONS = 100000  # Default PBKDF2-HMAC-SHA256 iteration count
+DEFAULT_KDF = "pbkdf2"  # KDF used for password-protected files by default
+KDF_CACHE_SIZE = 32  # Derived keys kept in the in-process LRU
+MAX_KDF_BLOCK_SIZE = 1024  # Upper bound for KDF parameters in a header
+KDF_CALIBRATION_ROUNDS = 3  # Derivations timed per candidate by kdf-calibrate
+KDF_CALIBRATION_TARGET_MS = 100  # Default derivation time for kdf-calibrate
+
+# File input
+MMAP_THRESHOLD = 1024 * 1024  # Inputs at least this large are memory-mapped
+
+# Directory processing
+IGNORE_FILE = ".envcloakignore"  # Exclude patterns read from walked directories
+MANIFEST_FILE = ".envcloak-manifest"  # Written to the output by --incremental
+MANIFEST_VERSION = 1
+MANIFEST_RACY_WINDOW_NS = 2 * 10**9  # Newer mtimes are re-checked by content
+DEFAULT_MAX_IN_FLIGHT_MB = 256  # Encrypted bytes decrypted at once with --jobs
+
+# Streaming container
+STREAM_MAGIC = b"ECLS"  # Marks a chunked streaming container
+STREAM_VERSION = 1
+STREAM_CHUNK_SIZE = 64 * 1024  # Default plaintext bytes sealed per segment
+STREAM_MAX_CHUNK_SIZE = 64 * 1024 * 1024  # Upper bound accepted from headers
+STREAM_NONCE_PREFIX_SIZE = 7  # Random part of every segment nonce
+TAG_SIZE = 16  # GCM authentication tag size
+
+# Binary container
+BINARY_MAGIC = b"ECLB"  # Marks a single-shot binary container
+BINARY_VERSION = 1
+ALGORITHM_AES_256_GCM = 1  # Algorithm identifier stored in the header
+# Plaintext format hints stored in the header (0 means unknown)
+FORMAT_HINTS = {"env": 1, "json": 2, "yaml": 3, "xml": 4}
+FLAG_KDF = 0x01  # Header is followed by a KDF block (password-protected file)
+
+# Records container
+RECORDS_MAGIC = b"ECLR"  # Marks a container of individually sealed entries
+RECORDS_VERSION = 2
+RECORD_HASH_SIZE = 16  # Truncated HMAC-SHA256 of an entry name in the index
+MAX_RECORD_NAME_SIZE = 0xFFFF  # Entry names are stored with a 2-byte length
+RECORDS_COMPACT_MIN_BYTES = 64 * 1024  # Logs smaller than this are not compacted
+
+# Environment merge policies of `envcloak run`
+MERGE_OVERRIDE = "override"  # Decrypted variables override the parent's
+MERGE_KEEP = "keep"  # The parent's variables win; decrypted ones fill the gaps
+MERGE_REPLACE = "replace"  # The child only sees the decrypted variables
+MERGE_POLICIES = (MERGE_OVERRIDE, MERGE_KEEP, MERGE_REPLACE)
+
+# What forked children do with preloaded variables
+PRELOAD_KEEP = "keep"  # Use the inherited values
+PRELOAD_VERIFY = "verify"  # Drop them if the file changed since the preload
+PRELOAD_WIPE = "wipe"  # Clear them
+PRELOAD_POLICIES = (PRELOAD_KEEP, PRELOAD_VERIFY, PRELOAD_WIPE)
+
+# Key agent
+AGENT_SOCK_ENV = "ENVCLOAK_AGENT_SOCK"  # Socket path of a running `envcloak agent`
+AGENT_MAX_FRAME_SIZE = 64 * 1024 * 1024  # Largest message the agent accepts
+
+# Hot reloading
+WATCH_DEBOUNCE_SECONDS = 0.2  # Quiet period after a write before reloading
+WATCH_POLL_INTERVAL = 1.0  # Seconds between stat checks of a watched file
+
+# Encrypted file containers
+CONTAINER_JSON = "json"  # Legacy base64 JSON document
+CONTAINER_STREAM = "stream"  # Chunked streaming container
+CONTAINER_BINARY = "binary"  # Raw binary container with a small header
+CONTAINER_RECORDS = "records"  # One sealed record per variable, with an index
+CONTAINERS = (CONTAINER_JSON, CONTAINER_STREAM, CONTAINER_BINARY, CONTAINER_RECORDS)
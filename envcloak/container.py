@@ -0,0 +1,205 @@
+"""
+Binary container for EnvCloak.
+
+Layout::
+
+    magic (4) | version (1) | algorithm (1) | format hint (1) | flags (1)
+    | nonce (12) | plaintext length (8) | [KDF block] | ciphertext | tag (16)
+
+Compared with the JSON format there is no base64 or JSON parsing on load and
+the file is only `HEADER_SIZE + TAG_SIZE` bytes larger than the plaintext.
+Password-protected files set `FLAG_KDF` and carry a KDF block (see
+`envcloak.kdf`) describing how to derive the key. The whole header, KDF
+block included, is authenticated as associated data.
+"""
+
+import os
+import struct
+from collections import namedtuple
+from envcloak.constants import (
+    NONCE_SIZE,
+    TAG_SIZE,
+    BINARY_MAGIC,
+    BINARY_VERSION,
+    ALGORITHM_AES_256_GCM,
+    FORMAT_HINTS,
+    FLAG_KDF,
+)
+from envcloak.keys import as_cloak_key
+from envcloak.kdf import decode_kdf_block
+from envcloak.exceptions import (
+    InvalidKeyException,
+    EncryptionException,
+    DecryptionException,
+)
+
+_HEADER = struct.Struct(f">4sBBBB{NONCE_SIZE}sQ")
+_HINT_NAMES = {value: name for name, value in FORMAT_HINTS.items()}
+
+HEADER_SIZE = _HEADER.size
+
+ContainerHeader = namedtuple(
+    "ContainerHeader",
+    [
+        "version",
+        "algorithm",
+        "format_hint",
+        "flags",
+        "nonce",
+        "plaintext_length",
+        "kdf",
+        "salt",
+        "size",
+    ],
+)
+
+
+def is_binary_container(prefix: bytes) -> bool:
+    """
+    Check whether the given leading bytes belong to a binary container.
+
+    :param prefix: First bytes of a file (at least the magic length).
+    :return: True if the bytes start with the binary container magic.
+    """
+    return prefix[: len(BINARY_MAGIC)] == BINARY_MAGIC
+
+
+def format_hint_for(file_name) -> str:
+    """
+    Guess the plaintext format hint from a file name.
+
+    :param file_name: Name or path of the plaintext (or encrypted) file.
+    :return: One of the `FORMAT_HINTS` names, or "" if unknown.
+    """
+    name = os.path.basename(str(file_name)).lower()
+    for suffix in (".enc", ".tmp"):
+        name = name.replace(suffix, "")
+    extension = os.path.splitext(name)[1].lstrip(".")
+    if extension == "yml":
+        extension = "yaml"
+    if extension in FORMAT_HINTS:
+        return extension
+    if name.startswith(".env") or extension == "":
+        return "env"
+    return ""
+
+
+def read_header(data) -> ContainerHeader:
+    """
+    Parse and validate the header of a binary container.
+
+    :param data: Container bytes (the full header, KDF block included).
+    :return: Parsed `ContainerHeader`; `format_hint` is a name such as "env",
+        `kdf`/`salt` are set for password-protected files and `size` is the
+        header length in bytes.
+    """
+    if len(data) < HEADER_SIZE or not is_binary_container(data):
+        raise ValueError("Not an EnvCloak binary container.")
+    _, version, algorithm, hint, flags, nonce, length = _HEADER.unpack_from(data)
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported binary container version: {version}")
+    if algorithm != ALGORITHM_AES_256_GCM:
+        raise ValueError(f"Unsupported algorithm identifier: {algorithm}")
+    kdf, salt, size = None, None, HEADER_SIZE
+    if flags & FLAG_KDF:
+        kdf, salt, size = decode_kdf_block(data, HEADER_SIZE)
+    return ContainerHeader(
+        version,
+        algorithm,
+        _HINT_NAMES.get(hint, ""),
+        flags,
+        nonce,
+        length,
+        kdf,
+        salt,
+        size,
+    )
+
+
+def pack(plaintext: bytes, key: bytes, format_hint: str = "") -> bytes:
+    """
+    Encrypt data into a binary container.
+
+    :param plaintext: Data to encrypt (any bytes-like object).
+    :param key: Encryption key (32 bytes for AES-256), CloakKey or PasswordKey.
+    :param format_hint: Optional plaintext format ("env", "json", "yaml", "xml").
+    :return: Container bytes.
+    """
+    header, sealed = pack_parts(plaintext, key, format_hint)
+    return header + sealed
+
+
+def pack_parts(plaintext, key: bytes, format_hint: str = ""):
+    """
+    Encrypt data into a binary container without joining header and body.
+
+    Writers can emit both parts one after another and skip the copy that
+    `pack` makes to return a single bytes object.
+
+    :return: Tuple of (header bytes, ciphertext followed by the tag).
+    """
+    try:
+        kdf_block = getattr(key, "kdf_block", b"")
+        cloak_key = key.cloak_key() if kdf_block else as_cloak_key(key)
+        nonce = os.urandom(NONCE_SIZE)
+        header = (
+            _HEADER.pack(
+                BINARY_MAGIC,
+                BINARY_VERSION,
+                ALGORITHM_AES_256_GCM,
+                FORMAT_HINTS.get(format_hint, 0),
+                FLAG_KDF if kdf_block else 0,
+                nonce,
+                len(plaintext),
+            )
+            + kdf_block
+        )
+        return header, cloak_key.seal(nonce, plaintext, header)
+    except InvalidKeyException as e:
+        raise EncryptionException(details=e.details) from e
+    except Exception as e:
+        raise EncryptionException(details=str(e) or type(e).__name__) from e
+
+
+def resolve_key(key, kdf=None, salt: bytes = None):
+    """
+    Turn the key given by the caller into the CloakKey a file was sealed with.
+
+    :param key: Raw key bytes, CloakKey or PasswordKey.
+    :param kdf: KDF recorded in the file header, or None for key files.
+    :param salt: Salt recorded in the file header.
+    :return: CloakKey instance.
+    """
+    if kdf is not None:
+        if not hasattr(key, "for_params"):
+            raise ValueError("This file is password-protected; use a password.")
+        return key.for_params(kdf, salt)
+    if hasattr(key, "for_params"):
+        raise ValueError("This file is not password-protected; use a key file.")
+    return as_cloak_key(key)
+
+
+def unpack(data, key: bytes):
+    """
+    Decrypt a binary container.
+
+    :param data: Container bytes.
+    :param key: Decryption key (32 bytes for AES-256) or CloakKey; a
+        PasswordKey for password-protected files.
+    :return: Tuple of (plaintext bytes, `ContainerHeader`).
+    """
+    try:
+        header = read_header(data)
+        cloak_key = resolve_key(key, header.kdf, header.salt)
+        if len(data) != header.size + header.plaintext_length + TAG_SIZE:
+            raise ValueError("Binary container length does not match its header.")
+        # Release the view explicitly so memory-mapped input can be closed
+        with memoryview(data) as view:
+            plaintext = cloak_key.unseal(
+                header.nonce, view[header.size :], view[: header.size]
+            )
+        return plaintext, header
+    except InvalidKeyException as e:
+        raise DecryptionException(details=e.details) from e
+    except Exception as e:
+        raise DecryptionException(details=str(e) or type(e).__name__) from e
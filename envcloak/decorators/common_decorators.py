@@ -1,4 +1,6 @@
 import click
+from envcloak.constants import DEFAULT_KDF, DEFAULT_MAX_IN_FLIGHT_MB
+from envcloak.kdf import KDFS
 
 
 def dry_run_option(func):
@@ -28,3 +30,89 @@ def force_option(func):
         is_flag=True,
         help="Force overwrite of existing files or directories.",
     )(func)
+
+
+def password_option(func):
+    """
+    Add a `--password` option (also read from ENVCLOAK_PASSWORD) to a Click
+    command, as an alternative to `--key-file`.
+    """
+    return click.option(
+        "--password",
+        "-p",
+        required=False,
+        envvar="ENVCLOAK_PASSWORD",
+        help="Password to derive the key from, instead of --key-file "
+        "(also read from ENVCLOAK_PASSWORD).",
+    )(func)
+
+
+def kdf_options(func):
+    """
+    Add `--kdf` and `--kdf-param` options selecting how keys are derived
+    from passwords.
+    """
+    func = click.option(
+        "--kdf-param",
+        "kdf_params",
+        multiple=True,
+        metavar="NAME=VALUE",
+        help="KDF cost parameter, e.g. iterations=600000 or n=65536 (repeatable).",
+    )(func)
+    return click.option(
+        "--kdf",
+        type=click.Choice(list(KDFS)),
+        default=DEFAULT_KDF,
+        show_default=True,
+        help="Key derivation function used with --password.",
+    )(func)
+
+
+def jobs_option(func):
+    """
+    Add a `--jobs` option setting the number of files processed in parallel
+    in `--directory` mode.
+    """
+    return click.option(
+        "--jobs",
+        "-j",
+        type=click.IntRange(min=1),
+        default=None,
+        help="Number of files processed in parallel with --directory "
+        "(default: number of CPUs).",
+    )(func)
+
+
+def max_in_flight_option(func):
+    """
+    Add a `--max-in-flight-mb` option capping the size of files processed at
+    the same time in `--directory` mode.
+    """
+    return click.option(
+        "--max-in-flight-mb",
+        type=click.IntRange(min=1),
+        default=DEFAULT_MAX_IN_FLIGHT_MB,
+        show_default=True,
+        help="Upper bound on the total size (MiB) of files processed at once "
+        "with --directory; a single larger file is processed alone.",
+    )(func)
+
+
+def walk_options(func):
+    """
+    Add `--include` and `--exclude` glob options filtering the files found
+    in `--directory` mode.
+    """
+    func = click.option(
+        "--exclude",
+        multiple=True,
+        metavar="PATTERN",
+        help="Skip files and directories matching this glob (repeatable). "
+        "Patterns from a .envcloakignore file in the directory are added.",
+    )(func)
+    return click.option(
+        "--include",
+        multiple=True,
+        metavar="PATTERN",
+        help="Only process files matching this glob (repeatable).",
+    )(func)
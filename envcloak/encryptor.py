@@ -1,10 +1,11 @@
 import os
+import io
+import mmap
 import base64
+import codecs
 import json
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.backends import default_backend
+from contextlib import contextmanager
+from dotenv import dotenv_values
 from envcloak.exceptions import (
     InvalidSaltException,
     InvalidKeyException,
@@ -13,7 +14,45 @@ from envcloak.exceptions import (
     FileEncryptionException,
     FileDecryptionException,
 )
-from envcloak.constants import NONCE_SIZE, KEY_SIZE, SALT_SIZE
+from envcloak.constants import (
+    AES_BLOCK_SIZE,
+    NONCE_SIZE,
+    SALT_SIZE,
+    STREAM_MAGIC,
+    STREAM_CHUNK_SIZE,
+    MMAP_THRESHOLD,
+    MAX_KDF_BLOCK_SIZE,
+    CONTAINER_JSON,
+    CONTAINER_STREAM,
+    CONTAINER_BINARY,
+    CONTAINER_RECORDS,
+)
+from envcloak.keys import as_cloak_key
+from envcloak.utils import atomic_replace
+from envcloak.kdf import PBKDF2KDF, derive_key_cached
+from envcloak.streaming import (
+    ChunkReader,
+    is_stream_header,
+    encrypt_stream,
+    decrypt_stream,
+    iter_decrypt_stream,
+)
+from envcloak.container import (
+    HEADER_SIZE as BINARY_HEADER_SIZE,
+    is_binary_container,
+    format_hint_for,
+    read_header,
+    pack,
+    pack_parts,
+    unpack,
+)
+from envcloak.records import (
+    RecordFile,
+    is_records_container,
+    pack_records,
+    read_records,
+    format_dotenv,
+)
 
 
 def derive_key(password: str, salt: bytes) -> bytes:
@@ -28,14 +67,7 @@ def derive_key(password: str, salt: bytes) -> bytes:
             details=f"Expected salt of size {SALT_SIZE}, got {len(salt)} bytes."
         )
     try:
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=KEY_SIZE,
-            salt=salt,
-            iterations=100000,
-            backend=default_backend(),
-        )
-        return kdf.derive(password.encode())
+        return derive_key_cached(password.encode(), salt, PBKDF2KDF())
     except Exception as e:
         raise InvalidKeyException(details=str(e)) from e
 
@@ -56,24 +88,14 @@ def encrypt(data: str, key: bytes) -> dict:
     Encrypt the given data using AES-256-GCM.
 
     :param data: Plaintext data to encrypt.
-    :param key: Encryption key (32 bytes for AES-256).
+    :param key: Encryption key (32 bytes for AES-256) or a CloakKey.
     :return: Dictionary with encrypted data, nonce, and associated metadata.
     """
     try:
-        nonce = os.urandom(NONCE_SIZE)  # Generate a secure random nonce
-        cipher = Cipher(
-            algorithms.AES(key), modes.GCM(nonce), backend=default_backend()
-        )
-        encryptor = cipher.encryptor()
-        ciphertext = encryptor.update(data.encode()) + encryptor.finalize()
-
-        return {
-            "ciphertext": base64.b64encode(ciphertext).decode(),
-            "nonce": base64.b64encode(nonce).decode(),
-            "tag": base64.b64encode(encryptor.tag).decode(),
-        }
+        cloak_key = as_cloak_key(key)
     except Exception as e:
         raise EncryptionException(details=str(e)) from e
+    return cloak_key.encrypt(data)
 
 
 def decrypt(encrypted_data: dict, key: bytes) -> str:
@@ -81,38 +103,118 @@ def decrypt(encrypted_data: dict, key: bytes) -> str:
     Decrypt the given encrypted data using AES-256-GCM.
 
     :param encrypted_data: Dictionary containing ciphertext, nonce, and tag.
-    :param key: Decryption key (32 bytes for AES-256).
+    :param key: Decryption key (32 bytes for AES-256) or a CloakKey.
     :return: Decrypted plaintext.
     """
     try:
-        nonce = base64.b64decode(encrypted_data["nonce"])
-        ciphertext = base64.b64decode(encrypted_data["ciphertext"])
-        tag = base64.b64decode(encrypted_data["tag"])
+        cloak_key = as_cloak_key(key)
+    except Exception as e:
+        raise DecryptionException(details=str(e)) from e
+    return cloak_key.decrypt(encrypted_data)
 
-        cipher = Cipher(
-            algorithms.AES(key), modes.GCM(nonce, tag), backend=default_backend()
-        )
-        decryptor = cipher.decryptor()
-        plaintext = decryptor.update(ciphertext) + decryptor.finalize()
 
-        return plaintext.decode()
+def buffer_size(length: int) -> int:
+    """
+    Size of the output buffer needed by `encrypt_bytes`/`decrypt_bytes`.
+
+    `update_into` needs room for one extra block minus one byte.
+
+    :param length: Length of the input data in bytes.
+    :return: Minimum output buffer length.
+    """
+    return length + AES_BLOCK_SIZE // 8 - 1
+
+
+def encrypt_bytes(data, key: bytes, out: bytearray = None, associated_data=None):
+    """
+    Encrypt any bytes-like object using AES-256-GCM without intermediate copies.
+
+    The ciphertext is written straight into `out` (allocated if omitted) with
+    `update_into`; no str conversion, base64 or concatenation takes place.
+
+    :param data: Plaintext as bytes, bytearray, memoryview or other buffer.
+    :param key: Encryption key (32 bytes for AES-256) or a CloakKey.
+    :param out: Optional writable buffer of at least `buffer_size(len(data))`.
+    :param associated_data: Optional data authenticated but not encrypted.
+    :return: Tuple of (nonce, tag, memoryview of the ciphertext inside `out`).
+    """
+    try:
+        with memoryview(data).cast("B") as view:
+            if out is None:
+                out = bytearray(buffer_size(view.nbytes))
+            nonce = os.urandom(NONCE_SIZE)
+            encryptor = as_cloak_key(key).encryptor(nonce)
+            if associated_data is not None:
+                encryptor.authenticate_additional_data(associated_data)
+            written = encryptor.update_into(view, out)
+        encryptor.finalize()
+        return nonce, encryptor.tag, memoryview(out)[:written]
     except Exception as e:
-        raise DecryptionException(details=str(e)) from e
+        raise EncryptionException(details=str(e)) from e
+
+
+def decrypt_bytes(
+    ciphertext, nonce: bytes, tag: bytes, key: bytes, out=None, associated_data=None
+):
+    """
+    Decrypt any bytes-like object produced by `encrypt_bytes`.
+
+    The plaintext is written into `out` (allocated if omitted). If
+    authentication fails the written region of `out` is zeroed before the
+    exception is raised, so no unauthenticated plaintext is left behind.
+
+    :param ciphertext: Ciphertext as bytes, bytearray, memoryview or other buffer.
+    :param nonce: Nonce returned by `encrypt_bytes`.
+    :param tag: Authentication tag returned by `encrypt_bytes`.
+    :param key: Decryption key (32 bytes for AES-256) or a CloakKey.
+    :param out: Optional writable buffer of at least `buffer_size(len(ciphertext))`.
+    :param associated_data: Associated data passed to `encrypt_bytes`, if any.
+    :return: Memoryview of the plaintext inside `out`.
+    """
+    written = 0
+    try:
+        with memoryview(ciphertext).cast("B") as view:
+            if out is None:
+                out = bytearray(buffer_size(view.nbytes))
+            decryptor = as_cloak_key(key).decryptor(nonce, tag)
+            if associated_data is not None:
+                decryptor.authenticate_additional_data(associated_data)
+            written = decryptor.update_into(view, out)
+        decryptor.finalize()
+        return memoryview(out)[:written]
+    except Exception as e:
+        if written:
+            memoryview(out)[:written] = bytes(written)
+        raise DecryptionException(details=str(e) or type(e).__name__) from e
 
 
-def encrypt_file(input_file: str, output_file: str, key: bytes):
+def encrypt_file(input_file: str, output_file: str, key: bytes, use_mmap=None):
     """
     Encrypt the contents of a file and write the result to another file.
 
     :param input_file: Path to the plaintext input file.
     :param output_file: Path to save the encrypted file.
     :param key: Encryption key (32 bytes for AES-256).
+    :param use_mmap: Memory-map the input instead of reading it. Defaults to
+        doing so for files of at least `MMAP_THRESHOLD` bytes.
     """
     try:
-        with open(input_file, "r", encoding="utf-8") as infile:
-            data = infile.read()
-
-        encrypted_data = encrypt(data, key)
+        encrypted_data = None
+        with _open_input(input_file, use_mmap, stream=True) as infile:
+            if isinstance(infile, mmap.mmap) and infile.find(b"\r") == -1:
+                # Same result as the text path below, minus the str round-trip
+                _check_utf8(infile)
+                nonce, tag, ciphertext = encrypt_bytes(infile, key)
+                encrypted_data = {
+                    "ciphertext": base64.b64encode(ciphertext).decode(),
+                    "nonce": base64.b64encode(nonce).decode(),
+                    "tag": base64.b64encode(tag).decode(),
+                }
+                ciphertext.release()
+        if encrypted_data is None:
+            # Text mode keeps the universal newline handling of this format
+            with open(input_file, "r", encoding="utf-8") as infile:
+                encrypted_data = encrypt(infile.read(), key)
 
         with open(output_file, "w", encoding="utf-8") as outfile:
             json.dump(encrypted_data, outfile, ensure_ascii=False)
@@ -120,21 +222,437 @@ def encrypt_file(input_file: str, output_file: str, key: bytes):
         raise FileEncryptionException(details=str(e)) from e
 
 
-def decrypt_file(input_file: str, output_file: str, key: bytes):
+def encrypt_file_stream(
+    input_file: str,
+    output_file: str,
+    key: bytes,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    use_mmap=None,
+):
+    """
+    Encrypt a file into the chunked streaming container.
+
+    The input is processed in fixed-size chunks, so memory use stays constant
+    regardless of the file size. `decrypt_file` detects the format on its own.
+
+    :param input_file: Path to the plaintext input file.
+    :param output_file: Path to save the encrypted file.
+    :param key: Encryption key (32 bytes for AES-256).
+    :param chunk_size: Plaintext bytes sealed per segment.
+    :param use_mmap: Memory-map the input instead of reading it. Defaults to
+        doing so for files of at least `MMAP_THRESHOLD` bytes.
+    """
+    try:
+        with _open_input(input_file, use_mmap, stream=True) as infile:
+            with _open_output(output_file) as outfile:
+                encrypt_stream(infile, outfile, key, chunk_size)
+    except Exception as e:
+        raise FileEncryptionException(details=str(e)) from e
+
+
+def encrypt_file_binary(input_file: str, output_file: str, key: bytes, use_mmap=None):
+    """
+    Encrypt a file into the binary container.
+
+    The plaintext format (env, json, yaml, xml) is guessed from the input file
+    name and stored as a hint in the header.
+
+    :param input_file: Path to the plaintext input file.
+    :param output_file: Path to save the encrypted file.
+    :param key: Encryption key (32 bytes for AES-256), or a PasswordKey to
+        derive the key from a password and record the KDF in the header.
+    :param use_mmap: Memory-map the input instead of reading it. Defaults to
+        doing so for files of at least `MMAP_THRESHOLD` bytes.
+    """
+    try:
+        with _open_input(input_file, use_mmap) as data:
+            header, sealed = pack_parts(data, key, format_hint_for(input_file))
+
+        with _open_output(output_file) as outfile:
+            outfile.write(header)
+            outfile.write(sealed)
+    except Exception as e:
+        raise FileEncryptionException(details=str(e)) from e
+
+
+def encrypt_file_records(input_file: str, output_file: str, key: bytes):
+    """
+    Encrypt a .env file into the records container, sealing every variable
+    separately so it can later be read or replaced on its own.
+
+    Variables are read as `load_encrypted_env` would (interpolation applied);
+    keys without a value are skipped.
+
+    :param input_file: Path to the plaintext .env file.
+    :param output_file: Path to save the encrypted file.
+    :param key: Encryption key (32 bytes for AES-256), or a PasswordKey.
+    """
+    try:
+        with open(input_file, "r", encoding="utf-8") as infile:
+            entries = _records_entries(
+                infile.read(), format_hint_for(input_file), input_file
+            )
+        sealed = pack_records(entries, key)
+        with _open_output(output_file) as outfile:
+            outfile.write(sealed)
+    except Exception as e:
+        raise FileEncryptionException(details=str(e)) from e
+
+
+def file_encryptor(container: str):
+    """
+    :param container: One of "json", "stream", "binary" or "records".
+    :return: The function encrypting a file into that container.
+    """
+    encryptors = {
+        CONTAINER_JSON: encrypt_file,
+        CONTAINER_STREAM: encrypt_file_stream,
+        CONTAINER_BINARY: encrypt_file_binary,
+        CONTAINER_RECORDS: encrypt_file_records,
+    }
+    if container not in encryptors:
+        raise ValueError(f"Unknown container: {container}")
+    return encryptors[container]
+
+
+def _parse_dotenv(text: str) -> dict:
+    # Raw values: ${VAR} references must not be resolved from the
+    # environment of the machine doing the encrypting
+    return {
+        name: value
+        for name, value in dotenv_values(
+            stream=io.StringIO(text), interpolate=False
+        ).items()
+        if value is not None
+    }
+
+
+def _records_entries(text: str, format_hint: str, source) -> dict:
+    """
+    Parse .env plaintext for the records container, which holds nothing
+    else: other formats would silently come out empty.
+    """
+    if format_hint not in ("", "env"):
+        raise ValueError(
+            f"The records container only holds .env files, but {source} "
+            f"is {format_hint}."
+        )
+    entries = _parse_dotenv(text)
+    if not entries and text.strip():
+        raise ValueError(f"No variables found in {source}; is it a .env file?")
+    return entries
+
+
+def decrypt_file(input_file: str, output_file: str, key: bytes, use_mmap=None):
     """
     Decrypt the contents of a file and write the result to another file.
 
+    The streaming, binary and records containers and the legacy JSON format
+    are all accepted; the format is detected from the leading bytes. Records
+    containers are written out as a .env file.
+
     :param input_file: Path to the encrypted input file.
     :param output_file: Path to save the decrypted file.
-    :param key: Decryption key (32 bytes for AES-256).
+    :param key: Decryption key (32 bytes for AES-256), or a PasswordKey for
+        password-protected binary containers.
+    :param use_mmap: Memory-map the input instead of reading it. Defaults to
+        doing so for files of at least `MMAP_THRESHOLD` bytes.
     """
     try:
-        with open(input_file, "r", encoding="utf-8") as infile:
-            encrypted_data = json.load(infile)
+        with _open_input(input_file, use_mmap, stream=True) as infile:
+            magic = infile.read(len(STREAM_MAGIC))
+            infile.seek(0)
+            if is_stream_header(magic):
+                with _open_output(output_file) as outfile:
+                    decrypt_stream(infile, outfile, key)
+                return
+            if is_binary_container(magic):
+                plaintext, _ = unpack(_contents(infile), key)
+                with _open_output(output_file) as outfile:
+                    outfile.write(plaintext)
+                return
+            if is_records_container(magic):
+                plaintext = format_dotenv(read_records(input_file, key))
+                with _open_output(output_file) as outfile:
+                    outfile.write(plaintext.encode("utf-8"))
+                return
+            data = infile.read()
 
+        encrypted_data = json.loads(data.decode("utf-8"))
         decrypted_data = decrypt(encrypted_data, key)
 
         with open(output_file, "w", encoding="utf-8") as outfile:
             outfile.write(decrypted_data)
     except Exception as e:
         raise FileDecryptionException(details=str(e)) from e
+
+
+def read_encrypted_file(input_file: str, key: bytes, use_mmap=None) -> bytes:
+    """
+    Decrypt a file of any supported container into memory.
+
+    :param input_file: Path to the encrypted input file.
+    :param key: Decryption key (32 bytes for AES-256), or a PasswordKey for
+        password-protected binary containers.
+    :param use_mmap: Memory-map the input instead of reading it. Defaults to
+        doing so for files of at least `MMAP_THRESHOLD` bytes.
+    :return: Decrypted plaintext bytes.
+    """
+    try:
+        with _open_input(input_file, use_mmap, stream=True) as infile:
+            magic = infile.read(len(STREAM_MAGIC))
+            infile.seek(0)
+            if is_stream_header(magic):
+                plaintext = io.BytesIO()
+                decrypt_stream(infile, plaintext, key)
+                return plaintext.getvalue()
+            if is_binary_container(magic):
+                return unpack(_contents(infile), key)[0]
+            if is_records_container(magic):
+                return format_dotenv(read_records(input_file, key)).encode("utf-8")
+            data = infile.read()
+        return decrypt(json.loads(data.decode("utf-8")), key).encode("utf-8")
+    except Exception as e:
+        raise FileDecryptionException(details=str(e)) from e
+
+
+@contextmanager
+def _open_input(input_file: str, use_mmap=None, stream: bool = False):
+    """
+    Open an input file for reading, memory-mapping it when it is large.
+
+    Mapping the file avoids copying the whole payload onto the Python heap and
+    lets the OS page cache serve repeated reads of the same file.
+
+    :param input_file: Path to the input file.
+    :param use_mmap: Force (True) or disable (False) mapping; None decides by
+        comparing the file size with `MMAP_THRESHOLD`.
+    :param stream: Yield a file-like object (binary file or mmap) instead of
+        a buffer with the full contents.
+    """
+    with open(input_file, "rb") as infile:
+        size = os.fstat(infile.fileno()).st_size
+        if use_mmap is None:
+            use_mmap = size >= MMAP_THRESHOLD
+        if not use_mmap or size == 0:  # Empty files cannot be mapped
+            yield infile if stream else infile.read()
+            return
+        mapping = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapping
+        finally:
+            try:
+                mapping.close()
+            except BufferError:
+                # A view is still referenced by an in-flight exception's
+                # traceback; the mapping is released when that is collected.
+                pass
+
+
+def _contents(infile):
+    """
+    Return the full contents of an object yielded by `_open_input(stream=True)`
+    without copying a memory map.
+    """
+    return infile if isinstance(infile, mmap.mmap) else infile.read()
+
+
+def _check_utf8(data):
+    """
+    Validate that a buffer holds UTF-8 text, decoding it piece by piece so the
+    whole text never has to exist as a str.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with memoryview(data) as view:
+        for offset in range(0, len(view), STREAM_CHUNK_SIZE):
+            decoder.decode(view[offset : offset + STREAM_CHUNK_SIZE])
+    decoder.decode(b"", final=True)
+
+
+def write_encrypted_file(
+    data: bytes,
+    output_file: str,
+    key: bytes,
+    container: str = CONTAINER_JSON,
+    format_hint: str = "",
+):
+    """
+    Encrypt in-memory plaintext into a file using the requested container.
+
+    :param data: Plaintext bytes.
+    :param output_file: Path to save the encrypted file.
+    :param key: Encryption key (32 bytes for AES-256).
+    :param container: One of "json", "stream", "binary" or "records" (the
+        latter takes .env plaintext).
+    :param format_hint: Plaintext format hint stored by the binary container.
+    """
+    try:
+        if container == CONTAINER_JSON:
+            sealed = json.dumps(
+                encrypt(data.decode("utf-8"), key), ensure_ascii=False
+            ).encode("utf-8")
+        elif container == CONTAINER_BINARY:
+            sealed = pack(data, key, format_hint)
+        elif container == CONTAINER_RECORDS:
+            entries = _records_entries(
+                data.decode("utf-8"), format_hint, "the plaintext"
+            )
+            sealed = pack_records(entries, key)
+        elif container == CONTAINER_STREAM:
+            sealed = None
+        else:
+            raise ValueError(f"Unknown container: {container}")
+
+        with _open_output(output_file) as outfile:
+            if sealed is None:
+                encrypt_stream(io.BytesIO(data), outfile, key)
+            else:
+                outfile.write(sealed)
+    except Exception as e:
+        raise FileEncryptionException(details=str(e)) from e
+
+
+def convert_file(input_file: str, output_file: str, key: bytes, container: str):
+    """
+    Re-seal an encrypted file in another container, keeping the same key.
+
+    :param input_file: Path to the encrypted input file (any container).
+    :param output_file: Path to save the converted file.
+    :param key: Encryption key (32 bytes for AES-256).
+    :param container: Target container: "json", "stream", "binary" or "records".
+    """
+    _, format_hint = _source_format(input_file)
+    plaintext = read_encrypted_file(input_file, key)
+    write_encrypted_file(plaintext, output_file, key, container, format_hint)
+
+
+def container_of(prefix: bytes) -> str:
+    """
+    :param prefix: Leading bytes of an encrypted file.
+    :return: Its container: "stream", "binary", "records" or "json".
+    """
+    if is_stream_header(prefix):
+        return CONTAINER_STREAM
+    if is_binary_container(prefix):
+        return CONTAINER_BINARY
+    if is_records_container(prefix):
+        return CONTAINER_RECORDS
+    return CONTAINER_JSON
+
+
+def _source_format(input_file: str):
+    """
+    :return: Tuple of (container, format hint) of an encrypted file.
+    :raises FileDecryptionException: If its header is malformed.
+    """
+    try:
+        with open(input_file, "rb") as infile:
+            prefix = infile.read(BINARY_HEADER_SIZE + 2 + MAX_KDF_BLOCK_SIZE)
+        container = container_of(prefix)
+        format_hint = (
+            read_header(prefix).format_hint
+            if container == CONTAINER_BINARY
+            else format_hint_for(input_file)
+        )
+    except Exception as e:
+        raise FileDecryptionException(details=str(e)) from e
+    return container, format_hint
+
+
+def can_decrypt(input_file: str, key) -> bool:
+    """
+    Check whether `key` opens an encrypted file, authenticating as little
+    as the container allows: the first segment of a stream, the index of a
+    records container. Binary and JSON containers are sealed in one piece
+    and are decrypted whole.
+
+    :param input_file: Path to the encrypted file.
+    :param key: Key to try (bytes or PasswordKey).
+    :return: True if the file authenticates with `key`.
+    """
+    try:
+        container, _ = _source_format(input_file)
+        if container == CONTAINER_STREAM:
+            with open(input_file, "rb") as infile:
+                next(iter_decrypt_stream(infile, key), None)
+        elif container == CONTAINER_RECORDS:
+            RecordFile(input_file, key).close()
+        else:
+            read_encrypted_file(input_file, key)
+    except (DecryptionException, FileDecryptionException):
+        return False
+    return True
+
+
+def _rotate_stream(input_file: str, output_file: str, old_key, new_key):
+    """
+    Re-seal a streaming container segment by segment, so neither the whole
+    plaintext nor the whole ciphertext is ever held in memory.
+    """
+    try:
+        with open(input_file, "rb") as infile:
+            plaintext = ChunkReader(iter_decrypt_stream(infile, old_key))
+            with _open_output(output_file) as outfile:
+                encrypt_stream(plaintext, outfile, new_key)
+    except EncryptionException as e:
+        if isinstance(e.__cause__, DecryptionException):
+            raise FileDecryptionException(details=str(e.__cause__)) from e.__cause__
+        raise FileEncryptionException(details=str(e)) from e
+    except DecryptionException as e:
+        raise FileDecryptionException(details=str(e)) from e
+    except OSError as e:
+        raise FileEncryptionException(details=str(e)) from e
+
+
+def rotate_file(
+    input_file: str,
+    output_file: str,
+    old_key: bytes,
+    new_key: bytes,
+    atomic: bool = False,
+):
+    """
+    Re-seal an encrypted file under a new key, keeping its container and
+    format hint. No plaintext is written to disk; streaming containers are
+    re-sealed one segment at a time, the others in memory.
+
+    :param input_file: Path to the encrypted input file (any container).
+    :param output_file: Path to save the re-encrypted file; may be the
+        input file itself when `atomic` is set.
+    :param old_key: Key the input is encrypted with (bytes or PasswordKey).
+    :param new_key: Key to encrypt the output with (bytes or PasswordKey).
+    :param atomic: Write to a temporary file and rename it over the output,
+        so an interrupted rotation leaves the old file in place.
+    """
+    container, format_hint = _source_format(input_file)
+
+    def write(path):
+        if container == CONTAINER_STREAM:
+            _rotate_stream(input_file, path, old_key, new_key)
+        else:
+            plaintext = read_encrypted_file(input_file, old_key)
+            write_encrypted_file(plaintext, path, new_key, container, format_hint)
+
+    if not atomic:
+        write(output_file)
+        return
+    with atomic_replace(output_file, prefix=".envcloak-rotate-") as temp_path:
+        write(temp_path)
+
+
+@contextmanager
+def _open_output(output_file: str, mode: str = "wb"):
+    """
+    Open an output file and remove it again if writing to it fails, so no
+    partially written (or partially decrypted) file is left behind.
+    """
+    outfile = open(output_file, mode)  # pylint: disable=consider-using-with
+    try:
+        with outfile:
+            yield outfile
+    except BaseException:
+        try:
+            os.remove(output_file)
+        except OSError:
+            pass
+        raise
@@ -60,6 +60,12 @@ class DiskSpaceException(EncryptedEnvLoaderException):
     default_message = "Insufficient disk space available for this operation."
 
 
+class AgentUnavailableException(EncryptedEnvLoaderException):
+    """Raised when the key agent cannot be reached."""
+
+    default_message = "The EnvCloak agent is not reachable."
+
+
 #### Cryptography Exceptions
 class CryptographyException(Exception):
     """Base exception for cryptographic errors."""
@@ -2,6 +2,7 @@
 import os
 from pathlib import Path
 from .encryptor import derive_key
+from .kdf import KDF
 
 
 def generate_key_file(output_path: Path):
@@ -15,7 +16,9 @@ def generate_key_file(output_path: Path):
     print(f"Encryption key generated and saved to {output_path}")
 
 
-def generate_key_from_password_file(password: str, output_path: Path, salt: str = None):
+def generate_key_from_password_file(
+    password: str, output_path: Path, salt: str = None, kdf: KDF = None
+):
     """
     Derive an encryption key from a password and save it to a file.
     If no salt is provided, a random one is generated.
@@ -23,6 +26,7 @@ def generate_key_from_password_file(password: str, output_path: Path, salt: str
     :param password: The password used for key derivation.
     :param output_path: Path object representing the file where the key will be saved.
     :param salt: Optional hex-encoded salt (16 bytes as 32 hex characters).
+    :param kdf: Optional KDF (see `envcloak.kdf.get_kdf`); PBKDF2 by default.
     """
     if salt:
         if len(salt) != 32:  # Hex-encoded salt should be 16 bytes
@@ -32,7 +36,11 @@ def generate_key_from_password_file(password: str, output_path: Path, salt: str
         salt_bytes = os.urandom(16)  # Generate a random 16-byte salt
 
     # Derive the key
-    key = derive_key(password, salt_bytes)
+    key = (
+        derive_key(password, salt_bytes)
+        if kdf is None
+        else kdf.derive(password, salt_bytes)
+    )
 
     # Ensure the output directory exists
     output_path.parent.mkdir(parents=True, exist_ok=True)
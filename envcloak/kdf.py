@@ -0,0 +1,454 @@
+"""
+Pluggable key derivation for EnvCloak.
+
+A KDF turns a password (or other secret) and a salt into an AES-256 key.
+Password-protected binary containers record the KDF name, its cost
+parameters and the salt in a small block after the fixed header, so files
+can be decrypted with just the password and costs can change per deployment
+without breaking older files.
+"""
+
+import os
+import json
+import math
+import time
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.backends import default_backend
+from envcloak.constants import (
+    KEY_SIZE,
+    SALT_SIZE,
+    PBKDF2_ITERATIONS,
+    DEFAULT_KDF,
+    KDF_CACHE_SIZE,
+    MAX_KDF_BLOCK_SIZE,
+    KDF_CALIBRATION_ROUNDS,
+)
+from envcloak.keys import CloakKey
+from envcloak.exceptions import DecryptionException
+
+_BLOCK_LENGTH = struct.Struct(">H")
+
+
+class KDF:
+    """
+    Base class of key derivation functions.
+
+    Subclasses set `name` and `defaults` (the tunable cost parameters) and
+    implement `_derive`. Tunable KDFs also name the parameter that
+    `calibrate` scales (`cost_param`) and its allowed range (`cost_range`);
+    the ranges of their other parameters are in `param_ranges`.
+    """
+
+    name = ""
+    defaults = {}
+    cost_param = None
+    cost_range = (1, 1)
+    param_ranges = {}
+
+    def __init__(self, **params):
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise ValueError(
+                f"Unknown parameter(s) for {self.name}: {', '.join(sorted(unknown))}"
+            )
+        self.params = {**self.defaults, **{k: int(v) for k, v in params.items()}}
+
+    def __repr__(self):
+        params = ", ".join(f"{k}={v}" for k, v in self.params.items())
+        return f"{type(self).__name__}({params})"
+
+    def __eq__(self, other):
+        return isinstance(other, KDF) and self.to_dict() == other.to_dict()
+
+    def __hash__(self):
+        return hash(json.dumps(self.to_dict(), sort_keys=True))
+
+    def to_dict(self) -> dict:
+        """
+        :return: Name and parameters, as recorded in container headers.
+        """
+        return {"kdf": self.name, **self.params}
+
+    def derive(self, password, salt: bytes, length: int = KEY_SIZE) -> bytes:
+        """
+        Derive a key from a password and salt.
+        :param password: Password as str or bytes.
+        :param salt: Salt bytes.
+        :param length: Length of the derived key.
+        :return: Derived key bytes.
+        """
+        if isinstance(password, str):
+            password = password.encode()
+        return self._derive(password, salt, length)
+
+    def _derive(self, password: bytes, salt: bytes, length: int) -> bytes:
+        raise NotImplementedError
+
+    def check_params(self):
+        """
+        Check the parameters against their allowed ranges, e.g. before
+        deriving with parameters read from an untrusted file header.
+        :raises ValueError: If a parameter is out of range.
+        """
+        ranges = dict(self.param_ranges)
+        if self.cost_param is not None:
+            ranges[self.cost_param] = self.cost_range
+        for name, value in self.params.items():
+            low, high = ranges[name]
+            if not low <= value <= high:
+                raise ValueError(
+                    f"{self.name} parameter {name}={value} is outside {low}..{high}."
+                )
+
+    def scaled(self, factor: float) -> "KDF":
+        """
+        Return a copy whose cost is multiplied by roughly `factor`, clamped
+        to `cost_range`.
+        """
+        if self.cost_param is None:
+            return self
+        low, high = self.cost_range
+        cost = min(
+            max(self._round_cost(self.params[self.cost_param] * factor), low), high
+        )
+        return type(self)(**{**self.params, self.cost_param: cost})
+
+    @staticmethod
+    def _round_cost(cost: float) -> int:
+        return int(cost)
+
+
+class PBKDF2KDF(KDF):
+    """PBKDF2-HMAC-SHA256, the historical EnvCloak default."""
+
+    name = "pbkdf2"
+    defaults = {"iterations": PBKDF2_ITERATIONS}
+    cost_param = "iterations"
+    cost_range = (1000, 10**9)
+
+    @staticmethod
+    def _round_cost(cost):
+        return int(round(cost, -3))
+
+    def _derive(self, password, salt, length):
+        return PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=length,
+            salt=salt,
+            iterations=self.params["iterations"],
+            backend=default_backend(),
+        ).derive(password)
+
+
+class ScryptKDF(KDF):
+    """scrypt, memory-hard; memory use is about 128 * n * r bytes."""
+
+    name = "scrypt"
+    defaults = {"n": 2**15, "r": 8, "p": 1}
+    cost_param = "n"
+    cost_range = (2**10, 2**20)  # Up to 1 GiB of memory with r=8
+    param_ranges = {"r": (1, 32), "p": (1, 16)}
+    max_memory = 2**30
+
+    def check_params(self):
+        super().check_params()
+        n, r = self.params["n"], self.params["r"]
+        if n & (n - 1):
+            raise ValueError(f"scrypt parameter n={n} is not a power of two.")
+        if 128 * n * r > self.max_memory:
+            raise ValueError(
+                f"scrypt parameters n={n}, r={r} need more than "
+                f"{self.max_memory} bytes of memory."
+            )
+
+    @staticmethod
+    def _round_cost(cost):
+        # n must be a power of two
+        return 2 ** max(0, round(math.log2(max(cost, 1))))
+
+    def _derive(self, password, salt, length):
+        return Scrypt(
+            salt=salt,
+            length=length,
+            n=self.params["n"],
+            r=self.params["r"],
+            p=self.params["p"],
+            backend=default_backend(),
+        ).derive(password)
+
+
+class HKDFKDF(KDF):
+    """
+    HKDF-SHA256. Cheap by design: only suitable for high-entropy secrets
+    (e.g. a random master token), not for human passwords.
+    """
+
+    name = "hkdf"
+    defaults = {}
+
+    def _derive(self, password, salt, length):
+        return HKDF(
+            algorithm=hashes.SHA256(),
+            length=length,
+            salt=salt,
+            info=b"envcloak",
+            backend=default_backend(),
+        ).derive(password)
+
+
+KDFS = {kdf.name: kdf for kdf in (PBKDF2KDF, ScryptKDF, HKDFKDF)}
+
+
+def get_kdf(name: str = DEFAULT_KDF, **params) -> KDF:
+    """
+    Create a KDF by name.
+    :param name: One of `KDFS` ("pbkdf2", "scrypt", "hkdf").
+    :param params: Cost parameters overriding the defaults.
+    :return: KDF instance.
+    """
+    if name not in KDFS:
+        raise ValueError(f"Unknown KDF: {name}. Choose from {', '.join(KDFS)}.")
+    return KDFS[name](**params)
+
+
+def measure(kdf: KDF, rounds: int = KDF_CALIBRATION_ROUNDS) -> float:
+    """
+    Time key derivations with a KDF on this machine.
+    :param kdf: KDF instance.
+    :param rounds: Number of derivations; the fastest one is reported.
+    :return: Seconds per derivation.
+    """
+    salt = os.urandom(SALT_SIZE)
+    best = math.inf
+    for _ in range(rounds):
+        start = time.perf_counter()
+        kdf.derive(b"envcloak-calibration", salt)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def calibrate(
+    name: str, target: float, rounds: int = KDF_CALIBRATION_ROUNDS, max_steps: int = 8
+):
+    """
+    Find cost parameters for which one derivation takes about `target` seconds.
+
+    Starting from the cheapest allowed cost, the cost parameter is scaled by
+    the ratio of target to measured time until it stops changing; the
+    candidate closest to the target is returned. KDFs without a cost
+    parameter (HKDF) are measured as they are.
+
+    :param name: KDF name (see `KDFS`).
+    :param target: Desired derivation time in seconds.
+    :param rounds: Derivations timed per candidate.
+    :param max_steps: Upper bound on the number of candidates tried.
+    :return: Tuple of (KDF instance, measured seconds per derivation).
+    """
+    kdf = get_kdf(name)
+    if kdf.cost_param is None:
+        return kdf, measure(kdf, rounds)
+
+    kdf = kdf.scaled(0)  # Cheapest allowed cost
+    elapsed = measure(kdf, rounds)
+    best = (kdf, elapsed)
+    for _ in range(max_steps):
+        candidate = kdf.scaled(target / max(elapsed, 1e-6))
+        if candidate == kdf:
+            break
+        kdf, elapsed = candidate, measure(candidate, rounds)
+        if abs(math.log(elapsed / target)) < abs(math.log(best[1] / target)):
+            best = (kdf, elapsed)
+    return best
+
+
+def parse_kdf_params(pairs) -> dict:
+    """
+    Parse "name=value" strings (as given on the command line) into parameters.
+    :param pairs: Iterable of "name=value" strings.
+    :return: Dictionary of integer parameters.
+    """
+    params = {}
+    for pair in pairs:
+        name, sep, value = pair.partition("=")
+        if not sep or not value.strip().isdigit():
+            raise ValueError(f"Invalid KDF parameter '{pair}', expected name=number.")
+        params[name.strip()] = int(value)
+    return params
+
+
+class _DerivedKeyCache:
+    """
+    Bounded, thread-safe LRU of derived keys.
+
+    Entries are keyed by a SHA-256 digest of (KDF parameters, salt, password),
+    so the password itself is not kept around as a dictionary key.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _cache_key(password: bytes, salt: bytes, kdf: KDF) -> bytes:
+        digest = hashlib.sha256()
+        for part in (json.dumps(kdf.to_dict(), sort_keys=True).encode(), salt):
+            digest.update(len(part).to_bytes(4, "big") + part)
+        digest.update(password)
+        return digest.digest()
+
+    def derive(self, password, salt: bytes, kdf: KDF) -> bytes:
+        if isinstance(password, str):
+            password = password.encode()
+        cache_key = self._cache_key(password, salt, kdf)
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return self._entries[cache_key]
+            # Threads asking for the same key wait for one derivation
+            pending = self._pending.setdefault(cache_key, threading.Lock())
+        with pending:
+            with self._lock:
+                if cache_key in self._entries:
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return self._entries[cache_key]
+            try:
+                key = kdf.derive(password, salt)
+            except BaseException:
+                with self._lock:
+                    self._pending.pop(cache_key, None)
+                raise
+            with self._lock:
+                self.misses += 1
+                self._entries[cache_key] = key
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                self._pending.pop(cache_key, None)
+        return key
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_cache = _DerivedKeyCache(KDF_CACHE_SIZE)
+
+
+def derive_key_cached(password, salt: bytes, kdf: KDF = None) -> bytes:
+    """
+    Derive a key, reusing the result of earlier derivations with the same
+    password, salt and parameters in this process.
+    :param password: Password as str or bytes.
+    :param salt: Salt bytes.
+    :param kdf: KDF instance; defaults to `get_kdf()`.
+    :return: Derived key (32 bytes).
+    """
+    return _cache.derive(password, salt, kdf or get_kdf())
+
+
+def clear_key_cache():
+    """
+    Drop all cached derived keys.
+    """
+    _cache.clear()
+
+
+def encode_kdf_block(kdf: KDF, salt: bytes) -> bytes:
+    """
+    Serialize KDF name, parameters and salt for a container header.
+    :return: Length-prefixed block.
+    """
+    payload = json.dumps(
+        {**kdf.to_dict(), "salt": salt.hex()}, separators=(",", ":"), sort_keys=True
+    ).encode()
+    return _BLOCK_LENGTH.pack(len(payload)) + payload
+
+
+def decode_kdf_block(data, offset: int = 0):
+    """
+    Parse a block written by `encode_kdf_block`.
+    :param data: Buffer containing the block.
+    :param offset: Position of the block in `data`.
+    :return: Tuple of (KDF instance, salt bytes, offset after the block).
+    """
+    if len(data) < offset + _BLOCK_LENGTH.size:
+        raise ValueError("Truncated KDF parameters.")
+    (length,) = _BLOCK_LENGTH.unpack_from(data, offset)
+    start = offset + _BLOCK_LENGTH.size
+    if length > MAX_KDF_BLOCK_SIZE or len(data) < start + length:
+        raise ValueError("Truncated or oversized KDF parameters.")
+    fields = json.loads(bytes(data[start : start + length]))
+    name = fields.pop("kdf")
+    salt = bytes.fromhex(fields.pop("salt"))
+    # The block is not authenticated yet: bound the cost before deriving
+    try:
+        kdf = get_kdf(name, **fields)
+        kdf.check_params()
+    except (TypeError, ValueError, OverflowError) as e:
+        raise DecryptionException(
+            details=f"Invalid KDF parameters in header: {e}"
+        ) from e
+    return kdf, salt, start + length
+
+
+class PasswordKey:
+    """
+    A password used in place of a raw key.
+
+    When encrypting, a key is derived once with this object's KDF and a
+    random salt, and both are recorded in the container header. When
+    decrypting, the KDF and salt stored in the file are used instead.
+    Derivations go through the in-process cache.
+    """
+
+    def __init__(self, password, kdf: KDF = None, salt: bytes = None):
+        """
+        :param password: Password as str or bytes.
+        :param kdf: KDF for new files; defaults to `get_kdf()`.
+        :param salt: Salt for new files; random if omitted.
+        :raises ValueError: If the KDF parameters are out of range; files
+            sealed with them could not be decrypted.
+        """
+        self._password = password.encode() if isinstance(password, str) else password
+        self.kdf = kdf or get_kdf()
+        self.kdf.check_params()
+        self.salt = salt if salt is not None else os.urandom(SALT_SIZE)
+        self._cloak_key = None
+
+    def __repr__(self):
+        return f"PasswordKey(<redacted>, kdf={self.kdf!r})"
+
+    @property
+    def kdf_block(self) -> bytes:
+        """
+        :return: Header block describing how `cloak_key()` was derived.
+        """
+        return encode_kdf_block(self.kdf, self.salt)
+
+    def cloak_key(self) -> CloakKey:
+        """
+        :return: CloakKey derived with this object's KDF and salt.
+        """
+        if self._cloak_key is None:
+            self._cloak_key = self.for_params(self.kdf, self.salt)
+        return self._cloak_key
+
+    def for_params(self, kdf: KDF, salt: bytes) -> CloakKey:
+        """
+        :return: CloakKey derived with the given KDF and salt (from a file).
+        """
+        return CloakKey(derive_key_cached(self._password, salt, kdf))
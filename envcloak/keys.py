@@ -0,0 +1,219 @@
+import os
+import base64
+from functools import lru_cache
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.backends import default_backend
+from envcloak.constants import (
+    KEY_SIZE,
+    KEY_SIZES,
+    NONCE_SIZE,
+    TAG_SIZE,
+    NONCE_BATCH_SIZE,
+)
+from envcloak.exceptions import (
+    InvalidKeyException,
+    EncryptionException,
+    DecryptionException,
+)
+
+
+class CloakKey:
+    """
+    An AES-GCM key (AES-256 for keys EnvCloak generates) validated once and
+    bound to a prepared AEAD primitive.
+
+    Reusing one instance avoids re-validating the key and rebuilding the
+    cipher for every payload, which matters when sealing many small values.
+    """
+
+    __slots__ = ("_aead", "_algorithm")
+
+    def __init__(self, key: bytes):
+        """
+        :param key: Raw key bytes: 32 bytes for AES-256, or 16/24 bytes for
+            keys made before EnvCloak generated AES-256 keys only.
+        """
+        if len(key) not in KEY_SIZES:
+            raise InvalidKeyException(
+                details=f"Invalid key size ({len(key) * 8}) for AES-GCM."
+            )
+        self._aead = AESGCM(bytes(key))
+        self._algorithm = algorithms.AES(bytes(key))
+
+    @classmethod
+    def from_file(cls, key_file) -> "CloakKey":
+        """
+        Read a raw key from a key file.
+        :param key_file: Path to the key file.
+        :return: CloakKey instance.
+        """
+        with open(key_file, "rb") as kf:
+            return cls(kf.read())
+
+    def __repr__(self):
+        return "CloakKey(<redacted>)"
+
+    def seal(self, nonce: bytes, data, associated_data=None) -> bytes:
+        """
+        Encrypt raw bytes with an explicit nonce.
+        :return: Ciphertext followed by the 16-byte tag.
+        """
+        return self._aead.encrypt(nonce, data, associated_data)
+
+    def unseal(self, nonce: bytes, data, associated_data=None) -> bytes:
+        """
+        Decrypt and authenticate raw bytes produced by `seal`.
+        :return: Plaintext bytes.
+        """
+        return self._aead.decrypt(nonce, data, associated_data)
+
+    def encryptor(self, nonce: bytes):
+        """
+        Create an incremental GCM encryptor (supports `update_into`).
+        """
+        return Cipher(
+            self._algorithm, modes.GCM(nonce), backend=default_backend()
+        ).encryptor()
+
+    def decryptor(self, nonce: bytes, tag: bytes):
+        """
+        Create an incremental GCM decryptor (supports `update_into`).
+        """
+        return Cipher(
+            self._algorithm, modes.GCM(nonce, tag), backend=default_backend()
+        ).decryptor()
+
+    def subkey(self, info: bytes, salt: bytes = None, length: int = KEY_SIZE) -> bytes:
+        """
+        Derive an independent key for another purpose (e.g. hashing names)
+        with HKDF-SHA256, so the AES key itself is never reused outside GCM.
+
+        :param info: Purpose label; different labels give unrelated keys.
+        :param salt: Optional salt, such as a per-file identifier.
+        :param length: Length of the derived key in bytes.
+        :return: Derived key bytes.
+        """
+        return HKDF(
+            algorithm=hashes.SHA256(),
+            length=length,
+            salt=salt,
+            info=info,
+            backend=default_backend(),
+        ).derive(self._algorithm.key)
+
+    def encrypt(self, data: str) -> dict:
+        """
+        Encrypt a string into the JSON-compatible dictionary format.
+
+        :param data: Plaintext data to encrypt.
+        :return: Dictionary with base64 ciphertext, nonce and tag.
+        """
+        try:
+            nonce = os.urandom(NONCE_SIZE)
+        except Exception as e:
+            raise EncryptionException(details=str(e)) from e
+        return self._encrypt(data, nonce)
+
+    def _encrypt(self, data: str, nonce: bytes) -> dict:
+        try:
+            sealed = self._aead.encrypt(nonce, data.encode(), None)
+            return {
+                "ciphertext": base64.b64encode(sealed[:-TAG_SIZE]).decode(),
+                "nonce": base64.b64encode(nonce).decode(),
+                "tag": base64.b64encode(sealed[-TAG_SIZE:]).decode(),
+            }
+        except Exception as e:
+            raise EncryptionException(details=str(e)) from e
+
+    def decrypt(self, encrypted_data: dict) -> str:
+        """
+        Decrypt a dictionary produced by `encrypt`.
+
+        :param encrypted_data: Dictionary containing ciphertext, nonce, and tag.
+        :return: Decrypted plaintext.
+        """
+        try:
+            nonce = base64.b64decode(encrypted_data["nonce"])
+            ciphertext = base64.b64decode(encrypted_data["ciphertext"])
+            tag = base64.b64decode(encrypted_data["tag"])
+            return self._aead.decrypt(nonce, ciphertext + tag, None).decode()
+        except Exception as e:
+            raise DecryptionException(details=str(e) or type(e).__name__) from e
+
+    def encrypt_many(self, payloads):
+        """
+        Lazily encrypt many strings.
+
+        Nonces are drawn from the OS in bulk (one call per batch of up to
+        `NONCE_BATCH_SIZE` payloads) instead of one call per payload.
+
+        :param payloads: Iterable of plaintext strings.
+        :return: Iterator of encrypted dictionaries, in input order.
+        """
+        for payload, nonce in zip(payloads, _nonces(payloads)):
+            yield self._encrypt(payload, nonce)
+
+    def decrypt_many(self, items):
+        """
+        Lazily decrypt many dictionaries produced by `encrypt`/`encrypt_many`.
+
+        :param items: Iterable of encrypted dictionaries.
+        :return: Iterator of plaintext strings, in input order.
+        """
+        for item in items:
+            yield self.decrypt(item)
+
+
+def _nonces(payloads):
+    """
+    Yield fresh nonces, drawing the random bytes for a whole batch at once.
+    """
+    try:
+        batch = min(len(payloads), NONCE_BATCH_SIZE) or 1
+    except TypeError:
+        batch = NONCE_BATCH_SIZE
+    while True:
+        pool = os.urandom(NONCE_SIZE * batch)
+        for offset in range(0, len(pool), NONCE_SIZE):
+            yield pool[offset : offset + NONCE_SIZE]
+
+
+@lru_cache(maxsize=16)
+def _cached_key(key: bytes) -> CloakKey:
+    return CloakKey(key)
+
+
+def clear_key_cache():
+    """
+    Drop the cached CloakKey instances, and with them the raw key bytes
+    they were built from.
+    """
+    _cached_key.cache_clear()
+
+
+def as_cloak_key(key) -> CloakKey:
+    """
+    Return a CloakKey for raw key bytes, reusing a cached instance when the
+    same key is used repeatedly (e.g. across files in a directory).
+
+    The 16 most recently used raw keys stay in memory, as cache keys, until
+    they are evicted or `clear_key_cache()` is called; long-running processes
+    that are done with a key can call it to drop them.
+
+    :param key: Raw key bytes or an existing CloakKey.
+    :return: CloakKey instance.
+    """
+    if isinstance(key, CloakKey):
+        return key
+    if hasattr(key, "kdf_block"):
+        raise InvalidKeyException(
+            details="Passwords are only supported by the binary and records containers."
+        )
+    if not isinstance(key, (bytes, bytearray, memoryview)):
+        raise InvalidKeyException(
+            details=f"Expected key bytes, got {type(key).__name__}."
+        )
+    return _cached_key(bytes(key))
@@ -1,63 +1,129 @@
+# pylint: disable=import-outside-toplevel
+# Parsers (yaml, dotenv, defusedxml), the crypto modules, asyncio and the
+# thread pool are imported where they are first needed, so importing the
+# loader stays cheap for short-lived processes that use a fraction of it.
+import io
 import os
 import json
+import threading
+from collections.abc import Mapping
 from pathlib import Path
-import yaml
-from dotenv import dotenv_values
-from defusedxml.ElementTree import parse as safe_parse
-from envcloak.encryptor import decrypt_file
+from envcloak.preload import preloaded_values
+from envcloak.constants import MAX_KDF_BLOCK_SIZE, RECORDS_MAGIC, AGENT_SOCK_ENV
 from envcloak.exceptions import (
+    AgentUnavailableException,
     EncryptedEnvLoaderException,
     KeyFileNotFoundException,
     EncryptedFileNotFoundException,
     FileDecryptionException,
     UnsupportedFileFormatException,
+    DecryptionException,
 )
 
+_KNOWN_SUFFIXES = {".json", ".yaml", ".yml", ".xml", ".env"}
+
 
 class EncryptedEnvLoader:
-    def __init__(self, file_path: str, key_file: str):
+    def __init__(self, file_path: str, key_file: str = None, password: str = None):
         """
         Initialize the EncryptedEnvLoader with an encrypted file and key file.
         :param file_path: Path to the encrypted environment variables file.
         :param key_file: Path to the encryption key file.
+        :param password: Password of a password-protected file, used instead
+            of a key file.
         """
+        if key_file is None and password is None:
+            raise EncryptedEnvLoaderException(
+                "Provide either a key file or a password."
+            )
+        if key_file is not None and password is not None:
+            raise EncryptedEnvLoaderException(
+                "Provide either a key file or a password, not both."
+            )
         self.file_path = Path(file_path)
-        self.key_file = Path(key_file)
+        self.key_file = Path(key_file) if key_file is not None else None
+        self.password = password
         self.decrypted_data = None
 
-    def load(self):
+    async def aload(self, executor=None, key=None):
+        """
+        Load and decrypt the file without blocking the event loop.
+
+        File I/O, decryption and parsing run in `executor` (the loop's default
+        thread pool if None), so other coroutines keep running meanwhile.
+        :param executor: Optional `concurrent.futures.Executor`.
+        :param key: Key already read by the caller, as for `load`.
+        :return: This loader, once loaded.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(executor, self.load, key)
+        return self
+
+    def read_key(self):
+        """
+        Check that the files exist and read the key.
+        :return: Raw key bytes, or a PasswordKey when a password was given.
+        """
+        # Ensure key file exists
+        if self.key_file is not None and not self.key_file.exists():
+            raise KeyFileNotFoundException(details=str(self.key_file))
+
+        # Ensure encrypted file exists
+        if not self.file_path.exists():
+            raise EncryptedFileNotFoundException(details=str(self.file_path))
+
+        # Read the key; derived keys for passwords are cached per process
+        if self.password is not None:
+            from envcloak.kdf import PasswordKey
+
+            return PasswordKey(self.password)
+        with open(self.key_file, "rb") as kf:
+            return kf.read()
+
+    def is_records(self) -> bool:
+        """
+        :return: Whether the file is a records container, whose variables
+            can be decrypted one at a time.
+        """
+        from envcloak.records import is_records_container
+
+        with open(self.file_path, "rb") as f:
+            return is_records_container(f.read(len(RECORDS_MAGIC)))
+
+    def load(self, key=None):
         """
         Load and decrypt the environment variables file.
+        :param key: Key already read by the caller (raw bytes or PasswordKey),
+            e.g. when several files share it; read from the key file or
+            password if None.
         """
         try:
-            # Ensure key file exists
-            if not self.key_file.exists():
-                raise KeyFileNotFoundException(details=str(self.key_file))
-
-            # Ensure encrypted file exists
-            if not self.file_path.exists():
+            if key is None:
+                if self._load_with_agent():
+                    return self
+                key = self.read_key()
+            elif not self.file_path.exists():
                 raise EncryptedFileNotFoundException(details=str(self.file_path))
 
-            # Read the key
-            with open(self.key_file, "rb") as kf:
-                key = kf.read()
-
-            # Decrypt the file to a temporary file with the same extension
-            temp_decrypted_path = self.file_path.with_suffix(
-                self.file_path.suffix + ".tmp"
-            )
+            # Decrypt into memory; plaintext never touches the filesystem
             try:
-                decrypt_file(self.file_path, temp_decrypted_path, key)
-            except FileDecryptionException as e:
+                if self.is_records():
+                    from envcloak.records import read_records
+
+                    self.decrypted_data = read_records(self.file_path, key)
+                    return self
+                from envcloak.encryptor import read_encrypted_file
+
+                data = read_encrypted_file(self.file_path, key)
+            except (FileDecryptionException, DecryptionException) as e:
                 raise EncryptedEnvLoaderException(
                     "Decryption failed during file processing.", details=str(e)
                 ) from e
 
             # Detect file format and parse it
-            self.decrypted_data = self._parse_file(temp_decrypted_path)
-
-            # Clean up the temporary file
-            os.remove(temp_decrypted_path)
+            self.decrypted_data = self._parse_data(data)
             return self
 
         except EncryptedEnvLoaderException:
@@ -67,46 +133,96 @@ class EncryptedEnvLoader:
                 "An unexpected error occurred during the load process.", details=str(e)
             ) from e
 
-    def _parse_file(self, file_path: Path):
+    def _load_with_agent(self) -> bool:
         """
-        Detect the format of the decrypted file and parse it into a dictionary.
-        :param file_path: Path to the decrypted file.
-        :return: Dictionary of environment variables.
+        Let a running key agent (ENVCLOAK_AGENT_SOCK) decrypt and parse the
+        file, so that no key is read here.
+        :return: False if no agent is configured or it cannot be reached.
+        """
+        if not os.environ.get(AGENT_SOCK_ENV):
+            return False
+        from envcloak.agent import default_client
+
+        try:
+            self.decrypted_data = default_client().load(
+                self.file_path, self.key_file, self.password
+            )
+        except AgentUnavailableException:
+            return False
+        return True
+
+    def _read_format_hint(self) -> str:
         """
-        cleaned_suffix = file_path.name.replace(".enc", "").replace(".tmp", "")
+        Read the plaintext format hint from a binary container header.
+        :return: Format name such as "json", or "" for other containers.
+        """
+        from envcloak.container import (
+            HEADER_SIZE as BINARY_HEADER_SIZE,
+            is_binary_container,
+            read_header,
+        )
+
+        with open(self.file_path, "rb") as f:
+            prefix = f.read(BINARY_HEADER_SIZE + 2 + MAX_KDF_BLOCK_SIZE)
+        if is_binary_container(prefix):
+            return read_header(prefix).format_hint
+        return ""
+
+    def _detect_format(self) -> str:
+        """
+        Detect the plaintext format from the file name, falling back to the
+        hint stored in a binary container header.
+        :return: Suffix such as ".json", or "" for dotenv files.
+        """
+        cleaned_suffix = self.file_path.name.replace(".enc", "")
         base_suffix = Path(cleaned_suffix).suffix
+        if base_suffix not in _KNOWN_SUFFIXES:
+            format_hint = self._read_format_hint()
+            if format_hint:
+                base_suffix = f".{format_hint}"
+        return base_suffix
 
+    def _parse_data(self, data: bytes):
+        """
+        Parse decrypted plaintext into a dictionary.
+        :param data: Decrypted file contents.
+        :return: Dictionary of environment variables.
+        """
+        base_suffix = self._detect_format()
         try:
             if base_suffix in {".json"}:  # JSON
-                with open(file_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
+                return json.loads(data.decode("utf-8"))
             elif base_suffix in {".yaml", ".yml"}:  # YAML
-                with open(file_path, "r", encoding="utf-8") as f:
-                    return yaml.safe_load(f)
+                import yaml
+
+                return yaml.safe_load(data.decode("utf-8"))
             elif base_suffix in {".xml"}:  # XML
-                return self._parse_xml(file_path)
+                return self._parse_xml(data)
             elif base_suffix in {".env", ""}:  # Plaintext
-                return dotenv_values(file_path)
+                from dotenv import dotenv_values
+
+                return dotenv_values(stream=io.StringIO(data.decode("utf-8")))
             else:
                 raise UnsupportedFileFormatException(
                     details=f"File format detected: {base_suffix}"
                 )
-        except UnsupportedFileFormatException:
+        except (UnsupportedFileFormatException, EncryptedEnvLoaderException):
             raise
         except Exception as e:
             raise EncryptedEnvLoaderException(
                 "Failed to parse the decrypted file.", details=str(e)
             ) from e
 
-    def _parse_xml(self, file_path: Path):
+    def _parse_xml(self, data: bytes):
         """
-        Parse an XML file into a dictionary of environment variables.
-        :param file_path: Path to the XML file.
+        Parse an XML document into a dictionary of environment variables.
+        :param data: XML document bytes.
         :return: Dictionary of environment variables.
         """
+        from defusedxml.ElementTree import fromstring as safe_fromstring
+
         try:
-            tree = safe_parse(file_path)
-            root = tree.getroot()
+            root = safe_fromstring(data)
             env_dict = {}
             for child in root:
                 env_dict[child.tag] = child.text
@@ -131,18 +247,331 @@ class EncryptedEnvLoader:
         return self
 
 
+class LazyEncryptedEnv(Mapping):
+    """
+    Read-only mapping over an encrypted environment variables file.
+
+    Nothing is read or decrypted until a value is first accessed, and
+    `os.environ` is never modified; use `env["KEY"]` or `env.get("KEY")`
+    where the code would otherwise call `os.getenv`. For records containers
+    each lookup decrypts a single variable, and the file stays open until
+    the whole file is loaded or `close()` is called (or the `with` block
+    exits); other containers are decrypted and parsed as a whole on first
+    access.
+    """
+
+    def __init__(self, file_path: str, key_file: str = None, password: str = None):
+        """
+        :param file_path: Path to the encrypted environment variables file.
+        :param key_file: Path to the encryption key file.
+        :param password: Password of a password-protected file (instead of key_file).
+        """
+        self._loader = EncryptedEnvLoader(file_path, key_file, password)
+        self._data = None
+        self._key = None
+        self._records = None  # RecordFile, or False for other containers
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        """
+        :return: Whether the file has been decrypted.
+        """
+        return self._data is not None
+
+    def _record_file(self):
+        """
+        Open the file's index if it is a records container. With a key agent
+        configured the whole file is loaded through the agent instead, so no
+        key is read here.
+        :return: RecordFile, or None for other containers.
+        """
+        if self._records is None:
+            with self._lock:
+                if self._records is None:
+                    if os.environ.get(AGENT_SOCK_ENV):
+                        return None
+                    try:
+                        from envcloak.records import RecordFile
+
+                        if self._key is None:
+                            self._key = self._loader.read_key()
+                        self._records = (
+                            RecordFile(self._loader.file_path, self._key)
+                            if self._loader.is_records()
+                            else False
+                        )
+                    except EncryptedEnvLoaderException:
+                        raise
+                    except DecryptionException as e:
+                        raise EncryptedEnvLoaderException(
+                            "Decryption failed during file processing.",
+                            details=str(e),
+                        ) from e
+                    except Exception as e:
+                        raise EncryptedEnvLoaderException(
+                            "An unexpected error occurred during the load process.",
+                            details=str(e),
+                        ) from e
+        return self._records or None
+
+    def _values(self) -> dict:
+        """
+        Decrypt and parse the file on first use; later calls reuse the result.
+        """
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    # A key read for the index is reused rather than read again
+                    self._data = self._loader.load(self._key).decrypted_data or {}
+                    # The loader's copy is not needed once the mapping owns it
+                    self._loader.decrypted_data = None
+                    self._close_records()
+        return self._data
+
+    def _close_records(self):
+        """
+        Close the records index, if open, and forget the key.
+        """
+        if self._records:
+            self._records.close()
+        self._records = None
+        self._key = None
+
+    def close(self):
+        """
+        Close the records container kept open for lookups and drop the key.
+        Values already decrypted stay available; a closed records mapping
+        reopens the file on the next lookup.
+        """
+        with self._lock:
+            self._close_records()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getitem__(self, key):
+        if self._data is None:
+            records = self._record_file()
+            if records is not None:
+                try:
+                    value = records.get(key)
+                except DecryptionException as e:
+                    raise EncryptedEnvLoaderException(
+                        "Decryption failed during file processing.", details=str(e)
+                    ) from e
+                if value is None:
+                    raise KeyError(key)
+                return value
+        return self._values()[key]
+
+    def __iter__(self):
+        return iter(self._values())
+
+    def __len__(self):
+        return len(self._values())
+
+    def __contains__(self, key):
+        if self._data is None:
+            records = self._record_file()
+            if records is not None:
+                return key in records
+        return key in self._values()
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyEncryptedEnv {self._loader.file_path} ({state})>"
+
+
+class LayeredEnv(Mapping):
+    """
+    Variables merged from several encrypted files, remembering which file
+    each one came from. Later layers override earlier ones.
+    """
+
+    def __init__(self, layers):
+        """
+        :param layers: Iterable of (file path, variables dict), lowest
+            precedence first. The dicts are read once and not kept.
+        """
+        self.layers = []
+        self._values = {}
+        self._sources = {}
+        for path, variables in layers:
+            path = str(path)
+            self.layers.append(path)
+            for name, value in variables.items():
+                self._values[name] = value
+                self._sources[name] = path
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def source(self, name: str) -> str:
+        """
+        :return: Path of the layer that set a variable.
+        :raises KeyError: If no layer sets it.
+        """
+        return self._sources[name]
+
+    def to_os_env(self):
+        """
+        Load the merged variables into os.environ.
+        """
+        os.environ.update(self._values)
+        return self
+
+
+def layer_loaders(file_paths, key_file=None, password=None, keyring=None):
+    """
+    Create one loader per layer and read every distinct key once. With a
+    key agent configured no key is read; the loads go to the agent.
+    :param file_paths: Encrypted files, in layering order.
+    :param key_file: Key file of the layers not in `keyring`.
+    :param password: Password of the layers not in `keyring` (instead of
+        key_file).
+    :param keyring: Optional mapping of file path -> key file of that layer.
+    :return: List of (loader, key) pairs, in the order of `file_paths`.
+    """
+    use_agent = bool(os.environ.get(AGENT_SOCK_ENV))
+    keyring = {os.fspath(path): key for path, key in (keyring or {}).items()}
+    keys = {}
+    loaders = []
+    for path in file_paths:
+        layer_key_file = keyring.get(os.fspath(path))
+        if layer_key_file is not None:
+            loader = EncryptedEnvLoader(path, key_file=layer_key_file)
+            cache_key = os.fspath(layer_key_file)
+        else:
+            loader = EncryptedEnvLoader(path, key_file, password)
+            cache_key = os.fspath(key_file) if password is None else None
+        if cache_key not in keys:
+            keys[cache_key] = None if use_agent else loader.read_key()
+        loaders.append((loader, keys[cache_key]))
+    return loaders
+
+
 # Wrapper function for convenience
-def load_encrypted_env(file_path: str, key_file: str) -> EncryptedEnvLoader:
+def load_encrypted_env(
+    file_path: str, key_file: str = None, password: str = None
+) -> EncryptedEnvLoader:
     """
     Load an encrypted environment variables file and prepare it for use.
     :param file_path: Path to the encrypted environment variables file.
     :param key_file: Path to the encryption key file.
+    :param password: Password of a password-protected file (instead of key_file).
     :return: EncryptedEnvLoader instance
     """
     try:
-        loader = EncryptedEnvLoader(file_path, key_file)
-        loader.load()  # Automatically load decrypted data
+        loader = EncryptedEnvLoader(file_path, key_file, password)
+        # Files decrypted by preload_encrypted_env (possibly in the parent
+        # process of a prefork server) are not decrypted again
+        loader.decrypted_data = preloaded_values(file_path, key_file, password)
+        if loader.decrypted_data is None:
+            loader.load()  # Automatically load decrypted data
         return loader
     except EncryptedEnvLoaderException as e:
         print(e)
         raise
+
+
+async def aload_encrypted_env(
+    file_path: str, key_file: str = None, password: str = None, executor=None
+) -> EncryptedEnvLoader:
+    """
+    Asynchronous `load_encrypted_env`: the work runs in an executor so the
+    event loop stays responsive.
+    :param file_path: Path to the encrypted environment variables file.
+    :param key_file: Path to the encryption key file.
+    :param password: Password of a password-protected file (instead of key_file).
+    :param executor: Optional `concurrent.futures.Executor`; defaults to the
+        loop's thread pool.
+    :return: EncryptedEnvLoader instance
+    """
+    try:
+        loader = EncryptedEnvLoader(file_path, key_file, password)
+        return await loader.aload(executor)
+    except EncryptedEnvLoaderException as e:
+        print(e)
+        raise
+
+
+def load_encrypted_envs(
+    file_paths,
+    key_file: str = None,
+    password: str = None,
+    keyring: dict = None,
+    jobs: int = None,
+) -> LayeredEnv:
+    """
+    Load several encrypted files in parallel and merge them in one pass.
+
+    Each key file is read once, the files are decrypted on a thread pool,
+    and the results are merged in the order given: a variable set by a later
+    file overrides earlier ones, whatever order the loads finish in.
+    :param file_paths: Paths of the encrypted files, lowest precedence first.
+    :param key_file: Path to the encryption key file shared by the files.
+    :param password: Password shared by the files (instead of key_file).
+    :param keyring: Optional mapping of file path -> key file for layers
+        sealed with their own key; other layers use `key_file`.
+    :param jobs: Number of worker threads (default: CPU count).
+    :return: LayeredEnv with the merged variables and their sources.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from envcloak.workers import default_jobs
+
+    try:
+        loaders = layer_loaders(file_paths, key_file, password, keyring)
+        workers = max(1, min(jobs or default_jobs(), len(loaders)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            loaded = executor.map(lambda pair: pair[0].load(pair[1]), loaders)
+            return LayeredEnv(
+                (loader.file_path, loader.decrypted_data) for loader in loaded
+            )
+    except EncryptedEnvLoaderException as e:
+        print(e)
+        raise
+
+
+async def aload_encrypted_envs(
+    file_paths,
+    key_file: str = None,
+    password: str = None,
+    keyring: dict = None,
+    executor=None,
+) -> LayeredEnv:
+    """
+    Asynchronous `load_encrypted_envs`: the files load concurrently in an
+    executor and are merged in the order given.
+    :param file_paths: Paths of the encrypted files, lowest precedence first.
+    :param key_file: Path to the encryption key file shared by the files.
+    :param password: Password shared by the files (instead of key_file).
+    :param keyring: Optional mapping of file path -> key file.
+    :param executor: Optional `concurrent.futures.Executor`.
+    :return: LayeredEnv with the merged variables and their sources.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    try:
+        loaders = await loop.run_in_executor(
+            executor, layer_loaders, file_paths, key_file, password, keyring
+        )
+        loaded = await asyncio.gather(
+            *(loader.aload(executor, key) for loader, key in loaders)
+        )
+        return LayeredEnv(
+            (loader.file_path, loader.decrypted_data) for loader in loaded
+        )
+    except EncryptedEnvLoaderException as e:
+        print(e)
+        raise
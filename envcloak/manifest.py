@@ -0,0 +1,142 @@
+"""
+Manifest of encrypted directory contents, used by `encrypt --incremental`.
+
+For each source file the manifest records its size, modification time,
+SHA-256 digest and the container it was encrypted into. A later run only
+re-encrypts files whose entry no longer matches, and removes outputs of
+files that disappeared. Files with an unchanged size and mtime are skipped
+without being read; a changed mtime alone (e.g. after a fresh checkout)
+costs one hash of the file, not a new ciphertext.
+
+The manifest is stored as a binary container sealed with the same key as
+the files, so it reveals neither names nor digests, and it is replaced
+atomically.
+"""
+
+import os
+import json
+import time
+import hashlib
+from collections import namedtuple
+from envcloak.container import pack, unpack
+from envcloak.utils import atomic_write
+from envcloak.constants import (
+    MANIFEST_FILE,
+    MANIFEST_VERSION,
+    MANIFEST_RACY_WINDOW_NS,
+    STREAM_CHUNK_SIZE,
+)
+from envcloak.exceptions import DecryptionException
+
+ManifestEntry = namedtuple("ManifestEntry", ["size", "mtime_ns", "digest", "container"])
+
+
+def manifest_path(output_dir) -> str:
+    """
+    :return: Location of the manifest in an output directory.
+    """
+    return os.path.join(output_dir, MANIFEST_FILE)
+
+
+def file_digest(path) -> str:
+    """
+    :return: Hex SHA-256 digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(path, key) -> dict:
+    """
+    Read a manifest written by `save_manifest`.
+
+    :param path: Manifest file path.
+    :param key: Key (or PasswordKey) the manifest was sealed with.
+    :return: Dictionary of relative path -> `ManifestEntry`; empty if there
+        is no manifest.
+    :raises DecryptionException: If the manifest was sealed with another key
+        or is damaged.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return {}
+    plaintext, _ = unpack(data, key)
+    try:
+        document = json.loads(plaintext)
+        if document.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported manifest version {document.get('version')}")
+        return {
+            relative: ManifestEntry(**fields)
+            for relative, fields in document["files"].items()
+        }
+    except (ValueError, KeyError, TypeError) as e:
+        raise DecryptionException(details=f"Invalid manifest: {e}") from e
+
+
+def save_manifest(path, entries: dict, key):
+    """
+    Seal and atomically replace a manifest.
+
+    The data is written to a temporary file in the same directory, flushed
+    to disk and renamed over the old manifest, so readers see either the old
+    or the new version, never a partial one. Files modified within the last
+    `MANIFEST_RACY_WINDOW_NS` are recorded without their mtime, since another
+    write in the same clock tick would not change it; the next run hashes
+    them instead.
+
+    :param path: Manifest file path.
+    :param entries: Dictionary of relative path -> `ManifestEntry`.
+    :param key: Key (or PasswordKey) to seal the manifest with.
+    """
+    recent = time.time_ns() - MANIFEST_RACY_WINDOW_NS
+    document = {
+        "version": MANIFEST_VERSION,
+        "files": {
+            relative: (
+                entry if entry.mtime_ns < recent else entry._replace(mtime_ns=0)
+            )._asdict()
+            for relative, entry in sorted(entries.items())
+        },
+    }
+    sealed = pack(json.dumps(document, separators=(",", ":")).encode(), key, "json")
+    atomic_write(path, sealed, prefix=".manifest-")
+
+
+def plan_changes(walk_entries, manifest: dict, container: str, outputs):
+    """
+    Split the files of a directory walk into work to do and work already done.
+
+    :param walk_entries: `WalkEntry` list from `walk_files`.
+    :param manifest: Entries of the previous run (see `load_manifest`).
+    :param container: Container the files are encrypted into this run.
+    :param outputs: Set of relative source paths whose encrypted output
+        currently exists.
+    :return: Tuple of (entries to encrypt, dictionary of unchanged relative
+        path -> refreshed `ManifestEntry`, list of relative paths that were
+        removed from the source).
+    """
+    changed, unchanged = [], {}
+    for entry in walk_entries:
+        previous = manifest.get(entry.relative)
+        if (
+            previous is None
+            or previous.size != entry.size
+            or previous.container != container
+            or entry.relative not in outputs
+        ):
+            changed.append(entry)
+        elif previous.mtime_ns == entry.mtime_ns:
+            unchanged[entry.relative] = previous
+        elif file_digest(entry.path) == previous.digest:
+            # Touched but not modified: keep the ciphertext, remember the mtime
+            unchanged[entry.relative] = previous._replace(mtime_ns=entry.mtime_ns)
+        else:
+            changed.append(entry)
+    present = {entry.relative for entry in walk_entries}
+    removed = sorted(relative for relative in manifest if relative not in present)
+    return changed, unchanged, removed
@@ -0,0 +1,172 @@
+"""
+Decrypt once before forking, share with the workers.
+
+Prefork servers (gunicorn with `preload_app`, uWSGI without `lazy-apps`)
+import the application in a master process and fork the workers from it.
+`preload_encrypted_env` decrypts a file in the master; after that,
+`load_encrypted_env` with the same file and key returns the preloaded
+variables instead of reading the key and decrypting again, in the master
+and in every forked worker, which inherits the data copy-on-write.
+
+What a worker does with inherited data is chosen per file:
+
+- `keep`: use it as is.
+- `verify`: check that the file still hashes to what was decrypted and
+  drop the data if not, so the worker decrypts the new version.
+- `wipe`: clear the values, for workers that must not hold the secrets.
+"""
+
+import os
+import hashlib
+import threading
+from envcloak.constants import (
+    PRELOAD_KEEP,
+    PRELOAD_VERIFY,
+    PRELOAD_WIPE,
+    PRELOAD_POLICIES,
+)
+
+_registry = {}  # (path, key identity) -> _Preloaded
+_lock = threading.Lock()
+_stats = {"decrypts": 0, "avoided": 0, "inherited": 0, "verified": 0, "forks": 0}
+_hooks_registered = False
+
+
+class _Preloaded:
+    __slots__ = ("values", "digest", "policy")
+
+    def __init__(self, values, digest, policy):
+        self.values = values
+        self.digest = digest
+        self.policy = policy
+
+
+def _file_digest(path) -> bytes:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+def _registry_key(file_path, key_file, password):
+    """
+    Identify a file and the key it is opened with; a password is only kept
+    as a digest.
+    """
+    path = os.path.realpath(file_path)
+    if password is not None:
+        return path, "password", hashlib.sha256(password.encode("utf-8")).digest()
+    return path, "key_file", os.path.realpath(key_file) if key_file else None
+
+
+def _before_fork():
+    _lock.acquire()  # pylint: disable=consider-using-with
+
+
+def _after_fork_in_parent():
+    _stats["forks"] += 1
+    _lock.release()
+
+
+def _after_fork_in_child():
+    global _lock  # pylint: disable=global-statement
+    _lock = threading.Lock()
+    _stats.update(decrypts=0, avoided=0, verified=0, forks=0, inherited=0)
+    for registry_key, entry in list(_registry.items()):
+        if entry.policy == PRELOAD_WIPE:
+            entry.values.clear()
+            del _registry[registry_key]
+            continue
+        if entry.policy == PRELOAD_VERIFY:
+            try:
+                unchanged = _file_digest(registry_key[0]) == entry.digest
+            except OSError:
+                unchanged = False
+            if not unchanged:
+                del _registry[registry_key]
+                continue
+            _stats["verified"] += 1
+        _stats["inherited"] += 1
+
+
+def _register_fork_hooks():
+    global _hooks_registered  # pylint: disable=global-statement
+    if not _hooks_registered and hasattr(os, "register_at_fork"):
+        os.register_at_fork(
+            before=_before_fork,
+            after_in_parent=_after_fork_in_parent,
+            after_in_child=_after_fork_in_child,
+        )
+    _hooks_registered = True
+
+
+def preload_encrypted_env(
+    file_path: str,
+    key_file: str = None,
+    password: str = None,
+    in_children: str = PRELOAD_KEEP,
+):
+    """
+    Decrypt a file once so that later loads, here and in forked workers,
+    reuse the result.
+    :param file_path: Path to the encrypted environment variables file.
+    :param key_file: Path to the encryption key file.
+    :param password: Password of a password-protected file (instead of key_file).
+    :param in_children: What forked children do with the data: `keep`,
+        `verify` (drop it if the file changed) or `wipe`.
+    :return: EncryptedEnvLoader holding the decrypted variables.
+    """
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    from envcloak.loader import EncryptedEnvLoader
+
+    if in_children not in PRELOAD_POLICIES:
+        raise ValueError(f"Unknown policy for children {in_children!r}.")
+    loader = EncryptedEnvLoader(file_path, key_file, password)
+    digest = _file_digest(loader.file_path) if loader.file_path.exists() else None
+    loader.load()
+    with _lock:
+        _register_fork_hooks()
+        _stats["decrypts"] += 1
+        _registry[_registry_key(file_path, key_file, password)] = _Preloaded(
+            loader.decrypted_data, digest, in_children
+        )
+    return loader
+
+
+def preloaded_values(file_path, key_file=None, password=None):
+    """
+    Look up preloaded variables, counting the decryption that was avoided.
+    :return: Copy of the variables, or None if the file was not preloaded
+        with this key.
+    """
+    if not _registry:
+        return None
+    with _lock:
+        entry = _registry.get(_registry_key(file_path, key_file, password))
+        if entry is None:
+            return None
+        _stats["avoided"] += 1
+        return dict(entry.values)
+
+
+def clear_preloaded():
+    """
+    Forget all preloaded files and clear their values.
+    """
+    with _lock:
+        for entry in _registry.values():
+            entry.values.clear()
+        _registry.clear()
+
+
+def preload_stats() -> dict:
+    """
+    Counters of this process:
+
+    - `preloaded`: files currently preloaded;
+    - `decrypts`: decryptions done by `preload_encrypted_env`;
+    - `avoided`: loads served from preloaded data instead of decrypting;
+    - `inherited`: preloaded files inherited from the parent at fork;
+    - `verified`: inherited files checked against the file on disk;
+    - `forks`: children forked from this process.
+    """
+    with _lock:
+        return {"pid": os.getpid(), "preloaded": len(_registry), **_stats}
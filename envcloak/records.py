@@ -0,0 +1,612 @@
+"""
+Records container for EnvCloak: one sealed record per variable.
+
+Layout::
+
+    header = magic (4) | version (1) | algorithm (1) | flags (1) | reserved (1)
+             | file id (16) | index nonce (12) | entry count (4)
+             | log offset (8) | [KDF block]
+    index  = AES-256-GCM(entry count * (name hash (16) | offset (8) | length (4)
+                                        | record tag (16)))
+             | tag (16)
+    record = nonce (12) | AES-256-GCM(name length (2) | name | value) | tag (16)
+    log    = entry*, from the log offset to the end of the file
+    entry  = operation (1) | name hash (16) | record length (4) | [record]
+             | chain MAC (16)
+
+Each record is sealed with its own nonce and authenticates the file id and
+the keyed hash of its name as associated data, so records cannot be moved
+between files or between names. The index also holds each record's tag,
+so an older record of the same name cannot be spliced back in its place.
+Names are indexed by a truncated
+HMAC-SHA256 under a key derived for this file, and the index itself is
+sealed with the header as associated data. Looking up one variable reads
+and decrypts the index and a single record; nothing else is touched.
+Updating a variable re-seals only that record and the index, other records
+are copied as they are.
+
+`append_records` (`envcloak set`/`unset`) changes variables without
+rewriting anything: it appends log entries that set a name to a new record
+or remove it. Each entry carries a MAC over itself and the previous MAC,
+starting from the index tag, so readers replay the log by checking MACs
+and updating the index, without decrypting anything. Entries cannot be
+altered, reordered or moved to another file; only dropping entries from
+the end goes unnoticed, as with any append-only file. Compaction folds the
+log into a new index, again copying the sealed records unchanged.
+"""
+
+import os
+import hmac
+import struct
+import threading
+from collections import namedtuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are not serialized across processes
+    fcntl = None
+from envcloak.constants import (
+    NONCE_SIZE,
+    TAG_SIZE,
+    ALGORITHM_AES_256_GCM,
+    FLAG_KDF,
+    RECORDS_MAGIC,
+    RECORDS_VERSION,
+    RECORD_HASH_SIZE,
+    MAX_RECORD_NAME_SIZE,
+    MAX_KDF_BLOCK_SIZE,
+    RECORDS_COMPACT_MIN_BYTES,
+)
+from envcloak.container import resolve_key
+from envcloak.utils import atomic_write
+from envcloak.kdf import decode_kdf_block
+from envcloak.exceptions import (
+    InvalidKeyException,
+    EncryptionException,
+    DecryptionException,
+)
+
+_HEADER = struct.Struct(f">4sBBBB16s{NONCE_SIZE}sIQ")
+_INDEX_ENTRY = struct.Struct(f">{RECORD_HASH_SIZE}sQI{TAG_SIZE}s")
+_NAME_LENGTH = struct.Struct(">H")
+_LOG_ENTRY = struct.Struct(f">B{RECORD_HASH_SIZE}sI")
+_LOG_MAC_SIZE = 16
+_LOG_SET, _LOG_UNSET = 1, 2
+_INDEX_KEY_INFO = b"envcloak records index"
+_LOG_KEY_INFO = b"envcloak records log"
+
+HEADER_SIZE = _HEADER.size
+
+RecordsHeader = namedtuple(
+    "RecordsHeader", ["flags", "file_id", "nonce", "count", "log_offset", "size"]
+)
+
+
+def is_records_container(prefix: bytes) -> bool:
+    """
+    Check whether the given leading bytes belong to a records container.
+
+    :param prefix: First bytes of a file (at least the magic length).
+    :return: True if the bytes start with the records container magic.
+    """
+    return prefix[: len(RECORDS_MAGIC)] == RECORDS_MAGIC
+
+
+def _read_header(data):
+    """
+    Parse and validate a records container header.
+
+    :param data: Leading bytes of the file (the full header, KDF block included).
+    :return: Tuple of (`RecordsHeader`, KDF or None, salt or None).
+    """
+    if len(data) < HEADER_SIZE or not is_records_container(data):
+        raise ValueError("Not an EnvCloak records container.")
+    _, version, algorithm, flags, _, file_id, nonce, count, log_offset = (
+        _HEADER.unpack_from(data)
+    )
+    if version != RECORDS_VERSION:
+        raise ValueError(f"Unsupported records container version: {version}")
+    if algorithm != ALGORITHM_AES_256_GCM:
+        raise ValueError(f"Unsupported algorithm identifier: {algorithm}")
+    kdf, salt, size = None, None, HEADER_SIZE
+    if flags & FLAG_KDF:
+        kdf, salt, size = decode_kdf_block(data, HEADER_SIZE)
+    return RecordsHeader(flags, file_id, nonce, count, log_offset, size), kdf, salt
+
+
+def _index_key(cloak_key, file_id: bytes) -> bytes:
+    return cloak_key.subkey(_INDEX_KEY_INFO, salt=file_id)
+
+
+def _log_mac(log_key: bytes, previous: bytes, entry: bytes) -> bytes:
+    return hmac.digest(log_key, previous + entry, "sha256")[:_LOG_MAC_SIZE]
+
+
+def _name_hash(index_key: bytes, name: str) -> bytes:
+    return hmac.digest(index_key, name.encode("utf-8"), "sha256")[:RECORD_HASH_SIZE]
+
+
+def _seal_record(cloak_key, file_id: bytes, name_hash: bytes, name: str, value: str):
+    encoded = name.encode("utf-8")
+    if len(encoded) > MAX_RECORD_NAME_SIZE:
+        raise ValueError(f"Variable name is too long: {name[:32]}...")
+    payload = _NAME_LENGTH.pack(len(encoded)) + encoded + value.encode("utf-8")
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + cloak_key.seal(nonce, payload, file_id + name_hash)
+
+
+def _open_record(cloak_key, file_id: bytes, name_hash: bytes, record):
+    """
+    :return: Tuple of (name, value) of a sealed record.
+    """
+    if len(record) < NONCE_SIZE + TAG_SIZE:
+        raise ValueError("Truncated record.")
+    payload = cloak_key.unseal(
+        record[:NONCE_SIZE], record[NONCE_SIZE:], file_id + name_hash
+    )
+    (length,) = _NAME_LENGTH.unpack_from(payload)
+    end = _NAME_LENGTH.size + length
+    name = payload[_NAME_LENGTH.size : end].decode("utf-8")
+    return name, payload[end:].decode("utf-8")
+
+
+def _build(cloak_key, kdf_block: bytes, file_id: bytes, records):
+    """
+    Assemble a container from already sealed records.
+
+    :param records: List of (name hash, sealed record bytes).
+    :return: Container bytes.
+    """
+    flags = FLAG_KDF if kdf_block else 0
+    header_size = HEADER_SIZE + len(kdf_block)
+    index_size = len(records) * _INDEX_ENTRY.size + TAG_SIZE
+    offset = header_size + index_size
+    index, body = [], []
+    for name_hash, record in sorted(records):
+        index.append(
+            _INDEX_ENTRY.pack(name_hash, offset, len(record), record[-TAG_SIZE:])
+        )
+        body.append(record)
+        offset += len(record)
+    nonce = os.urandom(NONCE_SIZE)
+    header = (
+        _HEADER.pack(
+            RECORDS_MAGIC,
+            RECORDS_VERSION,
+            ALGORITHM_AES_256_GCM,
+            flags,
+            0,
+            file_id,
+            nonce,
+            len(records),
+            offset,
+        )
+        + kdf_block
+    )
+    return b"".join([header, cloak_key.seal(nonce, b"".join(index), header), *body])
+
+
+def pack_records(entries: dict, key) -> bytes:
+    """
+    Encrypt a mapping of variables into a records container.
+
+    :param entries: Dictionary of variable name -> string value.
+    :param key: Encryption key (32 bytes for AES-256), CloakKey or PasswordKey.
+    :return: Container bytes.
+    """
+    try:
+        kdf_block = getattr(key, "kdf_block", b"")
+        cloak_key = key.cloak_key() if kdf_block else resolve_key(key)
+        file_id = os.urandom(16)
+        index_key = _index_key(cloak_key, file_id)
+        records = []
+        for name, value in entries.items():
+            name_hash = _name_hash(index_key, name)
+            records.append(
+                (name_hash, _seal_record(cloak_key, file_id, name_hash, name, value))
+            )
+        return _build(cloak_key, kdf_block, file_id, records)
+    except InvalidKeyException as e:
+        raise EncryptionException(details=e.details) from e
+    except Exception as e:
+        raise EncryptionException(details=str(e) or type(e).__name__) from e
+
+
+class RecordFile:
+    """
+    Read access to a records container.
+
+    Opening the file authenticates its header and index and replays the
+    log; values are decrypted one record at a time when they are asked for.
+    The file stays open until `close()`, so lookups keep seeing the version
+    that was opened even if the file is replaced in the meantime.
+    """
+
+    def __init__(self, path, key, writable: bool = False):
+        """
+        :param path: Path to the records container.
+        :param key: Decryption key (32 bytes for AES-256), CloakKey or
+            PasswordKey for password-protected files.
+        :param writable: Open for appending, holding an exclusive lock on the
+            file until `close()` so concurrent writers take turns.
+        """
+        self.path = path
+        self._file = _open_locked(path) if writable else open(path, "rb")
+        self._lock = threading.Lock()
+        # End and last MAC of the authenticated log, advanced by _replay
+        self._log_end = 0
+        self._log_mac = b""
+        try:
+            self._load(key)
+        except BaseException:
+            self._file.close()
+            raise
+
+    def _load(self, key):
+        try:
+            prefix = self._file.read(HEADER_SIZE + 2 + MAX_KDF_BLOCK_SIZE)
+            header, kdf, salt = _read_header(prefix)
+            self._cloak_key = resolve_key(key, kdf, salt)
+            self._file_id = header.file_id
+            self._index_key = _index_key(self._cloak_key, header.file_id)
+            self._kdf_block = bytes(prefix[HEADER_SIZE : header.size])
+
+            index_size = header.count * _INDEX_ENTRY.size + TAG_SIZE
+            self._file.seek(header.size)
+            sealed = self._file.read(index_size)
+            if len(sealed) != index_size:
+                raise ValueError("Truncated records index.")
+            index = self._cloak_key.unseal(
+                header.nonce, sealed, bytes(prefix[: header.size])
+            )
+            # Kept as sorted bytes and binary-searched: building a dict would
+            # dominate the cost of opening a large file for one lookup
+            self._index = index
+            self._count = header.count
+            self._changes = {}  # Name hash -> location, or None, from the log
+            self._log_offset = header.log_offset
+            self._log_key = self._cloak_key.subkey(_LOG_KEY_INFO, salt=header.file_id)
+            self._file.seek(header.log_offset)
+            self._replay(self._file.read(), sealed[-TAG_SIZE:], header.log_offset)
+        except InvalidKeyException as e:
+            raise DecryptionException(details=e.details) from e
+        except DecryptionException:
+            raise
+        except Exception as e:
+            raise DecryptionException(details=str(e) or type(e).__name__) from e
+
+    def _replay(self, log, mac: bytes, start: int):
+        """
+        Apply the log entries to the index, checking the MAC chain.
+
+        :param log: Log bytes read from `start` to the end of the file.
+        :param mac: MAC of the entry before `start` (the index tag for the
+            first entry).
+        :param start: File offset of `log`.
+
+        An incomplete entry at the very end (an interrupted append) is
+        ignored and overwritten by the next append.
+        """
+        position = 0
+        while len(log) - position >= _LOG_ENTRY.size:
+            operation, name_hash, length = _LOG_ENTRY.unpack_from(log, position)
+            end = position + _LOG_ENTRY.size + length
+            if end + _LOG_MAC_SIZE > len(log):
+                break
+            if not hmac.compare_digest(
+                log[end : end + _LOG_MAC_SIZE],
+                _log_mac(self._log_key, mac, log[position:end]),
+            ):
+                raise ValueError("Records log entry failed authentication.")
+            mac = log[end : end + _LOG_MAC_SIZE]
+            if operation == _LOG_SET:
+                record_offset = start + position + _LOG_ENTRY.size
+                self._changes[name_hash] = (
+                    record_offset,
+                    length,
+                    log[end - TAG_SIZE : end],
+                )
+            elif operation == _LOG_UNSET:
+                self._changes[name_hash] = None
+            else:
+                raise ValueError(f"Unknown records log operation: {operation}")
+            position = end + _LOG_MAC_SIZE
+        self._log_end = start + position
+        self._log_mac = mac
+
+    @property
+    def log_offset(self) -> int:
+        """
+        :return: File offset where the log starts, i.e. the size of the
+            header, index and indexed records.
+        """
+        return self._log_offset
+
+    @property
+    def log_size(self) -> int:
+        """
+        :return: Bytes of log entries after the indexed records.
+        """
+        return self._log_end - self._log_offset
+
+    def append(self, changes: dict):
+        """
+        Append log entries setting or removing variables (needs `writable`).
+
+        :param changes: Dictionary of variable name -> new value, or None to
+            remove the variable.
+        """
+        entries, mac = [], self._log_mac
+        try:
+            for name, value in changes.items():
+                name_hash = _name_hash(self._index_key, name)
+                if value is None:
+                    entry = _LOG_ENTRY.pack(_LOG_UNSET, name_hash, 0)
+                else:
+                    record = _seal_record(
+                        self._cloak_key, self._file_id, name_hash, name, value
+                    )
+                    entry = _LOG_ENTRY.pack(_LOG_SET, name_hash, len(record)) + record
+                mac = _log_mac(self._log_key, mac, entry)
+                entries.append(entry + mac)
+        except Exception as e:
+            raise EncryptionException(details=str(e) or type(e).__name__) from e
+        data = b"".join(entries)
+        with self._lock:
+            self._file.seek(self._log_end)
+            self._file.truncate()  # Drop a torn entry of an interrupted append
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._replay(data, self._log_mac, self._log_end)
+
+    def rebuild(self, changes: dict = None) -> bytes:
+        """
+        Fold the log and optional changes into a new container with a fresh
+        index. Sealed records are copied as they are; only new values are
+        encrypted.
+
+        :param changes: Dictionary of variable name -> new value, or None to
+            remove the variable.
+        :return: Container bytes.
+        """
+        records = self.raw_records()
+        for name, value in (changes or {}).items():
+            name_hash = _name_hash(self._index_key, name)
+            if value is None:
+                records.pop(name_hash, None)
+            else:
+                records[name_hash] = _seal_record(
+                    self._cloak_key, self._file_id, name_hash, name, value
+                )
+        return _build(
+            self._cloak_key, self._kdf_block, self._file_id, list(records.items())
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Close the underlying file.
+        """
+        self._file.close()
+
+    def _find_indexed(self, name_hash: bytes):
+        """
+        Binary search of the sorted index.
+        :return: (offset, length, tag) of the record, or None.
+        """
+        index, size = self._index, _INDEX_ENTRY.size
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            start = middle * size
+            if index[start : start + RECORD_HASH_SIZE] < name_hash:
+                low = middle + 1
+            else:
+                high = middle
+        start = low * size
+        if low < self._count and index[start : start + RECORD_HASH_SIZE] == name_hash:
+            return _INDEX_ENTRY.unpack_from(index, start)[1:]
+        return None
+
+    def _locate(self, name_hash: bytes):
+        """
+        :return: (offset, length, tag) of the current record of a name, or None.
+        """
+        if name_hash in self._changes:
+            return self._changes[name_hash]
+        return self._find_indexed(name_hash)
+
+    def _locations(self) -> dict:
+        """
+        :return: Dictionary of name hash -> (offset, length, tag) of every
+            current record, the log applied.
+        """
+        locations = {
+            name_hash: (offset, length, tag)
+            for name_hash, offset, length, tag in _INDEX_ENTRY.iter_unpack(self._index)
+        }
+        for name_hash, location in self._changes.items():
+            if location is None:
+                locations.pop(name_hash, None)
+            else:
+                locations[name_hash] = location
+        return locations
+
+    def __len__(self):
+        if not self._changes:
+            return self._count
+        return len(self._locations())
+
+    def __contains__(self, name):
+        return self._locate(_name_hash(self._index_key, name)) is not None
+
+    def _read_sealed(self, location) -> bytes:
+        """
+        Read a sealed record and check it is the one the index or log names.
+        """
+        offset, length, tag = location
+        self._file.seek(offset)
+        record = self._file.read(length)
+        if len(record) != length or not hmac.compare_digest(record[-TAG_SIZE:], tag):
+            raise DecryptionException(details="Record does not match the index.")
+        return record
+
+    def _read(self, name_hash: bytes, location):
+        with self._lock:
+            record = self._read_sealed(location)
+        try:
+            return _open_record(self._cloak_key, self._file_id, name_hash, record)
+        except Exception as e:
+            raise DecryptionException(details=str(e) or type(e).__name__) from e
+
+    def get(self, name: str, default=None):
+        """
+        Decrypt the value of one variable.
+
+        :param name: Variable name.
+        :param default: Returned if the variable is not in the file.
+        :return: Value string, or `default`.
+        """
+        name_hash = _name_hash(self._index_key, name)
+        location = self._locate(name_hash)
+        if location is None:
+            return default
+        stored_name, value = self._read(name_hash, location)
+        if stored_name != name:
+            raise DecryptionException(details=f"Record does not belong to {name}.")
+        return value
+
+    def items(self):
+        """
+        Decrypt every record.
+
+        :return: Iterator of (name, value) pairs, in storage order.
+        """
+        locations = self._locations()
+        for name_hash in sorted(locations, key=locations.get):
+            yield self._read(name_hash, locations[name_hash])
+
+    def to_dict(self) -> dict:
+        """
+        :return: Dictionary of all variables, sorted by name.
+        """
+        return dict(sorted(self.items()))
+
+    def raw_records(self) -> dict:
+        """
+        :return: Dictionary of name hash -> sealed record bytes, for writers
+            that keep records without decrypting them.
+        """
+        records = {}
+        with self._lock:
+            for name_hash, location in self._locations().items():
+                records[name_hash] = self._read_sealed(location)
+        return records
+
+
+def read_records(path, key) -> dict:
+    """
+    Decrypt all variables of a records container.
+
+    :param path: Path to the records container.
+    :param key: Decryption key, CloakKey or PasswordKey.
+    :return: Dictionary of variable name -> value.
+    """
+    with RecordFile(path, key) as records:
+        return records.to_dict()
+
+
+def _open_locked(path):
+    """
+    Open a records container for writing and take an exclusive lock on it.
+
+    A writer that compacts the file replaces it with a new one; anyone who
+    locked the old file in the meantime notices and locks the new one.
+    """
+    while True:
+        f = open(path, "r+b")  # pylint: disable=consider-using-with
+        if fcntl is None:
+            return f
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            if os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                return f
+        except FileNotFoundError:
+            pass
+        except BaseException:
+            f.close()
+            raise
+        f.close()
+
+
+def update_records(path, changes: dict, key):
+    """
+    Set or remove variables of a records container by rewriting it.
+
+    Only the changed records and the index are sealed again; every other
+    record is copied byte for byte. The file is replaced atomically.
+
+    :param path: Path to the records container.
+    :param changes: Dictionary of variable name -> new value, or None to
+        remove the variable.
+    :param key: Key (or PasswordKey) the file was sealed with.
+    """
+    with RecordFile(path, key, writable=True) as current:
+        atomic_write(path, current.rebuild(changes), prefix=".records-")
+
+
+def compact_records(path, key):
+    """
+    Fold the log of a records container into its index.
+
+    :param path: Path to the records container.
+    :param key: Key (or PasswordKey) the file was sealed with.
+    """
+    update_records(path, {}, key)
+
+
+def append_records(path, changes: dict, key, auto_compact: bool = True) -> bool:
+    """
+    Set or remove variables by appending to the log of a records container.
+
+    The cost depends on the size of the change, not of the file. When the
+    log has grown past the indexed records (and `RECORDS_COMPACT_MIN_BYTES`)
+    the file is compacted as well.
+
+    :param path: Path to the records container.
+    :param changes: Dictionary of variable name -> new value, or None to
+        remove the variable.
+    :param key: Key (or PasswordKey) the file was sealed with.
+    :param auto_compact: Compact when the log is large.
+    :return: Whether the file was compacted.
+    """
+    with RecordFile(path, key, writable=True) as current:
+        current.append(changes)
+        base_size = current.log_offset
+        if auto_compact and current.log_size > max(
+            base_size, RECORDS_COMPACT_MIN_BYTES
+        ):
+            atomic_write(path, current.rebuild(), prefix=".records-")
+            return True
+    return False
+
+
+def format_dotenv(entries: dict) -> str:
+    """
+    Serialize variables as a .env document that python-dotenv reads back
+    unchanged (single quotes: no interpolation, newlines kept).
+
+    :param entries: Dictionary of variable name -> value.
+    :return: .env text.
+    """
+    lines = []
+    for name, value in entries.items():
+        escaped = value.replace("\\", "\\\\").replace("'", "\\'")
+        lines.append(f"{name}='{escaped}'\n")
+    return "".join(lines)
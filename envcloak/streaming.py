@@ -0,0 +1,211 @@
+"""
+Chunked streaming container for EnvCloak.
+
+Layout::
+
+    header  = magic (4) | version (1) | chunk size (4) | nonce prefix (7)
+    segment = AES-256-GCM(chunk) | tag (16)   -- repeated, last one may be short
+
+Every segment is sealed with its own nonce built from the random prefix,
+the segment index and a "last segment" flag, and the header is bound to
+each segment as associated data. Reordering, dropping, truncating or
+appending segments therefore fails authentication.
+"""
+
+import os
+import struct
+from envcloak.constants import (
+    STREAM_MAGIC,
+    STREAM_VERSION,
+    STREAM_CHUNK_SIZE,
+    STREAM_MAX_CHUNK_SIZE,
+    STREAM_NONCE_PREFIX_SIZE,
+    TAG_SIZE,
+)
+from envcloak.keys import as_cloak_key
+from envcloak.exceptions import (
+    InvalidKeyException,
+    EncryptionException,
+    DecryptionException,
+)
+
+_HEADER = struct.Struct(f">4sBI{STREAM_NONCE_PREFIX_SIZE}s")
+_NONCE_SUFFIX = struct.Struct(">IB")
+_MAX_SEGMENTS = 2**32
+
+HEADER_SIZE = _HEADER.size
+
+
+def is_stream_header(prefix: bytes) -> bool:
+    """
+    Check whether the given leading bytes belong to a streaming container.
+
+    :param prefix: First bytes of a file (at least the magic length).
+    :return: True if the bytes start with the streaming magic.
+    """
+    return prefix[: len(STREAM_MAGIC)] == STREAM_MAGIC
+
+
+def _check_chunk_size(chunk_size: int):
+    if not 0 < chunk_size <= STREAM_MAX_CHUNK_SIZE:
+        raise ValueError(
+            f"Chunk size must be between 1 and {STREAM_MAX_CHUNK_SIZE} bytes, "
+            f"got {chunk_size}."
+        )
+
+
+def _segment_nonce(prefix: bytes, index: int, last: bool) -> bytes:
+    if index >= _MAX_SEGMENTS:
+        raise ValueError("Too many segments for a single stream.")
+    return prefix + _NONCE_SUFFIX.pack(index, 1 if last else 0)
+
+
+def _read_exact(stream, size: int) -> bytes:
+    """
+    Read up to `size` bytes, retrying short reads until EOF (pipes, sockets).
+    """
+    data = stream.read(size)
+    if len(data) == size or not data:
+        return data
+    parts = [data]
+    remaining = size - len(data)
+    while remaining:
+        more = stream.read(remaining)
+        if not more:
+            break
+        parts.append(more)
+        remaining -= len(more)
+    return b"".join(parts)
+
+
+def encrypt_stream(infile, outfile, key: bytes, chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    Encrypt a binary stream into the chunked streaming container.
+
+    Memory use is bounded by two chunks, and every segment is written as soon
+    as it is sealed.
+
+    :param infile: Readable binary file object with the plaintext.
+    :param outfile: Writable binary file object for the container.
+    :param key: Encryption key (32 bytes for AES-256).
+    :param chunk_size: Plaintext bytes sealed per segment.
+    """
+    try:
+        _check_chunk_size(chunk_size)
+        cloak_key = as_cloak_key(key)
+        prefix = os.urandom(STREAM_NONCE_PREFIX_SIZE)
+        header = _HEADER.pack(STREAM_MAGIC, STREAM_VERSION, chunk_size, prefix)
+        outfile.write(header)
+
+        index = 0
+        chunk = _read_exact(infile, chunk_size)
+        while True:
+            # Read one chunk ahead so the final segment can be flagged as such
+            next_chunk = (
+                _read_exact(infile, chunk_size) if len(chunk) == chunk_size else b""
+            )
+            last = not next_chunk
+            nonce = _segment_nonce(prefix, index, last)
+            outfile.write(cloak_key.seal(nonce, chunk, header))
+            if last:
+                break
+            chunk = next_chunk
+            index += 1
+    except InvalidKeyException as e:
+        raise EncryptionException(details=e.details) from e
+    except EncryptionException:
+        raise
+    except Exception as e:
+        raise EncryptionException(details=str(e) or type(e).__name__) from e
+
+
+def iter_decrypt_stream(infile, key: bytes):
+    """
+    Decrypt a chunked streaming container one segment at a time.
+
+    Each segment is authenticated before its plaintext is yielded, so
+    memory stays bounded by two segments.
+
+    :param infile: Readable binary file object positioned at the header.
+    :param key: Decryption key (32 bytes for AES-256).
+    :return: Iterator of plaintext chunks.
+    """
+    try:
+        cloak_key = as_cloak_key(key)
+        header = _read_exact(infile, HEADER_SIZE)
+        if len(header) != HEADER_SIZE or not is_stream_header(header):
+            raise ValueError("Not an EnvCloak streaming container.")
+        _, version, chunk_size, prefix = _HEADER.unpack(header)
+        if version != STREAM_VERSION:
+            raise ValueError(f"Unsupported streaming container version: {version}")
+        _check_chunk_size(chunk_size)
+
+        segment_size = chunk_size + TAG_SIZE
+        index = 0
+        segment = _read_exact(infile, segment_size)
+        while True:
+            next_segment = (
+                _read_exact(infile, segment_size)
+                if len(segment) == segment_size
+                else b""
+            )
+            last = not next_segment
+            nonce = _segment_nonce(prefix, index, last)
+            yield cloak_key.unseal(nonce, segment, header)
+            if last:
+                break
+            segment = next_segment
+            index += 1
+    except InvalidKeyException as e:
+        raise DecryptionException(details=e.details) from e
+    except DecryptionException:
+        raise
+    except Exception as e:
+        raise DecryptionException(details=str(e) or type(e).__name__) from e
+
+
+def decrypt_stream(infile, outfile, key: bytes):
+    """
+    Decrypt a chunked streaming container into a binary stream.
+
+    Each segment is authenticated before its plaintext is written, so output
+    starts flowing after the first segment while memory stays bounded.
+
+    :param infile: Readable binary file object positioned at the header.
+    :param outfile: Writable binary file object for the plaintext.
+    :param key: Decryption key (32 bytes for AES-256).
+    """
+    try:
+        for chunk in iter_decrypt_stream(infile, key):
+            outfile.write(chunk)
+    except DecryptionException:
+        raise
+    except Exception as e:
+        raise DecryptionException(details=str(e) or type(e).__name__) from e
+
+
+class ChunkReader:
+    """
+    Minimal readable binary file object over an iterator of byte chunks,
+    e.g. to feed `iter_decrypt_stream` into `encrypt_stream`.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        :param size: Maximum number of bytes; all remaining if negative.
+        :return: Up to `size` bytes, or b"" at the end.
+        """
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
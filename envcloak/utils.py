@@ -1,5 +1,8 @@
 import os
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
+from envcloak.walker import walk_files
 
 
 def add_to_gitignore(directory: str, filename: str):
@@ -42,10 +45,7 @@ def calculate_required_space(input=None, directory=None):
         return os.path.getsize(input)
 
     if directory:
-        total_size = sum(
-            file.stat().st_size for file in Path(directory).rglob("*") if file.is_file()
-        )
-        return total_size
+        return sum(entry.size for entry in walk_files(directory))
 
     return 0
 
@@ -60,3 +60,50 @@ def debug_log(message, debug):
     """
     if debug:
         print(message)
+
+
+@contextmanager
+def atomic_replace(path, prefix: str = ".envcloak-"):
+    """
+    Replace a file atomically with whatever is written to a temporary path.
+
+    Yields the path of an empty temporary file in the same directory. When
+    the block completes, that file is flushed to disk and renamed over the
+    target, so readers see either the old or the new version, never a
+    partial one. If the block raises, the temporary file is removed. An
+    existing target keeps its permissions.
+
+    :param path: File to replace.
+    :param prefix: Name prefix of the temporary file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=prefix, dir=directory)
+    os.close(fd)
+    try:
+        try:
+            os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        yield temp_path
+        with open(temp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write(path, data: bytes, prefix: str = ".envcloak-"):
+    """
+    Replace a file atomically; see `atomic_replace`.
+
+    :param path: File to replace.
+    :param data: New contents.
+    :param prefix: Name prefix of the temporary file.
+    """
+    with atomic_replace(path, prefix) as temp_path:
+        with open(temp_path, "wb") as f:
+            f.write(data)
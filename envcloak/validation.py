@@ -1,6 +1,8 @@
 import os
 from pathlib import Path
 import shutil
+import click
+from envcloak.utils import debug_log
 from envcloak.exceptions import (
     KeyFileNotFoundException,
     InvalidSaltException,
@@ -69,6 +71,34 @@ def check_permissions(file_path: str, write: bool = False):
         raise PermissionError(f"Read permission denied: {file_path}")
 
 
+def check_key_options(key_file: str, password: str, debug: bool = False):
+    """Check that exactly one of --key-file and --password is given and the key file is readable."""
+    if not key_file and not password:
+        raise click.UsageError("You must provide either --key-file or --password.")
+    if key_file and password:
+        raise click.UsageError(
+            "You must provide either --key-file or --password, not both."
+        )
+    if key_file:
+        debug_log(f"Debug: Validating key file {key_file}.", debug)
+        check_file_exists(key_file)
+        check_permissions(key_file)
+
+
+def read_key(key_file: str, password: str, debug: bool = False, kdf=None):
+    """Validate the key options and read the key: raw bytes, or a PasswordKey using `kdf`."""
+    check_key_options(key_file, password, debug)
+    if password:
+        # pylint: disable-next=import-outside-toplevel
+        from envcloak.kdf import PasswordKey
+
+        return PasswordKey(password, kdf)
+    with open(key_file, "rb") as kf:
+        key = kf.read()
+    debug_log(f"Debug: Key file {key_file} read successfully.", debug)
+    return key
+
+
 def check_disk_space(output_path: str, required_space: int):
     """Check if there is enough disk space at the output path."""
     output_dir = Path(output_path).parent
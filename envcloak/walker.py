@@ -0,0 +1,124 @@
+"""
+Recursive directory walking for the `--directory` modes of the CLI.
+
+The tree is walked once with `os.scandir`, which reports file types without
+an extra `stat` per entry. Excluded directories are pruned before they are
+entered, and each file's size is read once and shared by the disk space
+check and the job scheduler.
+"""
+
+import os
+from fnmatch import fnmatch
+from collections import namedtuple
+from envcloak.constants import IGNORE_FILE
+
+# `relative` is relative to the walked directory, with "/" separators
+WalkEntry = namedtuple("WalkEntry", ["path", "relative", "size", "mtime_ns"])
+
+
+def read_ignore_file(directory: str) -> list:
+    """
+    Read exclude patterns from the `.envcloakignore` file of a directory.
+
+    Blank lines and lines starting with "#" are skipped.
+
+    :param directory: Directory that may contain the ignore file.
+    :return: List of patterns (empty if there is no ignore file).
+    """
+    try:
+        with open(os.path.join(directory, IGNORE_FILE), encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+    except FileNotFoundError:
+        return []
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def matches(relative: str, patterns, is_dir: bool = False) -> bool:
+    """
+    Check a path against glob patterns.
+
+    Patterns without a "/" match the name at any depth (``*.bak``), others
+    match the whole relative path (``prod/*.env``). A trailing "/" restricts
+    a pattern to directories (``cache/``).
+
+    :param relative: Path relative to the walked directory, "/"-separated.
+    :param patterns: Iterable of glob patterns.
+    :param is_dir: Whether the path is a directory.
+    :return: True if any pattern matches.
+    """
+    name = relative.rsplit("/", 1)[-1]
+    for pattern in patterns:
+        if pattern.endswith("/"):
+            if not is_dir:
+                continue
+            pattern = pattern.rstrip("/")
+        target = relative if "/" in pattern else name
+        if fnmatch(target, pattern.lstrip("/")):
+            return True
+    return False
+
+
+def walk_files(
+    directory: str,
+    include=(),
+    exclude=(),
+    suffix: str = None,
+    use_ignore_file: bool = True,
+    skip=None,
+    stat: bool = True,
+):
+    """
+    Recursively list the files of a directory.
+
+    :param directory: Directory to walk.
+    :param include: Glob patterns a file must match (any of them) to be
+        listed; all files are listed if empty.
+    :param exclude: Glob patterns of files and directories to leave out.
+        Excluded directories are not entered.
+    :param suffix: Only list files whose name ends with this suffix.
+    :param use_ignore_file: Also exclude the patterns of `.envcloakignore`.
+    :param skip: Optional path of a directory to leave out, such as an
+        output directory located inside the input directory.
+    :param stat: Read sizes and mtimes; when False they are None and no
+        `stat` call is made per file.
+    :return: List of `WalkEntry` (path, relative path, size, mtime), in
+        sorted path order.
+    """
+    exclude = list(exclude)
+    if use_ignore_file:
+        exclude += read_ignore_file(directory)
+    skip = os.path.realpath(skip) if skip else None
+
+    entries = []
+    pending = [(directory, "")]
+    while pending:
+        path, prefix = pending.pop()
+        with os.scandir(path) as scan:
+            found = sorted(scan, key=lambda entry: entry.name)
+        subdirs = []
+        for entry in found:
+            relative = prefix + entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if exclude and matches(relative, exclude, is_dir=True):
+                    continue
+                if skip and os.path.realpath(entry.path) == skip:
+                    continue
+                subdirs.append((entry.path, relative + "/"))
+            elif entry.is_file():
+                if not prefix and entry.name == IGNORE_FILE:
+                    continue
+                if suffix and not entry.name.endswith(suffix):
+                    continue
+                if include and not matches(relative, include):
+                    continue
+                if exclude and matches(relative, exclude):
+                    continue
+                if stat:
+                    info = entry.stat()
+                    entries.append(
+                        WalkEntry(entry.path, relative, info.st_size, info.st_mtime_ns)
+                    )
+                else:
+                    entries.append(WalkEntry(entry.path, relative, None, None))
+        pending.extend(reversed(subdirs))
+    return sorted(entries, key=lambda entry: entry.relative)
@@ -0,0 +1,277 @@
+"""
+Hot reloading of encrypted environment files.
+
+`EnvFileWatcher` follows one encrypted file from a background thread. On
+Linux it sleeps on inotify events for the file's directory (which also
+catches editors and `encrypt --force` replacing the file by rename);
+elsewhere, or if inotify is unavailable, it polls `os.stat`. Bursts of
+writes are debounced, the file is only decrypted again when the SHA-256 of
+its bytes changed, and callbacks receive a key-level diff, so unchanged
+variables are never touched.
+"""
+
+import os
+import sys
+import errno
+import select
+import struct
+import time
+import hashlib
+import threading
+from collections import namedtuple
+from envcloak.loader import EncryptedEnvLoader
+from envcloak.constants import WATCH_DEBOUNCE_SECONDS, WATCH_POLL_INTERVAL
+from envcloak.exceptions import EncryptedEnvLoaderException
+
+EnvDiff = namedtuple("EnvDiff", ["added", "changed", "removed"])
+EnvDiff.__doc__ = """
+Changes between two versions of a file: `added` and `changed` map names to
+their new values, `removed` is a set of names.
+"""
+
+# inotify(7) constants; IN_NONBLOCK/IN_CLOEXEC equal O_NONBLOCK/O_CLOEXEC
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def diff_env(old: dict, new: dict) -> EnvDiff:
+    """
+    Compare two sets of variables.
+    :return: EnvDiff from `old` to `new`.
+    """
+    added = {name: value for name, value in new.items() if name not in old}
+    changed = {
+        name: value for name, value in new.items() if name in old and old[name] != value
+    }
+    removed = {name for name in old if name not in new}
+    return EnvDiff(added, changed, removed)
+
+
+class _Inotify:
+    """
+    Minimal inotify binding (via ctypes) watching one directory.
+    """
+
+    def __init__(self, directory: str):
+        import ctypes  # pylint: disable=import-outside-toplevel
+        import ctypes.util  # pylint: disable=import-outside-toplevel
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), _IN_WATCH_MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"inotify_add_watch failed for {directory}")
+
+    def names(self):
+        """
+        Drain pending events.
+        :return: Set of file names (bytes) that had events.
+        """
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return names
+                raise
+            offset = 0
+            while offset + _INOTIFY_EVENT.size <= len(data):
+                _, _, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+                start = offset + _INOTIFY_EVENT.size
+                names.add(data[start : start + length].rstrip(b"\0"))
+                offset = start + length
+
+    def close(self):
+        os.close(self.fd)
+
+
+class EnvFileWatcher:
+    """
+    Reload an encrypted environment file when it changes.
+
+    Call `start()` to watch from a daemon thread, or `check()` to look for
+    a change once. Every detected change is passed to the registered
+    callbacks as `callback(diff, watcher)`; with `apply_to_environ` only the
+    added, changed and removed variables are written to `os.environ`.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        key_file: str = None,
+        password: str = None,
+        on_change=None,
+        on_error=None,
+        apply_to_environ: bool = False,
+        debounce: float = WATCH_DEBOUNCE_SECONDS,
+        poll_interval: float = WATCH_POLL_INTERVAL,
+        use_inotify: bool = None,
+    ):
+        """
+        :param file_path: Path to the encrypted environment variables file.
+        :param key_file: Path to the encryption key file.
+        :param password: Password of a password-protected file (instead of key_file).
+        :param on_change: Optional callback, see `add_callback`.
+        :param on_error: Optional `callback(exception, watcher)` for reloads
+            that fail (e.g. a file sealed with another key); the previous
+            values are kept.
+        :param apply_to_environ: Write changed variables to `os.environ`.
+        :param debounce: Seconds without further writes before reloading.
+        :param poll_interval: Seconds between `stat` checks; with inotify
+            these are only a safety net.
+        :param use_inotify: Force (True) or disable (False) inotify; by
+            default it is used when available.
+        """
+        self._loader = EncryptedEnvLoader(file_path, key_file, password)
+        self.file_path = self._loader.file_path
+        self.on_error = on_error
+        self.apply_to_environ = apply_to_environ
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.values = {}
+        self._callbacks = [on_change] if on_change else []
+        self._digest = None
+        self._stat = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_callback(self, callback):
+        """
+        Register `callback(diff, watcher)`, called after every change.
+        """
+        self._callbacks.append(callback)
+        return callback
+
+    def _stat_key(self):
+        try:
+            info = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return (info.st_ino, info.st_size, info.st_mtime_ns)
+
+    def check(self):
+        """
+        Reload the file if its contents changed.
+
+        The file is hashed first and only decrypted and parsed when the
+        hash differs from the last load.
+        :return: EnvDiff of the change, or None if nothing changed.
+        :raises EncryptedEnvLoaderException: If the file cannot be loaded.
+        """
+        with self._lock:
+            self._stat = self._stat_key()
+            try:
+                with open(self.file_path, "rb") as f:
+                    digest = hashlib.sha256(f.read()).digest()
+            except OSError as e:
+                raise EncryptedEnvLoaderException(
+                    "Failed to read the watched file.", details=str(e)
+                ) from e
+            if digest == self._digest:
+                return None
+            new_values = self._loader.load().decrypted_data or {}
+            self._loader.decrypted_data = None
+            self._digest = digest
+            diff = diff_env(self.values, new_values)
+            self.values = new_values
+        if not (diff.added or diff.changed or diff.removed):
+            return None
+        if self.apply_to_environ:
+            os.environ.update(diff.added)
+            os.environ.update(diff.changed)
+            for name in diff.removed:
+                os.environ.pop(name, None)
+        for callback in self._callbacks:
+            callback(diff, self)
+        return diff
+
+    def start(self):
+        """
+        Load the file and start watching it from a daemon thread.
+        :return: This watcher.
+        """
+        self.check()
+        self._stop.clear()
+        inotify = None
+        if self.use_inotify is not False and sys.platform.startswith("linux"):
+            try:
+                inotify = _Inotify(os.path.dirname(os.path.abspath(self.file_path)))
+            except (OSError, AttributeError, TypeError):
+                if self.use_inotify:
+                    raise
+        self._thread = threading.Thread(
+            target=self._run, args=(inotify,), name="envcloak-watcher", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop watching and wait for the thread to end.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _wait(self, inotify, timeout: float) -> bool:
+        """
+        Sleep until an event for the watched file or the timeout.
+        :return: True if the file had an event.
+        """
+        if inotify is None:
+            self._stop.wait(timeout)
+            return False
+        # Short slices so that stop() is noticed promptly
+        deadline = time.monotonic() + timeout
+        name = os.fsencode(self.file_path.name)
+        while not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            ready, _, _ = select.select([inotify.fd], [], [], min(remaining, 0.1))
+            if ready and name in inotify.names():
+                return True
+        return False
+
+    def _run(self, inotify):
+        try:
+            while not self._stop.is_set():
+                event = self._wait(inotify, self.poll_interval)
+                if not event and self._stat_key() == self._stat:
+                    continue
+                # Debounce: reload once the file has been quiet for a while
+                seen = self._stat_key()
+                while not self._stop.is_set():
+                    event = self._wait(inotify, self.debounce)
+                    current = self._stat_key()
+                    if not event and current == seen:
+                        break
+                    seen = current
+                if self._stop.is_set():
+                    return
+                try:
+                    self.check()
+                except Exception as e:  # pylint: disable=broad-except
+                    if self.on_error is not None:
+                        self.on_error(e, self)
+        finally:
+            if inotify is not None:
+                inotify.close()
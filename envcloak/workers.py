@@ -0,0 +1,98 @@
+"""
+Parallel processing of per-file jobs for the `--directory` modes of the CLI.
+
+Jobs run on a thread pool: file I/O and the OpenSSL primitives behind
+`cryptography` release the GIL, and threads share the (possibly
+password-derived) key without pickling it. The largest files are scheduled
+first so that a big file picked up last does not leave the other workers
+idle at the end of a batch. An optional byte budget bounds how much data is
+being processed at once.
+"""
+
+import os
+import math
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+FileJob = namedtuple("FileJob", ["source", "target", "size"])
+JobResult = namedtuple("JobResult", ["job", "error"])
+
+
+def default_jobs() -> int:
+    """
+    :return: Number of workers used when `--jobs` is not given (CPU count).
+    """
+    return os.cpu_count() or 1
+
+
+def run_file_jobs(jobs, func, workers: int = None, on_result=None, max_bytes=None):
+    """
+    Run `func(job)` for every job, largest file first.
+
+    A job that raises does not stop the others; its exception is recorded
+    in the result instead.
+
+    :param jobs: Iterable of `FileJob`.
+    :param func: Callable taking a `FileJob`.
+    :param workers: Number of worker threads; defaults to `default_jobs()`.
+    :param on_result: Optional callable invoked with each `JobResult` in
+        completion order, from the calling thread.
+    :param max_bytes: Optional cap on the summed `size` of running jobs. A
+        job waits until it fits; a job larger than the cap runs alone.
+    :return: List of `JobResult` sorted by source path, independent of the
+        order in which jobs finished.
+    """
+    queue = deque(sorted(jobs, key=lambda job: (-job.size, str(job.source))))
+    workers = workers or default_jobs()
+    max_bytes = math.inf if max_bytes is None else max_bytes
+    running = {}
+    in_flight = 0
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while queue or running:
+            # Submit no more than the pool can run, so queued jobs do not
+            # count against the byte budget
+            while (
+                queue
+                and len(running) < workers
+                and (not running or in_flight + queue[0].size <= max_bytes)
+            ):
+                job = queue.popleft()
+                running[pool.submit(func, job)] = job
+                in_flight += job.size
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                in_flight -= job.size
+                error = future.exception()
+                if error is not None and not isinstance(error, Exception):
+                    raise error  # KeyboardInterrupt and friends end the batch
+                result = JobResult(job, error)
+                results.append(result)
+                if on_result is not None:
+                    on_result(result)
+    return sorted(results, key=lambda result: str(result.job.source))
+
+
+def summarize(results, verb: str, skipped: int = 0, skip_reason: str = "") -> str:
+    """
+    Build the summary printed after a batch.
+    :param results: Results returned by `run_file_jobs`.
+    :param verb: Past-tense action, e.g. "Encrypted".
+    :param skipped: Successful jobs that had nothing to do.
+    :param skip_reason: Why they were skipped, e.g. "already under the new key".
+    :return: Summary text; failed files are listed in path order.
+    """
+    failed = [result for result in results if result.error is not None]
+    done = len(results) - len(failed) - skipped
+    if skipped:
+        lines = [
+            f"{verb} {done} of {len(results)} file(s), skipped {skipped}"
+            + (f" ({skip_reason})." if skip_reason else ".")
+        ]
+    else:
+        lines = [f"{verb} {done} of {len(results)} file(s)."]
+    if failed:
+        lines.append(f"{len(failed)} file(s) failed:")
+        lines.extend(f"  {result.job.source}: {result.error}" for result in failed)
+    return "\n".join(lines)
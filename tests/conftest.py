@@ -0,0 +1,57 @@
+import os
+import pytest
+from envcloak.constants import KEY_SIZE
+from envcloak.encryptor import encrypt_file_binary
+
+
+@pytest.fixture
+def key():
+    """
+    Fixture for a random encryption key.
+    """
+    return os.urandom(KEY_SIZE)
+
+
+@pytest.fixture
+def key_file(tmp_path, key):
+    """
+    Fixture for a key file holding `key`.
+    """
+    path = tmp_path / "mykey.key"
+    path.write_bytes(key)
+    return path
+
+
+@pytest.fixture
+def write_env(tmp_path, key_file):
+    """
+    Fixture that encrypts .env content into variables.env.enc, leaving no
+    plaintext behind.
+    """
+    encrypted = tmp_path / "variables.env.enc"
+
+    def write(content):
+        source = tmp_path / "variables.env"
+        source.write_text(content)
+        encrypt_file_binary(source, encrypted, key_file.read_bytes())
+        source.unlink()
+        return encrypted
+
+    return write
+
+
+@pytest.fixture
+def env_content():
+    """
+    Fixture for the .env content of `encrypted`; override it in a module for
+    other variables.
+    """
+    return "DB_USERNAME=example_username\n"
+
+
+@pytest.fixture
+def encrypted(write_env, env_content):
+    """
+    Fixture for an encrypted .env file.
+    """
+    return write_env(env_content)
@@ -0,0 +1,233 @@
+import os
+import socket
+import stat
+import threading
+import pytest
+from unittest.mock import patch
+from click.testing import CliRunner
+from envcloak.agent import (
+    AgentClient,
+    AgentServer,
+    KeyStore,
+    encode_message,
+    decode_body,
+)
+from envcloak.cli import main
+from envcloak.constants import KEY_SIZE, AGENT_SOCK_ENV
+from envcloak.encryptor import encrypt_file_binary
+from envcloak.exceptions import (
+    AgentUnavailableException,
+    EncryptedEnvLoaderException,
+)
+from envcloak.kdf import PBKDF2KDF, PasswordKey, get_kdf, clear_key_cache
+from envcloak.loader import (
+    EncryptedEnvLoader,
+    LazyEncryptedEnv,
+    load_encrypted_env,
+)
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets"
+)
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    """
+    Fixture running an agent in a thread, with ENVCLOAK_AGENT_SOCK set.
+    """
+    server = AgentServer(tmp_path / "agent.sock")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv(AGENT_SOCK_ENV, server.socket_path)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_message_framing():
+    """
+    Test that frames round-trip and truncated bodies are rejected.
+    """
+    frame = encode_message(3, [b"k", "/path/to/key", b""])
+    assert decode_body(frame[4:]) == (3, [b"k", b"/path/to/key", b""])
+    with pytest.raises(ValueError):
+        decode_body(frame[4:-3])
+
+
+def test_agent_socket_is_private(agent):
+    """
+    Test the socket mode and that a second agent cannot take over the socket.
+    """
+    assert stat.S_IMODE(os.stat(agent.socket_path).st_mode) == 0o600
+    assert AgentClient(agent.socket_path).ping()
+    with pytest.raises(OSError):
+        AgentServer(agent.socket_path)
+
+
+def test_loader_uses_agent(agent, encrypted, key_file):
+    """
+    Test that the loader lets the agent read the key and decrypt.
+    """
+    with patch.object(EncryptedEnvLoader, "read_key", side_effect=AssertionError):
+        loader = load_encrypted_env(encrypted, key_file=key_file)
+        assert loader.decrypted_data == {"DB_USERNAME": "example_username"}
+
+        # The agent keeps the key after the file is gone
+        key_file.rename(key_file.with_suffix(".moved"))
+        assert load_encrypted_env(encrypted, key_file=key_file).decrypted_data
+
+    wrong_key = key_file.parent / "wrong.key"
+    wrong_key.write_bytes(os.urandom(KEY_SIZE))
+    with pytest.raises(EncryptedEnvLoaderException, match="Decryption failed"):
+        load_encrypted_env(encrypted, key_file=wrong_key)
+
+
+def test_agent_derives_password_keys_once(agent, tmp_path):
+    """
+    Test that password-protected files cost one derivation per salt.
+    """
+    source = tmp_path / "variables.env"
+    source.write_text("TOKEN=secret\n")
+    path = tmp_path / "variables.env.enc"
+    encrypt_file_binary(
+        source, path, PasswordKey("hunter2", get_kdf("pbkdf2", iterations=1000))
+    )
+    clear_key_cache()
+    real_derive = PBKDF2KDF._derive
+    derivations = []
+
+    def counting_derive(self, *args):
+        derivations.append(args)
+        return real_derive(self, *args)
+
+    with patch.object(PBKDF2KDF, "_derive", counting_derive):
+        for _ in range(3):
+            loader = load_encrypted_env(path, password="hunter2")
+            assert loader.decrypted_data["TOKEN"] == "secret"
+    assert len(derivations) == 1
+
+
+def test_loader_falls_back_without_agent(encrypted, key_file, monkeypatch, tmp_path):
+    """
+    Test that an unreachable agent is ignored.
+    """
+    monkeypatch.setenv(AGENT_SOCK_ENV, str(tmp_path / "missing.sock"))
+    loader = load_encrypted_env(encrypted, key_file=key_file)
+    assert loader.decrypted_data == {"DB_USERNAME": "example_username"}
+
+
+def test_cli_uses_agent(agent, key_file, tmp_path):
+    """
+    Test that `encrypt` and `decrypt` of a single file go through the agent.
+    """
+    keys = KeyStore()
+    agent.keys = keys
+    source = tmp_path / "plain.env"
+    source.write_text("A=1\n")
+    runner = CliRunner()
+    result = runner.invoke(
+        main,
+        [
+            "encrypt",
+            "-i",
+            str(source),
+            "-o",
+            str(tmp_path / "plain.env.enc"),
+            "-k",
+            str(key_file),
+            "--container",
+            "binary",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert "using the agent" in result.output
+    result = runner.invoke(
+        main,
+        [
+            "decrypt",
+            "-i",
+            str(tmp_path / "plain.env.enc"),
+            "-o",
+            str(tmp_path / "out.env"),
+            "-k",
+            str(key_file),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert "using the agent" in result.output
+    assert (tmp_path / "out.env").read_text() == "A=1\n"
+    assert len(keys._key_files) == 1
+
+
+def test_loader_falls_back_when_agent_hangs_up(encrypted, key_file, tmp_path):
+    """
+    Test that an agent dying in the middle of a request is treated as
+    unavailable, not as a failed load.
+    """
+    path = str(tmp_path / "broken.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(1)
+
+    def hang_up():
+        conn, _ = listener.accept()
+        with conn:
+            conn.recv(1 << 16)
+            conn.sendall(b"\x00\x00")  # Half a frame header, then gone
+
+    thread = threading.Thread(target=hang_up, daemon=True)
+    thread.start()
+    with pytest.raises(AgentUnavailableException):
+        AgentClient(path).ping()
+    thread.join()
+
+    thread = threading.Thread(target=hang_up, daemon=True)
+    thread.start()
+    with patch.dict(os.environ, {AGENT_SOCK_ENV: path}):
+        loader = load_encrypted_env(encrypted, key_file=key_file)
+    assert loader.decrypted_data == {"DB_USERNAME": "example_username"}
+    thread.join()
+    listener.close()
+
+
+def test_agent_load_keeps_value_types(agent, key_file, tmp_path):
+    """
+    Test that values come back with the same types as a local load.
+    """
+    source = tmp_path / "variables.yaml"
+    source.write_text("RELEASED: 2024-11-25\nPORT: 8080\nDEBUG: true\n")
+    path = tmp_path / "variables.yaml.enc"
+    encrypt_file_binary(source, path, key_file.read_bytes())
+    local = EncryptedEnvLoader(path, key_file=key_file)
+    local.load(local.read_key())
+
+    loaded = load_encrypted_env(path, key_file=key_file).decrypted_data
+    assert loaded == local.decrypted_data
+    assert {name: type(value) for name, value in loaded.items()} == {
+        name: type(value) for name, value in local.decrypted_data.items()
+    }
+
+
+def test_lazy_env_uses_agent(agent, encrypted, key_file):
+    """
+    Test that LazyEncryptedEnv loads through the agent without reading the key.
+    """
+    with patch(
+        "envcloak.loader.EncryptedEnvLoader.read_key", side_effect=AssertionError
+    ):
+        with LazyEncryptedEnv(encrypted, key_file=key_file) as env:
+            assert env["DB_USERNAME"] == "example_username"
+
+
+def test_client_key_source_messages(tmp_path):
+    """
+    Test that the client reports a missing key and a key given twice
+    differently, before connecting.
+    """
+    client = AgentClient(str(tmp_path / "missing.sock"))
+    with pytest.raises(EncryptedEnvLoaderException) as missing:
+        client.load(tmp_path / "variables.env.enc")
+    assert str(missing.value).endswith("Provide either a key file or a password.")
+    with pytest.raises(EncryptedEnvLoaderException, match="not both"):
+        client.load(tmp_path / "variables.env.enc", tmp_path / "k.key", "pw")
@@ -0,0 +1,224 @@
+import os
+import json
+import pytest
+from unittest.mock import patch
+from click.testing import CliRunner
+from envcloak.batch import (
+    check_batch,
+    check_batch_disk_space,
+    parse_manifest,
+    plan_levels,
+    required_space,
+    run_batch,
+)
+from envcloak.cli import main
+from envcloak.constants import KEY_SIZE
+from envcloak.encryptor import encrypt_file_binary, read_encrypted_file
+from envcloak.container import read_header
+from envcloak.exceptions import DiskSpaceException
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """
+    Fixture for a directory with two keys and a few .env files.
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "old.key").write_bytes(os.urandom(KEY_SIZE))
+    (tmp_path / "new.key").write_bytes(os.urandom(KEY_SIZE))
+    for name in ("a", "b", "c"):
+        (tmp_path / f"{name}.env").write_text(f"NAME={name}\n")
+    return tmp_path
+
+
+def test_parse_manifest_applies_defaults():
+    """
+    Test that defaults fill in only the fields an operation uses.
+    """
+    text = """
+defaults:
+  key-file: old.key
+  force: true
+jobs: 2
+operations:
+  - {op: encrypt, input: a.env, output: a.env.enc, container: binary}
+  - {op: rotate-keys, input: a.env.enc, output: r.enc,
+     old_key_file: old.key, new_key_file: new.key}
+"""
+    operations, jobs = parse_manifest(text)
+    assert jobs == 2
+    assert operations[0].options == {
+        "key_file": "old.key",
+        "force": True,
+        "container": "binary",
+    }
+    assert "key_file" not in operations[1].options
+
+    with pytest.raises(ValueError, match="#1 \\(decrypt\\): unknown field"):
+        parse_manifest('[{"op": "decrypt", "input": "x", "output": "y", "kdf": 1}]')
+    with pytest.raises(ValueError, match="'key_file' or 'password' is required"):
+        parse_manifest('[{"op": "encrypt", "input": "x", "output": "y"}]')
+    operations, _ = parse_manifest(
+        '[{"op": "encrypt", "input": "x", "output": "y"}]', password="hunter2"
+    )
+    assert operations[0].options["container"] == "binary"
+
+
+def test_plan_levels_orders_dependent_operations():
+    """
+    Test that only operations touching each other's files are serialized.
+    """
+    operations, _ = parse_manifest(
+        json.dumps(
+            [
+                {"op": "encrypt", "input": "a.env", "output": "a.enc", "key_file": "k"},
+                {"op": "encrypt", "input": "b.env", "output": "b.enc", "key_file": "k"},
+                {
+                    "op": "decrypt",
+                    "input": "a.enc",
+                    "output": "a2.env",
+                    "key_file": "k",
+                },
+                {"op": "encrypt", "input": "c.env", "output": "a.env", "key_file": "k"},
+            ]
+        )
+    )
+    levels = [
+        [operation.number for operation in level] for level in plan_levels(operations)
+    ]
+    assert levels == [[1, 2], [3, 4]]
+
+
+def test_check_batch_reports_all_problems(workspace):
+    """
+    Test that every path problem of a batch is reported before it runs.
+    """
+    (workspace / "b.enc").write_text("exists")
+    operations, _ = parse_manifest(
+        json.dumps(
+            [
+                {
+                    "op": "encrypt",
+                    "input": "a.env",
+                    "output": "a.enc",
+                    "key_file": "old.key",
+                },
+                {
+                    "op": "decrypt",
+                    "input": "a.enc",
+                    "output": "a2.env",
+                    "key_file": "old.key",
+                },
+                {
+                    "op": "encrypt",
+                    "input": "b.env",
+                    "output": "b.enc",
+                    "key_file": "old.key",
+                },
+                {
+                    "op": "decrypt",
+                    "input": "missing.enc",
+                    "output": "a.enc",
+                    "key_file": "nope.key",
+                },
+            ]
+        )
+    )
+    errors = check_batch(operations)
+    assert len(errors) == 4
+    assert "#3 (encrypt): output already exists" in errors[0]
+    assert "also written by operation #1" in errors[1]
+    assert "missing.enc" in errors[2]
+    assert "nope.key" in errors[3]
+
+
+def test_run_batch_shares_keys_and_skips_dependents(workspace):
+    """
+    Test a batch run: each key file is read once, rotation keeps the
+    container, and dependents of a failed operation are skipped.
+    """
+    encrypt_file_binary("c.env", "c.enc", (workspace / "new.key").read_bytes())
+    operations, _ = parse_manifest("""
+defaults: {key_file: old.key}
+operations:
+  - {op: encrypt, input: a.env, output: out/a.enc, container: binary}
+  - {op: encrypt, input: b.env, output: out/b.enc}
+  - {op: rotate-keys, input: out/a.enc, output: out/a.rotated,
+     old_key_file: old.key, new_key_file: new.key}
+  - {op: decrypt, input: c.enc, output: c.out}
+  - {op: decrypt, input: c.out, output: c.twice}
+""")
+    assert check_batch(operations) == []
+    real_open = open
+    key_reads = []
+
+    def counting_open(path, *args, **kwargs):
+        if str(path).endswith(".key"):
+            key_reads.append(os.path.basename(path))
+        return real_open(path, *args, **kwargs)
+
+    with patch("builtins.open", counting_open):
+        results = run_batch(operations, workers=2)
+
+    assert sorted(key_reads) == ["new.key", "old.key"]
+    assert [result.operation.number for result in results] == [1, 2, 3, 4, 5]
+    assert [result.error is None for result in results] == [True] * 3 + [False] * 2
+    assert "Skipped" in str(results[4].error)
+    assert not (workspace / "c.twice").exists()
+    rotated = (workspace / "out" / "a.rotated").read_bytes()
+    assert read_header(rotated).format_hint == "env"
+    assert (
+        read_encrypted_file("out/a.rotated", (workspace / "new.key").read_bytes())
+        == b"NAME=a\n"
+    )
+
+
+def test_cli_batch_from_stdin(workspace):
+    """
+    Test `envcloak batch` reading the manifest from standard input.
+    """
+    manifest = json.dumps(
+        {
+            "defaults": {"key_file": "old.key"},
+            "operations": [
+                {"op": "encrypt", "input": "a.env", "output": "a.enc"},
+                {"op": "decrypt", "input": "a.enc", "output": "a.out"},
+            ],
+        }
+    )
+    runner = CliRunner()
+    result = runner.invoke(main, ["batch", "-m", "-", "--dry-run"], input=manifest)
+    assert result.exit_code == 0, result.output
+    assert "Level 2: #2 decrypt a.enc -> a.out" in result.output
+    assert not (workspace / "a.enc").exists()
+
+    result = runner.invoke(main, ["batch", "-m", "-", "-j", "2"], input=manifest)
+    assert result.exit_code == 0, result.output
+    assert "Completed 2 of 2 operation(s) (encrypt 1/1, decrypt 1/1)." in result.output
+    assert (workspace / "a.out").read_text() == "NAME=a\n"
+
+    result = runner.invoke(main, ["batch", "-m", "-"], input=manifest)
+    assert result.exit_code == 1
+    assert "output already exists" in result.output
+    result = runner.invoke(main, ["batch", "-m", "-", "--force"], input=manifest)
+    assert result.exit_code == 0, result.output
+
+
+def test_required_space_counts_outputs_in_new_directories(workspace):
+    """
+    Test that outputs in directories that do not exist yet are checked
+    against their nearest existing ancestor.
+    """
+    operations, _ = parse_manifest("""
+defaults: {key_file: old.key}
+operations:
+  - {op: encrypt, input: a.env, output: new/deeper/a.enc}
+  - {op: encrypt, input: b.env, output: b.enc}
+""")
+    needed = required_space(operations)
+    assert list(needed.values()) == [len("NAME=a\n") + len("NAME=b\n")]
+    assert os.path.dirname(next(iter(needed))) == str(workspace)
+
+    with patch("envcloak.validation.shutil.disk_usage", return_value=(0, 0, 1)):
+        with pytest.raises(DiskSpaceException):
+            check_batch_disk_space(operations)
@@ -9,6 +9,7 @@ from click.testing import CliRunner
 from unittest.mock import patch
 from envcloak.cli import main
 from envcloak.generator import derive_key
+from envcloak.encryptor import read_encrypted_file
 
 # Updated import list for command modularization
 # from envcloak.commands.encrypt import encrypt_file
@@ -318,33 +319,16 @@ def test_generate_key_from_password_no_gitignore(
         temp_key_file.unlink()
 
 
-@patch("envcloak.commands.rotate_keys.decrypt_file")
-@patch("envcloak.commands.rotate_keys.encrypt_file")
-def test_rotate_keys(mock_encrypt_file, mock_decrypt_file, runner, isolated_mock_files):
+def test_rotate_keys(runner, isolated_mock_files):
     """
     Test the `rotate-keys` CLI command.
     """
     encrypted_file = isolated_mock_files / "variables.env.enc"
-    temp_decrypted_file = isolated_mock_files / "temp_variables.decrypted"
+    rotated_file = isolated_mock_files / "variables.env.rotated"
     key_file = isolated_mock_files / "mykey.key"
     temp_new_key_file = key_file.with_name("temp_newkey.key")
     temp_new_key_file.write_bytes(os.urandom(32))
 
-    tmp_file = str(temp_decrypted_file) + ".tmp"
-
-    def mock_decrypt(input_path, output_path, key):
-        assert os.path.exists(input_path), "Encrypted file does not exist"
-        with open(output_path, "w") as f:
-            f.write("Decrypted content")
-
-    def mock_encrypt(input_path, output_path, key):
-        assert os.path.exists(input_path), "Decrypted file does not exist"
-        with open(output_path, "w") as f:
-            f.write(json.dumps({"ciphertext": "re-encrypted_data"}))
-
-    mock_decrypt_file.side_effect = mock_decrypt
-    mock_encrypt_file.side_effect = mock_encrypt
-
     result = runner.invoke(
         main,
         [
@@ -356,25 +340,18 @@ def test_rotate_keys(mock_encrypt_file, mock_decrypt_file, runner, isolated_mock
             "--new-key-file",
             str(temp_new_key_file),
             "--output",
-            str(temp_decrypted_file),
+            str(rotated_file),
         ],
     )
 
     assert "Keys rotated" in result.output
-    mock_decrypt_file.assert_called_once_with(
-        str(encrypted_file), tmp_file, key_file.read_bytes()
-    )
-    mock_encrypt_file.assert_called_once_with(
-        tmp_file, str(temp_decrypted_file), temp_new_key_file.read_bytes()
-    )
-
-    assert not os.path.exists(tmp_file), f"Temporary file {tmp_file} was not deleted"
+    assert read_encrypted_file(
+        rotated_file, temp_new_key_file.read_bytes()
+    ) == read_encrypted_file(encrypted_file, key_file.read_bytes())
 
-    # Cleanup
-    if temp_decrypted_file.exists():
-        temp_decrypted_file.unlink()
-    if temp_new_key_file.exists():
-        temp_new_key_file.unlink()
+    # Re-encrypted in memory: no plaintext file is left next to the output
+    tmp_file = str(rotated_file) + ".tmp"
+    assert not os.path.exists(tmp_file), f"Temporary file {tmp_file} was created"
 
 
 def test_encrypt_with_mixed_input_and_directory(runner, mock_files):
@@ -1086,3 +1063,30 @@ def test_compare_directories_with_missing_and_extra_files(
     finally:
         # Cleanup the key file
         key_file.unlink(missing_ok=True)
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["encrypt", "-i", "variables.env", "-o", "out.enc"],
+        ["decrypt", "-i", "variables.env.enc", "-o", "out.env"],
+        ["get", "DB_USERNAME", "-i", "variables.env.enc"],
+        ["set", "DB_USERNAME", "x", "-i", "variables.env.enc"],
+        ["run", "-i", "variables.env.enc", "--", "true"],
+    ],
+)
+def test_key_options_are_exclusive(encrypted, key_file, monkeypatch, args):
+    """
+    Test that every command rejects a missing key and --key-file together
+    with --password the same way.
+    """
+    monkeypatch.chdir(encrypted.parent)
+    (encrypted.parent / "variables.env").write_text("DB_USERNAME=x\n")
+    runner = CliRunner()
+    result = runner.invoke(main, args)
+    assert result.exit_code == 2
+    assert "You must provide either --key-file or --password." in result.output
+    both = ["--key-file", str(key_file), "--password", "pw"]
+    result = runner.invoke(main, [args[0], *both, *args[1:]])
+    assert result.exit_code == 2
+    assert "--key-file or --password, not both." in result.output
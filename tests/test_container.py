@@ -0,0 +1,188 @@
+import json
+import pytest
+from pathlib import Path
+from click.testing import CliRunner
+from envcloak.cli import main
+from envcloak.constants import TAG_SIZE, BINARY_MAGIC, STREAM_MAGIC
+from envcloak.container import HEADER_SIZE, pack, unpack, read_header, format_hint_for
+from envcloak.encryptor import (
+    encrypt_file,
+    encrypt_file_binary,
+    decrypt_file,
+    read_encrypted_file,
+    convert_file,
+)
+from envcloak.loader import EncryptedEnvLoader
+from envcloak.exceptions import DecryptionException, FileDecryptionException
+
+
+def test_pack_and_unpack(key):
+    """
+    Test that the binary container round-trips and records its header fields.
+    """
+    plaintext = b"DB_USERNAME=example_user\n"
+    sealed = pack(plaintext, key, "env")
+
+    assert sealed.startswith(BINARY_MAGIC)
+    assert len(sealed) == HEADER_SIZE + len(plaintext) + TAG_SIZE
+    header = read_header(sealed)
+    assert header.format_hint == "env"
+    assert header.plaintext_length == len(plaintext)
+
+    decrypted, header = unpack(sealed, key)
+    assert decrypted == plaintext
+    assert header.format_hint == "env"
+
+
+@pytest.mark.parametrize("offset", [5, 6, HEADER_SIZE - 1, HEADER_SIZE, -1])
+def test_unpack_detects_tampering(key, offset):
+    """
+    Test that any modified byte, header included, fails authentication.
+    """
+    sealed = bytearray(pack(b"API_KEY=example_api_key", key, "env"))
+    sealed[offset] ^= 0x01
+    with pytest.raises(DecryptionException):
+        unpack(bytes(sealed), key)
+
+
+def test_unpack_detects_truncation(key):
+    """
+    Test that a truncated container is rejected.
+    """
+    sealed = pack(b"API_KEY=example_api_key", key)
+    with pytest.raises(DecryptionException, match="does not match its header"):
+        unpack(sealed[:-1], key)
+
+
+@pytest.mark.parametrize(
+    "name, hint",
+    [
+        (".env", "env"),
+        ("variables.env.enc", "env"),
+        ("variables.json", "json"),
+        ("variables.yml.enc", "yaml"),
+        ("variables.xml", "xml"),
+        ("keystore.p12", ""),
+    ],
+)
+def test_format_hint_for(name, hint):
+    """
+    Test the format hint guessed from file names.
+    """
+    assert format_hint_for(name) == hint
+
+
+def test_decrypt_file_reads_every_container(tmp_path, key):
+    """
+    Test that decrypt_file detects binary containers next to legacy JSON files.
+    """
+    plaintext = tmp_path / "variables.env"
+    plaintext.write_text("DB_PASSWORD=example_pass\n")
+    binary = tmp_path / "variables.env.bin.enc"
+    legacy = tmp_path / "variables.env.json.enc"
+    encrypt_file_binary(plaintext, binary, key)
+    encrypt_file(plaintext, legacy, key)
+
+    for source in (binary, legacy):
+        output = tmp_path / (source.name + ".out")
+        decrypt_file(source, output, key)
+        assert output.read_bytes() == plaintext.read_bytes()
+        assert read_encrypted_file(source, key) == plaintext.read_bytes()
+
+
+@pytest.mark.parametrize(
+    "container, magic", [("stream", STREAM_MAGIC), ("binary", BINARY_MAGIC)]
+)
+def test_convert_file(tmp_path, key, container, magic):
+    """
+    Test converting a legacy JSON file into the other containers and back.
+    """
+    plaintext = tmp_path / "variables.json"
+    plaintext.write_text(json.dumps({"API_KEY": "example_api_key"}))
+    legacy = tmp_path / "variables.json.enc"
+    converted = tmp_path / "variables.converted.enc"
+    restored = tmp_path / "variables.restored.enc"
+    encrypt_file(plaintext, legacy, key)
+
+    convert_file(legacy, converted, key, container)
+    assert converted.read_bytes().startswith(magic)
+    convert_file(converted, restored, key, "json")
+    assert "ciphertext" in json.loads(restored.read_text())
+    assert read_encrypted_file(restored, key) == plaintext.read_bytes()
+
+
+def test_loader_uses_format_hint(tmp_path, key):
+    """
+    Test that the loader parses a binary container using its stored format hint
+    when the file name does not reveal the format.
+    """
+    plaintext = tmp_path / "variables.yaml"
+    plaintext.write_text("API_KEY: example_api_key\n")
+    encrypted = tmp_path / "secrets.bin"
+    encrypt_file_binary(plaintext, encrypted, key)
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(key)
+
+    loader = EncryptedEnvLoader(encrypted, key_file).load()
+    assert loader.decrypted_data == {"API_KEY": "example_api_key"}
+
+
+def test_cli_convert(tmp_path):
+    """
+    Test the `convert` CLI command.
+    """
+    runner = CliRunner()
+    converted = tmp_path / "variables.env.enc"
+
+    result = runner.invoke(
+        main,
+        [
+            "convert",
+            "--input",
+            "tests/mock/variables.env.enc",
+            "--output",
+            str(converted),
+            "--key-file",
+            "tests/mock/mykey.key",
+            "--to",
+            "binary",
+        ],
+    )
+    assert "converted" in result.output
+    assert converted.read_bytes().startswith(BINARY_MAGIC)
+    key = Path("tests/mock/mykey.key").read_bytes()
+    assert read_encrypted_file(converted, key) == read_encrypted_file(
+        "tests/mock/variables.env.enc", key
+    )
+
+
+def test_convert_truncated_container(tmp_path, key):
+    """
+    Test that converting a truncated binary container fails cleanly.
+    """
+    truncated = tmp_path / "truncated.env.enc"
+    truncated.write_bytes(BINARY_MAGIC + b"\x01")
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(key)
+    output = tmp_path / "converted.enc"
+    with pytest.raises(FileDecryptionException):
+        convert_file(truncated, output, key, "json")
+
+    result = CliRunner().invoke(
+        main,
+        [
+            "convert",
+            "-i",
+            str(truncated),
+            "-o",
+            str(output),
+            "-k",
+            str(key_file),
+            "--to",
+            "json",
+        ],
+    )
+    assert result.exception is None or isinstance(result.exception, SystemExit)
+    assert result.exit_code == 1
+    assert "Error during conversion" in result.output
+    assert not output.exists()
@@ -1,4 +1,5 @@
 import os
+import mmap
 import base64
 import json
 import pytest
@@ -9,9 +10,14 @@ from envcloak.encryptor import (
     encrypt,
     decrypt,
     encrypt_file,
+    encrypt_file_stream,
+    encrypt_file_binary,
     decrypt_file,
+    encrypt_bytes,
+    decrypt_bytes,
+    buffer_size,
 )
-from envcloak.exceptions import InvalidSaltException
+from envcloak.exceptions import InvalidSaltException, DecryptionException
 from envcloak.constants import SALT_SIZE, KEY_SIZE, NONCE_SIZE
 
 
@@ -160,3 +166,96 @@ def test_encrypt_and_decrypt_file_invalid_key(tmp_files):
     # Attempt to decrypt with the wrong key
     with pytest.raises(Exception):
         decrypt_file(encrypted_file, decrypted_file, wrong_key)
+
+
+@pytest.mark.parametrize(
+    "payload", [b"", b"binary\x00secret", bytearray(b"x" * 1000), memoryview(b"view")]
+)
+def test_encrypt_and_decrypt_bytes(payload):
+    """
+    Test that the bytes API round-trips any buffer-protocol object.
+    """
+    key = os.urandom(KEY_SIZE)
+
+    nonce, tag, ciphertext = encrypt_bytes(payload, key)
+    assert isinstance(ciphertext, memoryview)
+    assert len(ciphertext) == len(payload)
+
+    plaintext = decrypt_bytes(ciphertext, nonce, tag, key)
+    assert bytes(plaintext) == bytes(payload)
+
+
+def test_encrypt_and_decrypt_bytes_into_preallocated_buffers():
+    """
+    Test that the bytes API writes into caller-supplied buffers.
+    """
+    key = os.urandom(KEY_SIZE)
+    payload = b"DB_PASSWORD=example_pass"
+    sealed = bytearray(buffer_size(len(payload)))
+    opened = bytearray(buffer_size(len(payload)))
+
+    nonce, tag, ciphertext = encrypt_bytes(payload, key, out=sealed)
+    assert ciphertext.obj is sealed
+
+    plaintext = decrypt_bytes(ciphertext, nonce, tag, key, out=opened)
+    assert plaintext.obj is opened
+    assert bytes(plaintext) == payload
+
+
+def test_decrypt_bytes_failure_wipes_output():
+    """
+    Test that unauthenticated plaintext is zeroed when the tag does not match.
+    """
+    key = os.urandom(KEY_SIZE)
+    payload = b"API_KEY=example_api_key"
+    nonce, _, ciphertext = encrypt_bytes(payload, key, associated_data=b"name")
+    out = bytearray(buffer_size(len(payload)))
+
+    with pytest.raises(DecryptionException):
+        decrypt_bytes(ciphertext, nonce, os.urandom(16), key, out=out)
+    assert out == bytearray(len(out))
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+@pytest.mark.parametrize(
+    "encrypt_func", [encrypt_file, encrypt_file_stream, encrypt_file_binary]
+)
+def test_file_round_trip_with_and_without_mmap(tmp_path, encrypt_func, use_mmap):
+    """
+    Test that memory-mapped and plain reads produce interchangeable files.
+    """
+    plaintext_file = tmp_path / "variables.env"
+    encrypted_file = tmp_path / "variables.env.enc"
+    plaintext_file.write_bytes("API_KEY=välue\n".encode() * 1000)
+    key = os.urandom(KEY_SIZE)
+
+    encrypt_func(plaintext_file, encrypted_file, key, use_mmap=use_mmap)
+    for decrypt_with_mmap in (True, False):
+        decrypted_file = tmp_path / f"variables.{decrypt_with_mmap}.env"
+        decrypt_file(encrypted_file, decrypted_file, key, use_mmap=decrypt_with_mmap)
+        assert decrypted_file.read_bytes() == plaintext_file.read_bytes()
+
+
+def test_mmap_threshold_selects_path(tmp_path, monkeypatch):
+    """
+    Test that files at or above MMAP_THRESHOLD are memory-mapped by default.
+    """
+    plaintext_file = tmp_path / "variables.env"
+    encrypted_file = tmp_path / "variables.env.enc"
+    plaintext_file.write_text("DB_USERNAME=example_user\n")
+    key = os.urandom(KEY_SIZE)
+    mapped = []
+    real_mmap = mmap.mmap
+
+    def tracking_mmap(*args, **kwargs):
+        mapped.append(args)
+        return real_mmap(*args, **kwargs)
+
+    monkeypatch.setattr("envcloak.encryptor.mmap.mmap", tracking_mmap)
+
+    encrypt_file_binary(plaintext_file, encrypted_file, key)
+    assert not mapped
+
+    monkeypatch.setattr("envcloak.encryptor.MMAP_THRESHOLD", 1)
+    encrypt_file_binary(plaintext_file, encrypted_file, key)
+    assert len(mapped) == 1
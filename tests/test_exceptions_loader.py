@@ -49,7 +49,7 @@ def test_file_decryption_exception():
     with (
         patch("pathlib.Path.exists", return_value=True),
         patch(
-            "envcloak.loader.decrypt_file",
+            "envcloak.encryptor.read_encrypted_file",
             side_effect=FileDecryptionException("Decryption error"),
         ),
         patch("builtins.open", mock_open(read_data="fake_key")),
@@ -70,8 +70,8 @@ def test_unsupported_file_format_exception():
     loader = EncryptedEnvLoader("tests/mock/variables.unknown", "tests/mock/mykey.key")
     with (
         patch("pathlib.Path.exists", return_value=True),
-        patch("envcloak.loader.decrypt_file"),
-        patch("builtins.open", mock_open(read_data="{}")),
+        patch("envcloak.encryptor.read_encrypted_file", return_value=b"{}"),
+        patch("builtins.open", mock_open(read_data=b"fake_key")),
         patch.object(Path, "suffix", ".unknown"),
     ):  # Mock the suffix attribute
         with pytest.raises(
@@ -87,9 +87,9 @@ def test_unexpected_error():
     loader = EncryptedEnvLoader("test.enc", "test.key")
     with (
         patch("pathlib.Path.exists", return_value=True),
-        patch("envcloak.loader.decrypt_file"),
+        patch("envcloak.encryptor.read_encrypted_file", return_value=b""),
         patch(
-            "envcloak.loader.EncryptedEnvLoader._parse_file",
+            "envcloak.loader.EncryptedEnvLoader._parse_data",
             side_effect=ValueError("Unexpected error"),
         ),
     ):
@@ -107,9 +107,9 @@ def test_parse_file_error():
     loader = EncryptedEnvLoader("test.json", "test.key")
     with (
         patch("pathlib.Path.exists", return_value=True),
-        patch("envcloak.loader.decrypt_file"),
-        patch("envcloak.loader.open", mock_open(read_data="invalid json")),
-        patch("json.load", side_effect=ValueError("JSON parsing error")),
+        patch("envcloak.encryptor.read_encrypted_file", return_value=b"invalid json"),
+        patch("envcloak.loader.open", mock_open(read_data=b"fake_key")),
+        patch("json.loads", side_effect=ValueError("JSON parsing error")),
     ):
         with pytest.raises(
             EncryptedEnvLoaderException, match="Failed to parse the decrypted file."
@@ -124,8 +124,11 @@ def test_parse_xml_error():
     loader = EncryptedEnvLoader("tests/mock/variables.xml.enc", "tests/mock/mykey.key")
     with (
         patch("pathlib.Path.exists", return_value=True),
-        patch("envcloak.loader.decrypt_file"),
-        patch("envcloak.loader.safe_parse", side_effect=Exception("XML parsing error")),
+        patch("envcloak.encryptor.read_encrypted_file", return_value=b"<env/>"),
+        patch(
+            "defusedxml.ElementTree.fromstring",
+            side_effect=Exception("XML parsing error"),
+        ),
         patch("builtins.open", mock_open(read_data="fake_key")),
     ):  # Simulate the key file
         with pytest.raises(
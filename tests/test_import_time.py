@@ -0,0 +1,103 @@
+import sys
+import subprocess
+
+# Upper bound for the cold import of the CLI entry point, in microseconds.
+# Generous enough for slow CI machines; the module checks below catch the
+# regressions precisely.
+CLI_IMPORT_BUDGET_US = 250_000
+LOADER_IMPORT_BUDGET_US = 150_000
+
+# Imported on first use only; `.env` users never need most of them
+DEFERRED_MODULES = (
+    "yaml",
+    "dotenv",
+    "defusedxml",
+    "cryptography",
+    "asyncio",
+    "concurrent.futures",
+    "difflib",
+)
+
+
+def import_profile(code, top_level=False):
+    """
+    Run `code` in a fresh interpreter with -X importtime.
+    :param top_level: Only report modules not imported by another module.
+    :return: Mapping of imported module name -> cumulative import time (us).
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    profile = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if top_level and name.startswith("  "):
+            continue
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def test_cli_import_is_lazy():
+    """
+    Test that importing the CLI imports no command module and stays within
+    the time budget.
+    """
+    profile = import_profile("import envcloak.cli")
+    assert not [name for name in profile if name.startswith("envcloak.commands.")]
+    assert not [name for name in DEFERRED_MODULES if name in profile]
+    assert profile["envcloak.cli"] < CLI_IMPORT_BUDGET_US
+
+
+def test_package_import_defers_parsers_and_crypto():
+    """
+    Test that importing the loader API imports no parser or crypto module.
+    """
+    code = "from envcloak import load_encrypted_env"
+    profile = import_profile(code)
+    assert not [name for name in DEFERRED_MODULES if name in profile]
+    # The package imports the loader through importlib, which -X importtime
+    # does not report; its own imports show up as top-level entries instead
+    loader_time = sum(
+        cumulative
+        for name, cumulative in import_profile(code, top_level=True).items()
+        if name.startswith("envcloak")
+    )
+    assert loader_time < LOADER_IMPORT_BUDGET_US
+
+
+def test_cli_imports_only_the_dispatched_command(tmp_path):
+    """
+    Test that running a command imports its module and no other.
+    """
+    code = (
+        "import sys\n"
+        "from envcloak.cli import main\n"
+        f"main(['generate-key', '--output', {str(tmp_path / 'k.key')!r}],"
+        " standalone_mode=False)\n"
+        "print(sorted(m for m in sys.modules if m.startswith('envcloak.commands.')))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    assert output.splitlines()[-1] == "['envcloak.commands.generate_key']"
+
+
+def test_package_exports_stay_lazy():
+    """
+    Test that `__all__` lists the lazy exports and that importing the package
+    imports none of their modules.
+    """
+    code = (
+        "import sys, envcloak\n"
+        "assert sorted(envcloak.__all__) == sorted(envcloak._EXPORTS)\n"
+        "print(sorted(m for m in sys.modules if m.startswith('envcloak.')))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    assert output.splitlines()[-1] == "[]"
@@ -0,0 +1,407 @@
+import os
+import threading
+from unittest.mock import patch
+import pytest
+from click.testing import CliRunner
+from envcloak.cli import main
+from envcloak.constants import KEY_SIZE, SALT_SIZE, FLAG_KDF
+from envcloak.container import pack, unpack, read_header
+from envcloak.encryptor import (
+    derive_key,
+    encrypt_file,
+    encrypt_file_binary,
+    decrypt_file,
+)
+from envcloak.kdf import (
+    KDFS,
+    ScryptKDF,
+    PasswordKey,
+    get_kdf,
+    parse_kdf_params,
+    derive_key_cached,
+    calibrate,
+    clear_key_cache,
+    encode_kdf_block,
+    decode_kdf_block,
+    _cache,
+)
+from envcloak.loader import load_encrypted_env
+from envcloak.exceptions import (
+    DecryptionException,
+    FileDecryptionException,
+    FileEncryptionException,
+)
+
+# Cheap parameters so the tests stay fast
+FAST_KDFS = [
+    get_kdf("pbkdf2", iterations=1000),
+    get_kdf("scrypt", n=2**10, r=8, p=1),
+    get_kdf("hkdf"),
+]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    """
+    Fixture clearing the derived key cache around each test.
+    """
+    clear_key_cache()
+    yield
+    clear_key_cache()
+
+
+@pytest.mark.parametrize("kdf", FAST_KDFS, ids=lambda kdf: kdf.name)
+def test_kdf_derive(kdf):
+    """
+    Test that every KDF is deterministic and sensitive to password and salt.
+    """
+    salt = os.urandom(SALT_SIZE)
+    key = kdf.derive("password", salt)
+    assert len(key) == KEY_SIZE
+    assert kdf.derive(b"password", salt) == key
+    assert kdf.derive("Password", salt) != key
+    assert kdf.derive("password", os.urandom(SALT_SIZE)) != key
+
+
+def test_default_kdf_matches_derive_key():
+    """
+    Test that the default PBKDF2 parameters match the historical derive_key.
+    """
+    salt = os.urandom(SALT_SIZE)
+    assert get_kdf().derive("password", salt) == derive_key("password", salt)
+
+
+def test_get_kdf_rejects_unknown():
+    """
+    Test that unknown KDF names and parameters are rejected.
+    """
+    with pytest.raises(ValueError, match="Unknown KDF"):
+        get_kdf("md5")
+    with pytest.raises(ValueError, match="Unknown parameter"):
+        get_kdf("pbkdf2", n=1024)
+
+
+def test_parse_kdf_params():
+    """
+    Test parsing of name=value parameters from the command line.
+    """
+    assert parse_kdf_params(["n=1024", " r = 8"]) == {"n": 1024, "r": 8}
+    with pytest.raises(ValueError):
+        parse_kdf_params(["n"])
+    with pytest.raises(ValueError):
+        parse_kdf_params(["n=abc"])
+
+
+@pytest.mark.parametrize("kdf", FAST_KDFS, ids=lambda kdf: kdf.name)
+def test_kdf_block_round_trip(kdf):
+    """
+    Test that KDF parameters and salt survive encoding into a header block.
+    """
+    salt = os.urandom(SALT_SIZE)
+    block = b"prefix" + encode_kdf_block(kdf, salt)
+    decoded, decoded_salt, end = decode_kdf_block(block, len(b"prefix"))
+    assert decoded == kdf
+    assert decoded_salt == salt
+    assert end == len(block)
+    with pytest.raises(ValueError):
+        decode_kdf_block(block[:-1], len(b"prefix"))
+
+
+def test_cache_reuses_derivations():
+    """
+    Test that repeated derivations are served from the LRU and that it is bounded.
+    """
+    kdf = FAST_KDFS[0]
+    salt = os.urandom(SALT_SIZE)
+    first = derive_key_cached("password", salt, kdf)
+    assert derive_key_cached(b"password", salt, kdf) == first
+    assert (_cache.hits, _cache.misses) == (1, 1)
+
+    # Different parameters are a different entry
+    derive_key_cached("password", salt, get_kdf("pbkdf2", iterations=1001))
+    assert _cache.misses == 2
+
+    for _ in range(_cache.maxsize + 5):
+        derive_key_cached("password", os.urandom(SALT_SIZE), get_kdf("hkdf"))
+    assert len(_cache._entries) == _cache.maxsize
+
+
+def test_cache_derives_once_under_concurrency():
+    """
+    Test that threads asking for the same key share a single derivation.
+    """
+    salt = os.urandom(SALT_SIZE)
+    barrier = threading.Barrier(4)
+    keys = []
+
+    def worker():
+        barrier.wait()
+        keys.append(derive_key_cached("password", salt, FAST_KDFS[0]))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(keys)) == 1 and len(keys) == 4
+    assert (_cache.hits, _cache.misses) == (3, 1)
+
+
+@pytest.mark.parametrize("kdf", FAST_KDFS, ids=lambda kdf: kdf.name)
+def test_password_container_round_trip(kdf):
+    """
+    Test that a password-protected container decrypts with just the password.
+    """
+    sealed = pack(b"A=1\n", PasswordKey("secret", kdf), "env")
+    header = read_header(sealed)
+    assert header.flags & FLAG_KDF
+    assert header.kdf == kdf
+
+    plaintext, _ = unpack(sealed, PasswordKey("secret"))
+    assert plaintext == b"A=1\n"
+    with pytest.raises(DecryptionException):
+        unpack(sealed, PasswordKey("wrong"))
+
+
+def test_password_container_key_mismatch():
+    """
+    Test that passwords and raw keys are not interchangeable.
+    """
+    key = os.urandom(KEY_SIZE)
+    with pytest.raises(DecryptionException, match="password-protected"):
+        unpack(pack(b"A=1\n", PasswordKey("secret", FAST_KDFS[2])), key)
+    with pytest.raises(DecryptionException, match="not password-protected"):
+        unpack(pack(b"A=1\n", key), PasswordKey("secret"))
+
+
+def test_password_container_tampered_kdf_block():
+    """
+    Test that the KDF block is authenticated as part of the header.
+    """
+    sealed = pack(b"A=1\n", PasswordKey("secret", FAST_KDFS[0]))
+    tampered = sealed.replace(b'"iterations":1000', b'"iterations":1001')
+    assert tampered != sealed
+    with pytest.raises(DecryptionException):
+        unpack(tampered, PasswordKey("secret"))
+
+
+@pytest.mark.parametrize(
+    "kdf",
+    [
+        get_kdf("pbkdf2", iterations=10**12),
+        get_kdf("scrypt", n=2**30, r=64, p=1),
+        get_kdf("scrypt", n=2**20, r=32, p=1),
+        get_kdf("scrypt", n=2**10 + 1, r=8, p=1),
+        get_kdf("scrypt", n=2**10, r=8, p=10**6),
+    ],
+    ids=repr,
+)
+def test_kdf_block_rejects_oversized_parameters(kdf):
+    """
+    Test that costs read from an (unauthenticated) header are bounded
+    before anything is derived.
+    """
+    block = encode_kdf_block(kdf, os.urandom(SALT_SIZE))
+    with patch.object(type(kdf), "_derive", side_effect=AssertionError):
+        with pytest.raises(DecryptionException, match="Invalid KDF parameters"):
+            decode_kdf_block(block)
+
+
+def test_password_container_oversized_iterations():
+    """
+    Test that a crafted header cannot make decryption hang.
+    """
+    sealed = pack(b"A=1\n", PasswordKey("secret", FAST_KDFS[0]))
+    crafted = sealed.replace(b'"iterations":1000', b'"iterations":9e99')
+    with pytest.raises(DecryptionException, match="outside"):
+        unpack(crafted, PasswordKey("secret"))
+
+
+def test_cli_generate_key_from_password_with_kdf(tmp_path):
+    """
+    Test `generate-key-from-password --kdf/--kdf-param`.
+    """
+    salt = "00" * SALT_SIZE
+    output = tmp_path / "derived.key"
+    result = CliRunner().invoke(
+        main,
+        [
+            "generate-key-from-password",
+            "-p",
+            "secret",
+            "-s",
+            salt,
+            "-o",
+            str(output),
+            "--kdf",
+            "scrypt",
+            "--kdf-param",
+            "n=1024",
+            "--no-gitignore",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    expected = get_kdf("scrypt", n=1024).derive("secret", bytes.fromhex(salt))
+    assert output.read_bytes() == expected
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--kdf-param", "iterations=500"],
+        ["--kdf", "scrypt", "--kdf-param", "r=64"],
+        ["--kdf", "scrypt", "--kdf-param", "n=1000"],
+    ],
+)
+def test_cli_rejects_kdf_parameters_out_of_range(tmp_path, args):
+    """
+    Test that parameters `decrypt` would refuse are refused when sealing,
+    as CLI errors rather than tracebacks.
+    """
+    plaintext = tmp_path / "variables.env"
+    plaintext.write_text("A=1\n")
+    output = tmp_path / "out.enc"
+    runner = CliRunner()
+    encrypt = ["encrypt", "-i", str(plaintext), "-o", str(output), "-p", "pw"]
+    result = runner.invoke(main, [*encrypt, *args])
+    assert result.exit_code == 2
+    assert "outside" in result.output or "power of two" in result.output
+    assert not output.exists()
+
+    derive = ["generate-key-from-password", "-p", "pw", "-o", str(output)]
+    result = runner.invoke(main, [*derive, "--no-gitignore", *args])
+    assert result.exit_code == 2
+    assert "Invalid value for --kdf-param" in result.output
+    assert not output.exists()
+
+    with pytest.raises(ValueError):
+        PasswordKey("pw", get_kdf("scrypt", r=64))
+
+
+def test_password_requires_binary_container(tmp_path):
+    """
+    Test that a password is refused by containers that cannot record a KDF.
+    """
+    plaintext = tmp_path / "variables.env"
+    plaintext.write_text("A=1\n")
+    with pytest.raises(FileEncryptionException, match="binary and records containers"):
+        encrypt_file(plaintext, tmp_path / "out.enc", PasswordKey("secret"))
+
+
+def test_load_encrypted_env_with_password(tmp_path):
+    """
+    Test loading a password-protected file without a key file.
+    """
+    plaintext = tmp_path / "variables.env"
+    plaintext.write_text("DB_USERNAME=example_user\n")
+    encrypted = tmp_path / "variables.env.enc"
+    encrypt_file_binary(plaintext, encrypted, PasswordKey("secret", FAST_KDFS[0]))
+
+    loader = load_encrypted_env(encrypted, password="secret")
+    assert loader.decrypted_data == {"DB_USERNAME": "example_user"}
+
+    # Reloads reuse the key derived while encrypting
+    load_encrypted_env(encrypted, password="secret")
+    assert (_cache.hits, _cache.misses) == (2, 1)
+
+
+def test_cli_encrypt_decrypt_with_password(tmp_path):
+    """
+    Test `encrypt --password --kdf` and `decrypt --password` from the CLI.
+    """
+    runner = CliRunner()
+    plaintext = tmp_path / "variables.env"
+    plaintext.write_text("API_KEY=example_api_key\n")
+    encrypted = tmp_path / "variables.env.enc"
+    decrypted = tmp_path / "variables.env.out"
+
+    result = runner.invoke(
+        main,
+        [
+            "encrypt",
+            "--input",
+            str(plaintext),
+            "--output",
+            str(encrypted),
+            "--password",
+            "secret",
+            "--kdf",
+            "scrypt",
+            "--kdf-param",
+            "n=1024",
+        ],
+    )
+    assert "encrypted" in result.output, result.output
+    assert read_header(encrypted.read_bytes()).kdf == get_kdf("scrypt", n=1024)
+
+    result = runner.invoke(
+        main,
+        ["decrypt", "--input", str(encrypted), "--output", str(decrypted)],
+        env={"ENVCLOAK_PASSWORD": "secret"},
+    )
+    assert "decrypted" in result.output, result.output
+    assert decrypted.read_text() == plaintext.read_text()
+
+    with pytest.raises(FileDecryptionException):
+        decrypt_file(encrypted, tmp_path / "wrong.out", PasswordKey("wrong"))
+
+
+def test_cli_password_validation(tmp_path):
+    """
+    Test that a key source is required and that --password needs the binary container.
+    """
+    runner = CliRunner()
+    plaintext = tmp_path / "variables.env"
+    plaintext.write_text("A=1\n")
+    base = ["encrypt", "--input", str(plaintext), "--output", str(tmp_path / "o")]
+
+    result = runner.invoke(main, base)
+    assert "either --key-file or --password" in result.output
+
+    result = runner.invoke(main, base + ["--password", "x", "--container", "stream"])
+    assert "only supported with the binary and records containers" in result.output
+
+    result = runner.invoke(main, base + ["--password", "x", "--kdf-param", "n=1"])
+    assert "Unknown parameter" in result.output
+    assert set(KDFS) == {"pbkdf2", "scrypt", "hkdf"}
+
+
+def _fake_measure(kdf, rounds):
+    """
+    Deterministic stand-in for `measure`: cost grows linearly with the cost parameter.
+    """
+    if kdf.cost_param is None:
+        return 1e-5
+    return kdf.params[kdf.cost_param] * 1e-6
+
+
+@patch("envcloak.kdf.measure", side_effect=_fake_measure)
+def test_calibrate_hits_target(mock_measure):
+    """
+    Test that calibration scales the cost parameter towards the target time.
+    """
+    kdf, elapsed = calibrate("pbkdf2", 0.05)
+    assert kdf == get_kdf("pbkdf2", iterations=50000)
+    assert elapsed == pytest.approx(0.05)
+
+    kdf, _ = calibrate("scrypt", 0.05)
+    assert kdf.params["n"] == 2**16  # Nearest power of two to 50000
+
+    kdf, _ = calibrate("scrypt", 100.0)
+    assert kdf.params["n"] == ScryptKDF.cost_range[1]
+
+    kdf, elapsed = calibrate("hkdf", 0.05)
+    assert kdf == get_kdf("hkdf") and elapsed == 1e-5
+
+
+def test_cli_kdf_calibrate():
+    """
+    Test that `kdf-calibrate` reports a rate and usable flags for each KDF.
+    """
+    runner = CliRunner()
+    result = runner.invoke(main, ["kdf-calibrate", "--target-ms", "2", "--rounds", "1"])
+    assert result.exit_code == 0, result.output
+    for name in KDFS:
+        assert f"--kdf {name}" in result.output
+    assert result.output.count("derivations/s") == len(KDFS)
+    assert "--kdf-param iterations=" in result.output
@@ -0,0 +1,130 @@
+import os
+import pytest
+from unittest.mock import patch
+from click.testing import CliRunner
+from envcloak import CloakKey
+from envcloak.cli import main
+from envcloak.constants import KEY_SIZE, NONCE_SIZE
+from envcloak.encryptor import encrypt, decrypt, read_encrypted_file
+from envcloak.keys import as_cloak_key, clear_key_cache
+from envcloak.exceptions import InvalidKeyException, DecryptionException
+
+
+def test_cloak_key_rejects_invalid_size():
+    """
+    Test that the key size is validated when the CloakKey is created.
+    """
+    for size in (15, KEY_SIZE - 1, KEY_SIZE + 1):
+        with pytest.raises(InvalidKeyException, match="Invalid key size"):
+            CloakKey(os.urandom(size))
+
+
+@pytest.mark.parametrize("size", [16, 24])
+def test_shorter_aes_keys_still_work(tmp_path, size):
+    """
+    Test that 128- and 192-bit keys, accepted by earlier releases, still
+    encrypt and decrypt, and that `encrypt` warns about them.
+    """
+    key = os.urandom(size)
+    assert decrypt(encrypt("A=1", key), key) == "A=1"
+    key_file = tmp_path / "short.key"
+    key_file.write_bytes(key)
+    source = tmp_path / "variables.env"
+    source.write_text("A=1\n")
+    output = tmp_path / "variables.env.enc"
+    result = CliRunner().invoke(
+        main, ["encrypt", "-i", str(source), "-o", str(output), "-k", str(key_file)]
+    )
+    assert f"holds a {size * 8}-bit key" in result.output
+    assert read_encrypted_file(output, key) == b"A=1\n"
+
+
+def test_cloak_key_is_compatible_with_module_api(key):
+    """
+    Test that CloakKey output matches the format of encrypt/decrypt.
+    """
+    cloak_key = CloakKey(key)
+    assert decrypt(cloak_key.encrypt("A=1"), key) == "A=1"
+    assert cloak_key.decrypt(encrypt("B=2", key)) == "B=2"
+    assert "redacted" in repr(cloak_key)
+
+
+def test_cloak_key_from_file(tmp_path, key):
+    """
+    Test reading a CloakKey from a key file.
+    """
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(key)
+    cloak_key = CloakKey.from_file(key_file)
+    assert decrypt(cloak_key.encrypt("A=1"), key) == "A=1"
+
+
+def test_encrypt_many_and_decrypt_many(key):
+    """
+    Test batch encryption and decryption round-trips in order with unique nonces.
+    """
+    cloak_key = CloakKey(key)
+    payloads = [f"VALUE_{i}" for i in range(50)]
+
+    sealed = list(cloak_key.encrypt_many(payloads))
+    assert len({item["nonce"] for item in sealed}) == len(payloads)
+    assert list(cloak_key.decrypt_many(sealed)) == payloads
+
+
+def test_encrypt_many_draws_nonces_in_bulk(key):
+    """
+    Test that a sized batch is served from a single random draw.
+    """
+    cloak_key = CloakKey(key)
+    payloads = ["x"] * 10
+
+    with patch("envcloak.keys.os.urandom", wraps=os.urandom) as urandom:
+        list(cloak_key.encrypt_many(payloads))
+    urandom.assert_called_once_with(NONCE_SIZE * len(payloads))
+
+
+def test_encrypt_many_is_lazy(key):
+    """
+    Test that encrypt_many works on unbounded iterators without consuming them.
+    """
+    cloak_key = CloakKey(key)
+
+    def endless():
+        while True:
+            yield "x"
+
+    results = cloak_key.encrypt_many(endless())
+    first = next(results)
+    assert cloak_key.decrypt(first) == "x"
+
+
+def test_decrypt_many_reports_bad_item(key):
+    """
+    Test that decrypt_many raises for an item sealed with another key.
+    """
+    cloak_key = CloakKey(key)
+    items = [cloak_key.encrypt("ok"), CloakKey(os.urandom(KEY_SIZE)).encrypt("bad")]
+    results = cloak_key.decrypt_many(items)
+    assert next(results) == "ok"
+    with pytest.raises(DecryptionException):
+        next(results)
+
+
+def test_as_cloak_key_reuses_instances(key):
+    """
+    Test that repeated raw keys map to the same prepared CloakKey.
+    """
+    assert as_cloak_key(key) is as_cloak_key(bytes(key))
+    cloak_key = CloakKey(key)
+    assert as_cloak_key(cloak_key) is cloak_key
+    with pytest.raises(InvalidKeyException):
+        as_cloak_key(KEY_SIZE)
+
+
+def test_clear_key_cache(key):
+    """
+    Test that clearing the cache drops the cached instances and raw keys.
+    """
+    cached = as_cloak_key(key)
+    clear_key_cache()
+    assert as_cloak_key(key) is not cached
@@ -1,8 +1,19 @@
 import os
+import time
+import asyncio
 import pytest
 from pathlib import Path
 from unittest.mock import patch
-from envcloak.loader import EncryptedEnvLoader
+from envcloak.loader import (
+    EncryptedEnvLoader,
+    LazyEncryptedEnv,
+    aload_encrypted_env,
+    aload_encrypted_envs,
+    load_encrypted_envs,
+)
+from envcloak.encryptor import encrypt_file_binary, read_encrypted_file
+from envcloak.constants import KEY_SIZE
+from envcloak.exceptions import EncryptedEnvLoaderException
 
 
 @pytest.fixture
@@ -48,7 +59,7 @@ def plaintext_files(mock_dir):
 
 
 @pytest.mark.parametrize("file_format", ["env", "json", "yaml", "xml"])
-@patch("envcloak.loader.decrypt_file")
+@patch("envcloak.encryptor.read_encrypted_file")
 def test_load_decrypts_and_parses(
     mock_decrypt, encrypted_files, plaintext_files, key_file, file_format
 ):
@@ -56,13 +67,8 @@ def test_load_decrypts_and_parses(
     Test that the EncryptedEnvLoader can decrypt and parse various file formats correctly.
     """
 
-    # Mock the decryption process to return the corresponding plaintext file
-    def mock_decrypt_file(input_file, output_file, key):
-        with open(plaintext_files[file_format], "r", encoding="utf-8") as f_in:
-            with open(output_file, "w", encoding="utf-8") as f_out:
-                f_out.write(f_in.read())
-
-    mock_decrypt.side_effect = mock_decrypt_file
+    # Mock the decryption process to return the corresponding plaintext
+    mock_decrypt.return_value = plaintext_files[file_format].read_bytes()
 
     # Test the loader
     loader = EncryptedEnvLoader(
@@ -77,7 +83,7 @@ def test_load_decrypts_and_parses(
 
 
 @pytest.mark.parametrize("file_format", ["env", "json", "yaml", "xml"])
-@patch("envcloak.loader.decrypt_file")
+@patch("envcloak.encryptor.read_encrypted_file")
 def test_to_os_env(
     mock_decrypt, encrypted_files, plaintext_files, key_file, file_format
 ):
@@ -85,13 +91,8 @@ def test_to_os_env(
     Test that to_os_env loads variables into os.environ for various file formats.
     """
 
-    # Mock the decryption process to return the corresponding plaintext file
-    def mock_decrypt_file(input_file, output_file, key):
-        with open(plaintext_files[file_format], "r", encoding="utf-8") as f_in:
-            with open(output_file, "w", encoding="utf-8") as f_out:
-                f_out.write(f_in.read())
-
-    mock_decrypt.side_effect = mock_decrypt_file
+    # Mock the decryption process to return the corresponding plaintext
+    mock_decrypt.return_value = plaintext_files[file_format].read_bytes()
 
     # Test the loader
     loader = EncryptedEnvLoader(
@@ -103,3 +104,150 @@ def test_to_os_env(
     assert os.getenv("DB_USERNAME") == "example_username"
     assert os.getenv("DB_PASSWORD") == "example_password"
     assert os.getenv("API_KEY") == "example_api_key"
+
+
+@pytest.mark.parametrize("file_format", ["env", "json", "yaml", "xml"])
+def test_load_in_memory_from_read_only_directory(
+    tmp_path, plaintext_files, file_format
+):
+    """
+    Test that loading never writes next to the encrypted file.
+    """
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(os.urandom(KEY_SIZE))
+    secrets = tmp_path / "secrets"
+    secrets.mkdir()
+    # No suffix: the format comes from the binary container header
+    encrypted = secrets / "variables"
+    source = tmp_path / f"variables.{file_format}"
+    source.write_bytes(plaintext_files[file_format].read_bytes())
+    encrypt_file_binary(source, encrypted, key_file.read_bytes())
+
+    secrets.chmod(0o555)
+    try:
+        loader = EncryptedEnvLoader(file_path=encrypted, key_file=key_file).load()
+    finally:
+        secrets.chmod(0o755)
+
+    assert loader.decrypted_data["DB_USERNAME"] == "example_username"
+    assert os.listdir(secrets) == ["variables"]
+
+
+def test_lazy_encrypted_env(encrypted_files, key_file, monkeypatch):
+    """
+    Test that LazyEncryptedEnv decrypts once, on first access, without
+    touching os.environ.
+    """
+    monkeypatch.delenv("DB_USERNAME", raising=False)
+    with patch(
+        "envcloak.encryptor.read_encrypted_file", wraps=read_encrypted_file
+    ) as mock_read:
+        env = LazyEncryptedEnv(encrypted_files["env"], key_file=key_file)
+        assert not env.loaded
+        assert mock_read.call_count == 0
+        assert "example" not in repr(env)
+
+        assert env["DB_USERNAME"] == "example_username"
+        assert env.get("MISSING", "default") == "default"
+        assert "API_KEY" in env
+        assert dict(env)["DB_PASSWORD"] == "example_password"
+        assert env.loaded
+        assert mock_read.call_count == 1
+
+    assert "DB_USERNAME" not in os.environ
+    with pytest.raises(KeyError):
+        env["MISSING"]
+
+
+def test_aload_encrypted_env(encrypted_files, key_file):
+    """
+    Test that the async loader gives the same result as the sync one.
+    """
+    loader = asyncio.run(aload_encrypted_env(encrypted_files["yaml"], key_file))
+    assert loader.decrypted_data["DB_PASSWORD"] == "example_password"
+
+    with pytest.raises(EncryptedEnvLoaderException):
+        asyncio.run(aload_encrypted_env("missing.env.enc", key_file))
+
+
+def test_aload_encrypted_envs_merges_in_order(tmp_path, key_file):
+    """
+    Test that concurrent loads are merged in the declared order, not in
+    completion order.
+    """
+    key = key_file.read_bytes()
+    paths = []
+    for layer in ("base", "region", "service"):
+        source = tmp_path / f"{layer}.env"
+        source.write_text(f"LAYER={layer}\n{layer.upper()}=1\n")
+        paths.append(tmp_path / f"{layer}.env.enc")
+        encrypt_file_binary(source, paths[-1], key)
+
+    real_load = EncryptedEnvLoader.load
+
+    def slow_first_layer(self, key=None):
+        if self.file_path.name.startswith("base"):
+            time.sleep(0.05)
+        return real_load(self, key)
+
+    with patch.object(EncryptedEnvLoader, "load", slow_first_layer):
+        merged = asyncio.run(aload_encrypted_envs(paths, key_file=key_file))
+        assert merged == {
+            "LAYER": "service",
+            "BASE": "1",
+            "REGION": "1",
+            "SERVICE": "1",
+        }
+        merged = load_encrypted_envs(paths, key_file=key_file, jobs=3)
+    assert merged.source("LAYER") == str(paths[2])
+    assert merged.source("BASE") == str(paths[0])
+    assert merged.layers == [str(path) for path in paths]
+
+
+def test_load_encrypted_envs_reads_each_key_once(tmp_path, key_file, monkeypatch):
+    """
+    Test that layers share key reads and that a keyring selects per-layer keys.
+    """
+    other_key = tmp_path / "other.key"
+    other_key.write_bytes(os.urandom(KEY_SIZE))
+    paths = []
+    for layer, key in (("base", key_file), ("secret", other_key), ("app", key_file)):
+        source = tmp_path / f"{layer}.env"
+        source.write_text(f"LAYER={layer}\n")
+        paths.append(tmp_path / f"{layer}.env.enc")
+        encrypt_file_binary(source, paths[-1], key.read_bytes())
+
+    real_read_key = EncryptedEnvLoader.read_key
+    reads = []
+
+    def counting_read_key(self):
+        reads.append(self.key_file)
+        return real_read_key(self)
+
+    with patch.object(EncryptedEnvLoader, "read_key", counting_read_key):
+        merged = load_encrypted_envs(
+            paths, key_file=key_file, keyring={paths[1]: other_key}
+        )
+    assert reads == [key_file, other_key]
+    assert dict(merged) == {"LAYER": "app"}
+
+    monkeypatch.delenv("LAYER", raising=False)
+    merged.to_os_env()
+    assert os.environ["LAYER"] == "app"
+
+    with pytest.raises(EncryptedEnvLoaderException):
+        load_encrypted_envs([paths[0], tmp_path / "missing.env.enc"], key_file=key_file)
+    with pytest.raises(EncryptedEnvLoaderException):
+        load_encrypted_envs(paths, key_file=key_file)  # Wrong key for one layer
+
+
+def test_loader_key_source_messages(tmp_path):
+    """
+    Test that a missing key and a key given twice are reported differently.
+    """
+    path = tmp_path / "variables.env.enc"
+    with pytest.raises(EncryptedEnvLoaderException) as missing:
+        EncryptedEnvLoader(path)
+    assert str(missing.value).endswith("Provide either a key file or a password.")
+    with pytest.raises(EncryptedEnvLoaderException, match="not both"):
+        EncryptedEnvLoader(path, key_file=tmp_path / "k.key", password="pw")
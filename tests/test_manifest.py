@@ -0,0 +1,148 @@
+import os
+import time
+import pytest
+from click.testing import CliRunner
+from envcloak.cli import main
+from envcloak.constants import KEY_SIZE, MANIFEST_FILE
+from envcloak.exceptions import DecryptionException
+from envcloak.manifest import (
+    ManifestEntry,
+    file_digest,
+    load_manifest,
+    save_manifest,
+    plan_changes,
+)
+from envcloak.walker import walk_files
+
+OLD = time.time_ns() - 3600 * 10**9  # Outside the racy window
+
+
+def _write(path, content, mtime_ns=OLD):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_manifest_round_trip(tmp_path, key):
+    """
+    Test that a saved manifest loads back, is sealed and leaves no temp files.
+    """
+    path = tmp_path / MANIFEST_FILE
+    entries = {"prod/db.env": ManifestEntry(8, OLD, "ab" * 32, "json")}
+    save_manifest(path, entries, key)
+
+    assert load_manifest(path, key) == entries
+    assert b"prod/db.env" not in path.read_bytes()
+    assert os.listdir(tmp_path) == [MANIFEST_FILE]
+    assert load_manifest(tmp_path / "missing", key) == {}
+    with pytest.raises(DecryptionException):
+        load_manifest(path, os.urandom(KEY_SIZE))
+
+
+def test_manifest_drops_racy_mtimes(tmp_path, key):
+    """
+    Test that very recent mtimes are not trusted on the next run.
+    """
+    path = tmp_path / MANIFEST_FILE
+    entries = {"a.env": ManifestEntry(1, time.time_ns(), "00", "json")}
+    save_manifest(path, entries, key)
+    assert load_manifest(path, key)["a.env"].mtime_ns == 0
+
+
+def test_plan_changes(tmp_path):
+    """
+    Test classification of unchanged, touched, modified, added and removed files.
+    """
+    source = tmp_path / "src"
+    for name in ("same", "touched", "modified", "added", "lost_output"):
+        _write(source / f"{name}.env", f"{name.upper()}=1\n")
+    manifest = {
+        entry.relative: ManifestEntry(
+            entry.size, entry.mtime_ns, file_digest(entry.path), "json"
+        )
+        for entry in walk_files(source)
+        if entry.relative != "added.env"
+    }
+    manifest["deleted.env"] = ManifestEntry(1, OLD, "00", "json")
+
+    _write(source / "touched.env", "TOUCHED=1\n", OLD + 10**9)
+    _write(source / "modified.env", "MODIFIED=2\n", OLD + 10**9)  # Same size
+
+    outputs = {"same.env", "touched.env", "modified.env", "added.env"}
+    changed, unchanged, removed = plan_changes(
+        walk_files(source), manifest, "json", outputs
+    )
+    assert [entry.relative for entry in changed] == [
+        "added.env",
+        "lost_output.env",
+        "modified.env",
+    ]
+    assert sorted(unchanged) == ["same.env", "touched.env"]
+    assert unchanged["touched.env"].mtime_ns == OLD + 10**9
+    assert removed == ["deleted.env"]
+
+    # Another container means everything is re-encrypted
+    changed, unchanged, _ = plan_changes(
+        walk_files(source), manifest, "binary", outputs
+    )
+    assert not unchanged
+
+
+def test_cli_encrypt_incremental(tmp_path, key):
+    """
+    Test that repeated `encrypt --incremental` runs only touch changed files.
+    """
+    runner = CliRunner()
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(key)
+    source = tmp_path / "configs"
+    output = tmp_path / "encrypted"
+    for name in ("a", "b", "c"):
+        _write(source / "nested" / f"{name}.env", f"{name.upper()}=1\n")
+    command = [
+        "encrypt",
+        "--directory",
+        str(source),
+        "--output",
+        str(output),
+        "--key-file",
+        str(key_file),
+        "--incremental",
+    ]
+
+    result = runner.invoke(main, command)
+    assert result.exit_code == 0, result.output
+    assert "Encrypted 3 of 3 file(s)." in result.output
+    snapshot = {p.name: p.read_bytes() for p in (output / "nested").iterdir()}
+    manifest_before = (output / MANIFEST_FILE).read_bytes()
+
+    result = runner.invoke(main, command)
+    assert result.exit_code == 0, result.output
+    assert "Skipped 3 unchanged file(s)." in result.output
+    assert "Encrypted 0 of 0 file(s)." in result.output
+    assert {p.name: p.read_bytes() for p in (output / "nested").iterdir()} == snapshot
+    assert (output / MANIFEST_FILE).read_bytes() == manifest_before
+
+    _write(source / "nested" / "a.env", "A=changed\n")
+    (source / "nested" / "b.env").unlink()
+    _write(source / "d.env", "D=1\n")
+    result = runner.invoke(main, command)
+    assert result.exit_code == 0, result.output
+    assert "Skipped 1 unchanged file(s)." in result.output
+    assert "Encrypted 2 of 2 file(s)." in result.output
+    assert "b.env.enc removed" in result.output
+    assert sorted(entry.relative for entry in walk_files(output)) == [
+        MANIFEST_FILE,
+        "d.env.enc",
+        "nested/a.env.enc",
+        "nested/c.env.enc",
+    ]
+    assert (output / "nested" / "c.env.enc").read_bytes() == snapshot["c.env.enc"]
+    assert (output / "nested" / "a.env.enc").read_bytes() != snapshot["a.env.enc"]
+
+    # A manifest sealed with another key is ignored and everything is redone
+    other_key = tmp_path / "other.key"
+    other_key.write_bytes(os.urandom(KEY_SIZE))
+    result = runner.invoke(main, command[:-2] + [str(other_key), "--incremental"])
+    assert "Ignoring unreadable manifest" in result.output
+    assert "Encrypted 3 of 3 file(s)." in result.output
@@ -0,0 +1,102 @@
+import os
+import json
+import pytest
+from unittest.mock import patch
+from envcloak.loader import EncryptedEnvLoader, load_encrypted_env
+from envcloak.preload import preload_encrypted_env, preload_stats, clear_preloaded
+from envcloak.constants import KEY_SIZE
+
+
+@pytest.fixture(autouse=True)
+def clear_preloads():
+    """
+    Fixture clearing preloaded data after each test.
+    """
+    yield
+    clear_preloaded()
+
+
+def in_child(func):
+    """
+    Run `func` in a forked child and return its JSON result.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover - runs in the child
+        try:
+            os.close(read_fd)
+            os.write(write_fd, json.dumps(func()).encode())
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        result = json.loads(f.read())
+    os.waitpid(pid, 0)
+    return result
+
+
+def test_preload_avoids_decryption(encrypted, key_file, tmp_path):
+    """
+    Test that loads of a preloaded file with the same key skip decryption.
+    """
+    preload_encrypted_env(encrypted, key_file=key_file)
+    before = preload_stats()
+
+    with patch.object(EncryptedEnvLoader, "load") as load:
+        loader = load_encrypted_env(str(encrypted), key_file=str(key_file))
+        load.assert_not_called()
+    assert loader.decrypted_data == {"DB_USERNAME": "example_username"}
+    # Callers get their own copy
+    loader.decrypted_data["DB_USERNAME"] = "changed"
+    loader = load_encrypted_env(encrypted, key_file=key_file)
+    assert loader.decrypted_data["DB_USERNAME"] == "example_username"
+    assert preload_stats()["avoided"] == before["avoided"] + 2
+
+    # Another key is not served from the preload
+    other_key = tmp_path / "other.key"
+    other_key.write_bytes(os.urandom(KEY_SIZE))
+    with patch.object(EncryptedEnvLoader, "load") as load:
+        load_encrypted_env(encrypted, key_file=other_key)
+        load.assert_called_once()
+
+    with pytest.raises(ValueError):
+        preload_encrypted_env(encrypted, key_file=key_file, in_children="share")
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+@pytest.mark.parametrize(
+    "policy, change_file, expected",
+    [
+        ("keep", True, {"avoided": 1, "inherited": 1, "value": "example_username"}),
+        ("verify", False, {"avoided": 1, "inherited": 1, "value": "example_username"}),
+        ("verify", True, {"avoided": 0, "inherited": 0, "value": "rotated"}),
+        ("wipe", False, {"avoided": 0, "inherited": 0, "value": "example_username"}),
+    ],
+)
+def test_preload_in_forked_children(
+    encrypted, key_file, write_env, policy, change_file, expected
+):
+    """
+    Test what forked children do with preloaded data under each policy.
+    """
+    loader = preload_encrypted_env(encrypted, key_file=key_file, in_children=policy)
+    if change_file:
+        write_env("DB_USERNAME=rotated\n")
+    forks = preload_stats()["forks"]
+
+    def child():
+        wiped = not loader.decrypted_data
+        value = load_encrypted_env(encrypted, key_file).decrypted_data["DB_USERNAME"]
+        stats = preload_stats()
+        return {
+            "avoided": stats["avoided"],
+            "inherited": stats["inherited"],
+            "value": value,
+            "wiped": wiped,
+        }
+
+    result = in_child(child)
+    assert result.pop("wiped") == (policy == "wipe")
+    assert result == expected
+    assert preload_stats()["forks"] == forks + 1
+    assert loader.decrypted_data == {"DB_USERNAME": "example_username"}
@@ -0,0 +1,462 @@
+import os
+from unittest.mock import patch
+import pytest
+from click.testing import CliRunner
+from dotenv import dotenv_values
+from envcloak.cli import main
+from envcloak.constants import KEY_SIZE
+from envcloak.encryptor import encrypt_file_records, read_encrypted_file
+from envcloak.exceptions import DecryptionException, EncryptionException
+from envcloak.kdf import PasswordKey, get_kdf
+from envcloak.loader import EncryptedEnvLoader, LazyEncryptedEnv
+from envcloak.records import (
+    RecordFile,
+    pack_records,
+    read_records,
+    update_records,
+    append_records,
+    compact_records,
+    format_dotenv,
+    is_records_container,
+)
+import envcloak.records as records_module
+
+ENTRIES = {
+    "DB_USERNAME": "example_username",
+    "DB_PASSWORD": "p'a\"ss\\word",
+    "MULTILINE": "line1\nline2",
+    "EMPTY": "",
+}
+
+
+@pytest.fixture
+def records_file(tmp_path, key):
+    """
+    Fixture for a records container holding ENTRIES.
+    """
+    path = tmp_path / "variables.env.enc"
+    path.write_bytes(pack_records(ENTRIES, key))
+    return path
+
+
+def test_records_round_trip(records_file, key):
+    """
+    Test that all variables come back and no name or value is in the clear.
+    """
+    data = records_file.read_bytes()
+    assert is_records_container(data)
+    assert b"DB_USERNAME" not in data
+    assert b"example_username" not in data
+    assert read_records(records_file, key) == dict(sorted(ENTRIES.items()))
+
+    with pytest.raises(DecryptionException):
+        read_records(records_file, os.urandom(KEY_SIZE))
+
+
+def test_records_get_decrypts_one_record(records_file, key):
+    """
+    Test that a lookup opens exactly one record.
+    """
+    with RecordFile(records_file, key) as records:
+        assert len(records) == len(ENTRIES)
+        with patch.object(
+            records_module, "_open_record", wraps=records_module._open_record
+        ) as opened:
+            assert records.get("DB_PASSWORD") == ENTRIES["DB_PASSWORD"]
+            assert records.get("MISSING", "default") == "default"
+            assert "MULTILINE" in records
+            assert opened.call_count == 1
+
+
+def test_records_are_bound_to_their_names(tmp_path, key):
+    """
+    Test that swapping two records in the file fails authentication.
+    """
+    path = tmp_path / "variables.env.enc"
+    path.write_bytes(pack_records({"A": "1", "B": "2"}, key))
+    with RecordFile(path, key) as records:
+        (a_offset, length, _), (b_offset, _, _) = records._locations().values()
+    data = bytearray(path.read_bytes())
+    a = data[a_offset : a_offset + length]
+    data[a_offset : a_offset + length] = data[b_offset : b_offset + length]
+    data[b_offset : b_offset + length] = a
+    path.write_bytes(bytes(data))
+    with pytest.raises(DecryptionException):
+        read_records(path, key)
+
+
+def test_records_reject_older_versions(tmp_path, key):
+    """
+    Test that an older record of the same name and length cannot be spliced
+    back in after an update, nor carried over by a compaction.
+    """
+    path = tmp_path / "variables.env.enc"
+    path.write_bytes(pack_records({"PASSWORD": "oldpass1"}, key))
+    with RecordFile(path, key) as records:
+        ((offset, length, _),) = records._locations().values()
+    old_record = path.read_bytes()[offset : offset + length]
+
+    update_records(path, {"PASSWORD": "newpass1"}, key)
+    with RecordFile(path, key) as records:
+        ((offset, length, _),) = records._locations().values()
+    assert length == len(old_record)
+    data = bytearray(path.read_bytes())
+    data[offset : offset + length] = old_record
+    path.write_bytes(bytes(data))
+    with pytest.raises(DecryptionException, match="does not match the index"):
+        read_records(path, key)
+    with pytest.raises(DecryptionException, match="does not match the index"):
+        compact_records(path, key)
+
+
+def test_records_with_password(tmp_path):
+    """
+    Test that password-protected records need only the password.
+    """
+    path = tmp_path / "variables.env.enc"
+    key = PasswordKey("hunter2", get_kdf("pbkdf2", iterations=1000))
+    path.write_bytes(pack_records(ENTRIES, key))
+
+    assert read_records(path, PasswordKey("hunter2"))["DB_USERNAME"] == (
+        "example_username"
+    )
+    with pytest.raises(DecryptionException):
+        read_records(path, os.urandom(KEY_SIZE))
+    with pytest.raises(EncryptionException):
+        pack_records(ENTRIES, "not-a-key")
+
+
+def test_update_records_keeps_other_records(records_file, key):
+    """
+    Test that updating one variable leaves the other sealed records untouched.
+    """
+    with RecordFile(records_file, key) as records:
+        before = records.raw_records()
+
+    update_records(
+        records_file, {"DB_PASSWORD": "rotated", "EMPTY": None, "NEW": "1"}, key
+    )
+
+    with RecordFile(records_file, key) as records:
+        after = records.raw_records()
+        assert records.to_dict() == {
+            "DB_PASSWORD": "rotated",
+            "DB_USERNAME": "example_username",
+            "MULTILINE": "line1\nline2",
+            "NEW": "1",
+        }
+    assert len(set(before.values()) & set(after.values())) == 2
+    assert os.listdir(records_file.parent) == [records_file.name]
+
+
+def test_format_dotenv_round_trip(tmp_path):
+    """
+    Test that the .env output of a records container parses back unchanged.
+    """
+    path = tmp_path / "out.env"
+    path.write_text(format_dotenv(ENTRIES))
+    assert dotenv_values(path) == ENTRIES
+
+
+def test_loader_reads_records(records_file, key, tmp_path):
+    """
+    Test EncryptedEnvLoader and LazyEncryptedEnv on a records container.
+    """
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(key)
+    loader = EncryptedEnvLoader(records_file, key_file=key_file).load()
+    assert loader.decrypted_data["MULTILINE"] == "line1\nline2"
+
+    env = LazyEncryptedEnv(records_file, key_file=key_file)
+    assert env["DB_USERNAME"] == "example_username"
+    assert "MISSING" not in env
+    assert not env.loaded
+    assert len(env) == len(ENTRIES)
+    assert env.loaded
+
+
+def test_cli_encrypt_get_decrypt(tmp_path, key):
+    """
+    Test `encrypt --container records`, `get` and `decrypt` together.
+    """
+    runner = CliRunner()
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(key)
+    source = tmp_path / "variables.env"
+    source.write_text("DB_USERNAME=example_username\nAPI_KEY='abc def'\n")
+    encrypted = tmp_path / "variables.env.enc"
+
+    result = runner.invoke(
+        main,
+        [
+            "encrypt",
+            "--input",
+            str(source),
+            "--output",
+            str(encrypted),
+            "--key-file",
+            str(key_file),
+            "--container",
+            "records",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert is_records_container(encrypted.read_bytes())
+
+    result = runner.invoke(
+        main, ["get", "API_KEY", "--input", str(encrypted), "--key-file", str(key_file)]
+    )
+    assert result.exit_code == 0, result.output
+    assert result.output == "abc def\n"
+
+    result = runner.invoke(
+        main, ["get", "MISSING", "--input", str(encrypted), "--key-file", str(key_file)]
+    )
+    assert result.exit_code == 1
+    assert "MISSING is not set" in result.output
+
+    decrypted = tmp_path / "decrypted.env"
+    result = runner.invoke(
+        main,
+        [
+            "decrypt",
+            "--input",
+            str(encrypted),
+            "--output",
+            str(decrypted),
+            "--key-file",
+            str(key_file),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert dict(dotenv_values(decrypted)) == dict(dotenv_values(source))
+
+
+def test_cli_get_other_containers(tmp_path, key):
+    """
+    Test that `get` also reads whole-file containers.
+    """
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(key)
+    source = tmp_path / "variables.json"
+    source.write_text('{"TOKEN": "secret"}')
+    encrypted = tmp_path / "variables.json.enc"
+    runner = CliRunner()
+    runner.invoke(
+        main,
+        [
+            "encrypt",
+            "-i",
+            str(source),
+            "-o",
+            str(encrypted),
+            "-k",
+            str(key_file),
+            "--container",
+            "binary",
+        ],
+    )
+    result = runner.invoke(
+        main, ["get", "TOKEN", "-i", str(encrypted), "-k", str(key_file)]
+    )
+    assert result.output == "secret\n"
+
+    result = runner.invoke(
+        main, ["get", "TOKEN", "-i", str(encrypted), "-k", str(tmp_path / "nokey")]
+    )
+    assert result.exit_code == 1
+
+
+def test_append_records_replays_log(records_file, key):
+    """
+    Test that set/unset entries are appended and replayed by readers.
+    """
+    size = records_file.stat().st_size
+    append_records(records_file, {"DB_PASSWORD": "rotated", "NEW": "1"}, key)
+    append_records(records_file, {"EMPTY": None, "NEW": "2"}, key)
+    data = records_file.read_bytes()
+    assert data.startswith(pack_records({}, key)[:4])
+    assert b"rotated" not in data
+    assert len(data) - size < 300  # Only the changes were written
+
+    with RecordFile(records_file, key) as records:
+        assert records.log_offset == size
+        assert records.log_size == len(data) - size
+        assert records.to_dict() == {
+            "DB_PASSWORD": "rotated",
+            "DB_USERNAME": "example_username",
+            "MULTILINE": "line1\nline2",
+            "NEW": "2",
+        }
+
+    compact_records(records_file, key)
+    with RecordFile(records_file, key) as records:
+        assert records.log_size == 0
+        assert records.get("NEW") == "2"
+    assert records_file.stat().st_size < len(data)
+
+
+def test_append_records_tampering_and_torn_writes(records_file, key):
+    """
+    Test that altered log entries are rejected and a torn tail is ignored.
+    """
+    original = records_file.read_bytes()
+    append_records(records_file, {"A": "1"}, key)
+    complete = records_file.read_bytes()
+
+    # An interrupted append leaves a partial entry that the next one replaces
+    records_file.write_bytes(complete + b"\x01" + b"\x00" * 10)
+    assert read_records(records_file, key)["A"] == "1"
+    append_records(records_file, {"B": "2"}, key)
+    assert read_records(records_file, key)["B"] == "2"
+
+    tampered = bytearray(complete)
+    tampered[len(original) + 5] ^= 0x01
+    records_file.write_bytes(bytes(tampered))
+    with pytest.raises(DecryptionException):
+        read_records(records_file, key)
+
+    # Entries cannot be replayed on another base file
+    other = records_file.parent / "other.env.enc"
+    other.write_bytes(pack_records({"A": "0"}, key) + complete[len(original) :])
+    with pytest.raises(DecryptionException):
+        read_records(other, key)
+
+
+def test_append_records_auto_compacts(records_file, key):
+    """
+    Test that a log larger than the records is folded in automatically.
+    """
+    large = "x" * (64 * 1024)
+    assert not append_records(records_file, {"LARGE": large}, key, auto_compact=False)
+    assert append_records(records_file, {"LARGE": large + "y"}, key)
+    with RecordFile(records_file, key) as records:
+        assert records.log_size == 0
+        assert records.get("LARGE") == large + "y"
+
+
+def test_cli_set_unset_compact(records_file, key, tmp_path):
+    """
+    Test the set, unset and compact commands.
+    """
+    runner = CliRunner()
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(key)
+    options = ["--input", str(records_file), "--key-file", str(key_file)]
+
+    result = runner.invoke(main, ["set", "API_KEY", "abc", *options])
+    assert result.exit_code == 0, result.output
+    assert "Set API_KEY" in result.output
+    result = runner.invoke(main, ["set", "TOKEN", *options], input="from-stdin\n")
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(main, ["unset", "DB_USERNAME", *options])
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(main, ["compact", *options])
+    assert result.exit_code == 0, result.output
+
+    values = read_records(records_file, key)
+    assert values["API_KEY"] == "abc"
+    assert values["TOKEN"] == "from-stdin"
+    assert "DB_USERNAME" not in values
+
+    plain = tmp_path / "plain.env.enc"
+    plain.write_text("{}")
+    result = runner.invoke(
+        main, ["set", "A", "1", "--input", str(plain), "--key-file", str(key_file)]
+    )
+    assert result.exit_code != 0
+    assert "not a records container" in result.output
+
+
+def test_records_reject_other_formats(tmp_path, key):
+    """
+    Test that YAML or JSON plaintext is refused by the records container
+    instead of being sealed as an empty file.
+    """
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(key)
+    source = tmp_path / "variables.yaml"
+    source.write_text("DB_USERNAME: example_username\n")
+    encrypted = tmp_path / "variables.yaml.enc"
+    runner = CliRunner()
+    result = runner.invoke(
+        main,
+        [
+            "encrypt",
+            "-i",
+            str(source),
+            "-o",
+            str(encrypted),
+            "-k",
+            str(key_file),
+            "--container",
+            "records",
+        ],
+    )
+    assert "only holds .env files" in result.output
+    assert not encrypted.exists()
+
+    source = tmp_path / "variables.json"
+    source.write_text('{"TOKEN": "secret"}')
+    encrypted = tmp_path / "variables.json.enc"
+    runner.invoke(
+        main, ["encrypt", "-i", str(source), "-o", str(encrypted), "-k", str(key_file)]
+    )
+    converted = tmp_path / "converted.enc"
+    result = runner.invoke(
+        main,
+        [
+            "convert",
+            "-i",
+            str(encrypted),
+            "-o",
+            str(converted),
+            "-k",
+            str(key_file),
+            "--to",
+            "records",
+        ],
+    )
+    assert result.exit_code == 1
+    assert "only holds .env files" in result.output
+    assert not converted.exists()
+
+
+def test_lazy_env_reuses_key_and_closes(records_file, key, tmp_path):
+    """
+    Test that LazyEncryptedEnv reads the key once for a records container
+    and closes the file when done.
+    """
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(key)
+    with patch(
+        "envcloak.loader.EncryptedEnvLoader.read_key", autospec=True, return_value=key
+    ) as mock_read_key:
+        with LazyEncryptedEnv(records_file, key_file=key_file) as env:
+            assert env["DB_USERNAME"] == "example_username"
+            records = env._records
+            assert dict(env) == ENTRIES
+        assert mock_read_key.call_count == 1
+    assert records._file.closed
+
+    env = LazyEncryptedEnv(records_file, key_file=key_file)
+    assert env["DB_USERNAME"] == "example_username"
+    records = env._records
+    env.close()
+    assert records._file.closed
+    assert env["DB_USERNAME"] == "example_username"
+    env.close()
+
+
+def test_records_keep_variable_references(tmp_path, key, monkeypatch):
+    """
+    Test that ${VAR} references are sealed as written, not resolved from
+    the environment of the encrypting machine.
+    """
+    monkeypatch.setenv("HOME", "/encrypting/host")
+    source = tmp_path / "variables.env"
+    source.write_text("DATA_DIR=${HOME}/data\n")
+    encrypted = tmp_path / "variables.env.enc"
+    encrypt_file_records(source, encrypted, key)
+    assert read_records(encrypted, key) == {"DATA_DIR": "${HOME}/data"}
+    assert b"/encrypting/host" not in read_encrypted_file(encrypted, key)
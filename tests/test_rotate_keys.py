@@ -0,0 +1,222 @@
+import os
+import pytest
+from unittest.mock import patch
+from click.testing import CliRunner
+from envcloak.cli import main
+from envcloak.constants import KEY_SIZE, MANIFEST_FILE, STREAM_CHUNK_SIZE
+from envcloak.encryptor import (
+    can_decrypt,
+    encrypt_file,
+    encrypt_file_binary,
+    encrypt_file_stream,
+    read_encrypted_file,
+    rotate_file,
+)
+from envcloak.exceptions import DecryptionException, FileDecryptionException
+from envcloak.manifest import load_manifest
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """
+    Fixture for a directory of files encrypted with an old key, in several
+    containers, plus a new key.
+    """
+    old_key = tmp_path / "old.key"
+    new_key = tmp_path / "new.key"
+    old_key.write_bytes(os.urandom(KEY_SIZE))
+    new_key.write_bytes(os.urandom(KEY_SIZE))
+    source = tmp_path / "secrets"
+    (source / "nested").mkdir(parents=True)
+    plain = tmp_path / "plain.env"
+    for name, encrypt in (
+        ("a.env.enc", encrypt_file),
+        ("b.env.enc", encrypt_file_binary),
+        ("nested/c.env.enc", encrypt_file_stream),
+    ):
+        plain.write_text(f"NAME={name}\n")
+        encrypt(plain, source / name, old_key.read_bytes())
+    plain.unlink()
+    return source, old_key, new_key
+
+
+def rotate(*args):
+    """
+    Run `envcloak rotate-keys` with the given arguments.
+    """
+    return CliRunner().invoke(main, ["rotate-keys", *args])
+
+
+def test_rotate_file_atomic_keeps_old_file_on_failure(tree):
+    """
+    Test that a failed in-place rotation leaves the file untouched and no
+    temporary file behind.
+    """
+    source, old_key, new_key = tree
+    path = source / "b.env.enc"
+    before = path.read_bytes()
+    with pytest.raises(FileDecryptionException):
+        rotate_file(path, path, new_key.read_bytes(), old_key.read_bytes(), True)
+    assert path.read_bytes() == before
+    assert sorted(os.listdir(source)) == ["a.env.enc", "b.env.enc", "nested"]
+
+
+def test_rotate_directory_in_place(tree):
+    """
+    Test that `--directory` without `--output` replaces every file in place,
+    keeping its container, and reports progress.
+    """
+    source, old_key, new_key = tree
+    containers = {path: path.read_bytes()[:4] for path in source.rglob("*.enc")}
+    result = rotate(
+        "-d", str(source), "-ok", str(old_key), "-nk", str(new_key), "-j", "2"
+    )
+    assert result.exit_code == 0, result.output
+    assert "[3/3]" in result.output
+    assert "Rotated 3 of 3 file(s)." in result.output
+    for path, magic in containers.items():
+        assert path.read_bytes()[:4] == magic
+        assert read_encrypted_file(path, new_key.read_bytes()).startswith(b"NAME=")
+    assert len(list(source.rglob("*"))) == 4  # 3 files and "nested"
+
+
+def test_rotate_directory_resumes_after_interruption(tree):
+    """
+    Test that a second run skips the files an interrupted run already
+    rotated, both in place and into a mirrored tree.
+    """
+    source, old_key, new_key = tree
+    real_rotate = rotate_file
+    calls = []
+
+    def interrupted(*args, **kwargs):
+        calls.append(args[0])
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        return real_rotate(*args, **kwargs)
+
+    with patch("envcloak.commands.rotate_keys.rotate_file", interrupted):
+        rotate("-d", str(source), "-ok", str(old_key), "-nk", str(new_key), "-j", "1")
+    result = rotate("-d", str(source), "-ok", str(old_key), "-nk", str(new_key))
+    assert result.exit_code == 0, result.output
+    assert (
+        "Rotated 2 of 3 file(s), skipped 1 (already under the new key)."
+        in result.output
+    )
+    for path in source.rglob("*.enc"):
+        assert read_encrypted_file(path, new_key.read_bytes())
+
+    mirror = source.parent / "mirror"
+    args = ("-d", str(source), "-ok", str(new_key), "-nk", str(old_key))
+    assert rotate(*args, "-o", str(mirror)).exit_code == 0
+    result = rotate(*args, "-o", str(mirror))
+    assert result.exit_code == 0, result.output
+    assert (
+        "Rotated 0 of 3 file(s), skipped 3 (already under the new key)."
+        in result.output
+    )
+    assert read_encrypted_file(mirror / "nested" / "c.env.enc", old_key.read_bytes())
+
+
+def test_rotate_directory_reports_failures(tree):
+    """
+    Test that files that decrypt with neither key fail without stopping the
+    others, and that the exit status is 1.
+    """
+    source, old_key, new_key = tree
+    (source / "other.env.enc").write_bytes(b"not encrypted")
+    result = rotate("-d", str(source), "-ok", str(old_key), "-nk", str(new_key))
+    assert result.exit_code == 1
+    assert "Rotated 3 of 4 file(s)." in result.output
+    assert "Error rotating" in result.output
+
+
+def test_rotate_single_file_force(tree):
+    """
+    Test that `--force` lets a single-file rotation overwrite its output.
+    """
+    source, old_key, new_key = tree
+    output = source / "existing.enc"
+    output.write_bytes(b"old output")
+    args = ["-i", str(source / "a.env.enc"), "-ok", str(old_key), "-nk", str(new_key)]
+    result = rotate(*args, "-o", str(output))
+    assert "Output path already exists" in result.output
+    result = rotate(*args, "-o", str(output), "--force")
+    assert "Keys rotated" in result.output
+    assert read_encrypted_file(output, new_key.read_bytes()) == b"NAME=a.env.enc\n"
+
+
+def test_rotate_truncated_container(tree):
+    """
+    Test that a truncated binary container is reported, not a traceback.
+    """
+    source, old_key, new_key = tree
+    truncated = source / "truncated.env.enc"
+    truncated.write_bytes(b"ECLB\x01")
+    with pytest.raises(FileDecryptionException):
+        rotate_file(truncated, source / "out.enc", old_key.read_bytes(), b"")
+    result = rotate("-i", str(truncated), "-ok", str(old_key), "-nk", str(new_key))
+    assert result.exception is None
+    assert "Error during key rotation" in result.output
+
+
+def test_rotate_stream_segment_by_segment(tmp_path):
+    """
+    Test that streaming containers are re-sealed without buffering the
+    whole plaintext, and that a wrong key leaves no output behind.
+    """
+    old_key, new_key = os.urandom(KEY_SIZE), os.urandom(KEY_SIZE)
+    plain = tmp_path / "big.env"
+    plain.write_bytes(b"A=" + os.urandom(STREAM_CHUNK_SIZE).hex().encode() + b"\n")
+    source = tmp_path / "big.env.enc"
+    encrypt_file_stream(plain, source, old_key)
+    output = tmp_path / "rotated.enc"
+
+    with patch("envcloak.encryptor.read_encrypted_file", side_effect=AssertionError):
+        rotate_file(source, output, old_key, new_key)
+        assert can_decrypt(output, new_key)
+        assert not can_decrypt(output, old_key)
+    assert read_encrypted_file(output, new_key) == plain.read_bytes()
+
+    output.unlink()
+    with pytest.raises(FileDecryptionException):
+        rotate_file(source, output, new_key, old_key)
+    assert not output.exists()
+
+
+def test_rotate_directory_reseals_incremental_manifest(tmp_path):
+    """
+    Test that the manifest of `encrypt --incremental` moves to the new key
+    with the files, so the next incremental run still skips unchanged files.
+    """
+    old_key = tmp_path / "old.key"
+    new_key = tmp_path / "new.key"
+    old_key.write_bytes(os.urandom(KEY_SIZE))
+    new_key.write_bytes(os.urandom(KEY_SIZE))
+    source = tmp_path / "plain"
+    source.mkdir()
+    (source / "a.env").write_text("A=1\n")
+    (source / "b.env").write_text("B=2\n")
+    output = tmp_path / "encrypted"
+    encrypt = ["encrypt", "-d", str(source), "-o", str(output), "--incremental"]
+    runner = CliRunner()
+    result = runner.invoke(main, [*encrypt, "-k", str(old_key)])
+    assert result.exit_code == 0, result.output
+    manifest = output / MANIFEST_FILE
+
+    result = rotate("-d", str(output), "-ok", str(old_key), "-nk", str(new_key))
+    assert result.exit_code == 0, result.output
+    assert load_manifest(manifest, new_key.read_bytes())
+    with pytest.raises(DecryptionException):
+        load_manifest(manifest, old_key.read_bytes())
+
+    before = {path: path.stat().st_mtime_ns for path in output.glob("*.enc")}
+    result = runner.invoke(main, [*encrypt, "-k", str(new_key)])
+    assert result.exit_code == 0, result.output
+    assert "Ignoring unreadable manifest" not in result.output
+    assert {path: path.stat().st_mtime_ns for path in output.glob("*.enc")} == before
+
+    mirror = tmp_path / "mirror"
+    args = ("-d", str(output), "-ok", str(new_key), "-nk", str(old_key))
+    assert rotate(*args, "-o", str(mirror)).exit_code == 0
+    assert load_manifest(mirror / MANIFEST_FILE, old_key.read_bytes())
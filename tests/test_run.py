@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+from unittest.mock import patch
+from click.testing import CliRunner
+from envcloak.cli import main
+from envcloak.commands.run import build_child_env
+from envcloak.constants import KEY_SIZE
+
+
+@pytest.fixture
+def env_content():
+    """
+    Fixture for .env content with a variable the parent environment also sets.
+    """
+    return "DB_USERNAME=example_username\nSHARED=from-file\n"
+
+
+def test_build_child_env_policies():
+    """
+    Test the merge policies and that the password is not passed on.
+    """
+    parent = {"SHARED": "parent", "PATH": "/bin", "ENVCLOAK_PASSWORD": "hunter2"}
+    values = {"SHARED": "file", "PORT": 8080}
+
+    assert build_child_env(values, "override", parent) == {
+        "SHARED": "file",
+        "PATH": "/bin",
+        "PORT": "8080",
+    }
+    assert build_child_env(values, "keep", parent)["SHARED"] == "parent"
+    assert build_child_env(values, "replace", parent) == {
+        "SHARED": "file",
+        "PORT": "8080",
+    }
+    with pytest.raises(ValueError):
+        build_child_env(values, "merge", parent)
+
+
+def test_build_child_env_values():
+    """
+    Test that unset variables are left out and nested values are refused.
+    """
+    values = {"EMPTY": "", "UNSET": None, "DEBUG": True}
+    assert build_child_env(values, "replace", {}) == {"EMPTY": "", "DEBUG": "True"}
+    with pytest.raises(ValueError, match="DB, HOSTS"):
+        build_child_env({"DB": {"a": 1}, "HOSTS": ["a", "b"]}, "replace", {})
+
+
+def test_run_execs_command_with_env(encrypted, key_file, monkeypatch):
+    """
+    Test that `run` execs the command and leaves os.environ alone.
+    """
+    monkeypatch.setenv("SHARED", "from-parent")
+    monkeypatch.delenv("DB_USERNAME", raising=False)
+    runner = CliRunner()
+    with patch("envcloak.commands.run.os.execvpe") as execvpe:
+        result = runner.invoke(
+            main,
+            [
+                "run",
+                "-i",
+                str(encrypted),
+                "-k",
+                str(key_file),
+                "--merge",
+                "keep",
+                "--",
+                "server",
+                "--port",
+                "8080",
+            ],
+        )
+    assert result.exit_code == 0, result.output
+    file, args, env = execvpe.call_args.args
+    assert (file, args) == ("server", ("server", "--port", "8080"))
+    assert env["DB_USERNAME"] == "example_username"
+    assert env["SHARED"] == "from-parent"
+    assert "DB_USERNAME" not in os.environ
+
+
+def test_run_errors(encrypted, key_file, tmp_path):
+    """
+    Test the exit codes for a missing command and a wrong key.
+    """
+    runner = CliRunner()
+    result = runner.invoke(
+        main,
+        ["run", "-i", str(encrypted), "-k", str(key_file), "--", "no-such-cmd-xyz"],
+    )
+    assert result.exit_code == 127
+    assert "Error running no-such-cmd-xyz" in result.output
+
+    wrong_key = tmp_path / "wrong.key"
+    wrong_key.write_bytes(os.urandom(KEY_SIZE))
+    with patch("envcloak.commands.run.os.execvpe") as execvpe:
+        result = runner.invoke(
+            main, ["run", "-i", str(encrypted), "-k", str(wrong_key), "--", "true"]
+        )
+    assert result.exit_code == 1
+    execvpe.assert_not_called()
+
+
+def test_run_end_to_end(encrypted, key_file):
+    """
+    Test a real exec: the child sees the decrypted variables.
+    """
+    script = "import json, os; print(json.dumps(dict(os.environ)))"
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "envcloak.cli",
+            "run",
+            "-i",
+            str(encrypted),
+            "-k",
+            str(key_file),
+            "--",
+            sys.executable,
+            "-c",
+            script,
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "SHARED": "from-parent"},
+    ).stdout
+    env = json.loads(output)
+    assert env["DB_USERNAME"] == "example_username"
+    assert env["SHARED"] == "from-file"
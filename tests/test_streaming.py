@@ -0,0 +1,164 @@
+import io
+import os
+import json
+import pytest
+from click.testing import CliRunner
+from envcloak.cli import main
+from envcloak.constants import KEY_SIZE, TAG_SIZE, STREAM_MAGIC
+from envcloak.encryptor import encrypt_file, encrypt_file_stream, decrypt_file
+from envcloak.streaming import HEADER_SIZE, encrypt_stream, decrypt_stream
+from envcloak.exceptions import DecryptionException, FileDecryptionException
+
+
+def _encrypt(data: bytes, key: bytes, chunk_size: int) -> bytes:
+    out = io.BytesIO()
+    encrypt_stream(io.BytesIO(data), out, key, chunk_size)
+    return out.getvalue()
+
+
+def _decrypt(data: bytes, key: bytes) -> bytes:
+    out = io.BytesIO()
+    decrypt_stream(io.BytesIO(data), out, key)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("size", [0, 1, 15, 16, 17, 64, 1000])
+def test_stream_round_trip(key, size):
+    """
+    Test that data of various sizes (including exact chunk multiples) round-trips.
+    """
+    data = os.urandom(size)
+    sealed = _encrypt(data, key, chunk_size=16)
+
+    assert sealed.startswith(STREAM_MAGIC)
+    segments = max(1, -(-size // 16))
+    assert len(sealed) == HEADER_SIZE + size + segments * TAG_SIZE
+    assert _decrypt(sealed, key) == data
+
+
+def test_stream_wrong_key(key):
+    """
+    Test that a stream sealed with another key is rejected.
+    """
+    sealed = _encrypt(b"A=1\nB=2\n", key, chunk_size=4)
+    with pytest.raises(DecryptionException):
+        _decrypt(sealed, os.urandom(KEY_SIZE))
+
+
+def test_stream_truncated_at_segment_boundary(key):
+    """
+    Test that dropping trailing segments is detected.
+    """
+    sealed = _encrypt(b"x" * 64, key, chunk_size=16)
+    truncated = sealed[: HEADER_SIZE + 2 * (16 + TAG_SIZE)]
+    with pytest.raises(DecryptionException):
+        _decrypt(truncated, key)
+
+
+def test_stream_reordered_segments(key):
+    """
+    Test that swapping two segments is detected.
+    """
+    sealed = _encrypt(b"a" * 16 + b"b" * 16 + b"c", key, chunk_size=16)
+    segment = 16 + TAG_SIZE
+    first = sealed[HEADER_SIZE : HEADER_SIZE + segment]
+    second = sealed[HEADER_SIZE + segment : HEADER_SIZE + 2 * segment]
+    swapped = (
+        sealed[:HEADER_SIZE] + second + first + sealed[HEADER_SIZE + 2 * segment :]
+    )
+    with pytest.raises(DecryptionException):
+        _decrypt(swapped, key)
+
+
+def test_stream_tampered_header(key):
+    """
+    Test that the header is authenticated together with the segments.
+    """
+    sealed = bytearray(_encrypt(b"secret", key, chunk_size=16))
+    sealed[HEADER_SIZE - 1] ^= 0x01  # Flip a bit in the nonce prefix
+    with pytest.raises(DecryptionException):
+        _decrypt(bytes(sealed), key)
+
+
+def test_decrypt_file_detects_stream(tmp_path, key):
+    """
+    Test that decrypt_file handles both the streaming and the legacy JSON format.
+    """
+    plaintext = tmp_path / "variables.env"
+    plaintext.write_text("DB_USERNAME=example_user\nDB_PASSWORD=example_pass\n")
+
+    streamed = tmp_path / "variables.env.stream.enc"
+    legacy = tmp_path / "variables.env.json.enc"
+    encrypt_file_stream(plaintext, streamed, key, chunk_size=8)
+    encrypt_file(plaintext, legacy, key)
+    assert "ciphertext" in json.loads(legacy.read_text())
+
+    for source in (streamed, legacy):
+        output = tmp_path / (source.name + ".out")
+        decrypt_file(source, output, key)
+        assert output.read_bytes() == plaintext.read_bytes()
+
+
+def test_decrypt_file_stream_failure_removes_output(tmp_path, key):
+    """
+    Test that a failed streaming decryption does not leave partial plaintext behind.
+    """
+    plaintext = tmp_path / "big.env"
+    plaintext.write_bytes(b"K=V\n" * 100)
+    encrypted = tmp_path / "big.env.enc"
+    encrypt_file_stream(plaintext, encrypted, key, chunk_size=32)
+
+    # Corrupt the last segment so that earlier segments decrypt fine
+    data = bytearray(encrypted.read_bytes())
+    data[-1] ^= 0x01
+    encrypted.write_bytes(bytes(data))
+
+    output = tmp_path / "big.env.out"
+    with pytest.raises(FileDecryptionException):
+        decrypt_file(encrypted, output, key)
+    assert not output.exists()
+
+
+def test_cli_encrypt_stream_container(tmp_path, key):
+    """
+    Test the `encrypt --container stream` CLI option together with `decrypt`.
+    """
+    runner = CliRunner()
+    plaintext = tmp_path / "variables.env"
+    plaintext.write_text("API_KEY=example_api_key\n")
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(key)
+    encrypted = tmp_path / "variables.env.enc"
+    decrypted = tmp_path / "variables.env.out"
+
+    result = runner.invoke(
+        main,
+        [
+            "encrypt",
+            "--input",
+            str(plaintext),
+            "--output",
+            str(encrypted),
+            "--key-file",
+            str(key_file),
+            "--container",
+            "stream",
+        ],
+    )
+    assert "encrypted" in result.output
+    assert encrypted.read_bytes().startswith(STREAM_MAGIC)
+
+    result = runner.invoke(
+        main,
+        [
+            "decrypt",
+            "--input",
+            str(encrypted),
+            "--output",
+            str(decrypted),
+            "--key-file",
+            str(key_file),
+        ],
+    )
+    assert "decrypted" in result.output
+    assert decrypted.read_text() == plaintext.read_text()
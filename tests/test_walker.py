@@ -0,0 +1,192 @@
+import os
+from unittest.mock import patch
+import pytest
+from click.testing import CliRunner
+from envcloak.cli import main
+from envcloak.constants import KEY_SIZE
+from envcloak.walker import walk_files, matches, read_ignore_file
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """
+    Fixture for a small configuration tree.
+    """
+    files = {
+        "app.env": "A=1\n",
+        "notes.bak": "old",
+        "prod/db.env": "DB=prod\n",
+        "prod/cache/tmp.env": "T=1\n",
+        "dev/db.env": "DB=dev\n",
+        "dev/nested/deep.json": '{"K": "V"}',
+    }
+    root = tmp_path / "configs"
+    for relative, content in files.items():
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return root
+
+
+def _relative(entries):
+    return [entry.relative for entry in entries]
+
+
+def test_walk_files_recurses_in_sorted_order(tree):
+    """
+    Test that the walker lists nested files with sizes, in path order.
+    """
+    entries = walk_files(tree)
+    assert _relative(entries) == [
+        "app.env",
+        "dev/db.env",
+        "dev/nested/deep.json",
+        "notes.bak",
+        "prod/cache/tmp.env",
+        "prod/db.env",
+    ]
+    sizes = {entry.relative: entry.size for entry in entries}
+    assert sizes["prod/db.env"] == len("DB=prod\n")
+    assert all(os.path.isfile(entry.path) for entry in entries)
+
+
+def test_walk_files_filters(tree):
+    """
+    Test include/exclude globs, suffix filtering and directory patterns.
+    """
+    assert _relative(walk_files(tree, include=["*.env"], exclude=["dev/"])) == [
+        "app.env",
+        "prod/cache/tmp.env",
+        "prod/db.env",
+    ]
+    assert _relative(walk_files(tree, include=["prod/*.env"])) == [
+        "prod/cache/tmp.env",
+        "prod/db.env",
+    ]
+    assert _relative(walk_files(tree, suffix=".json")) == ["dev/nested/deep.json"]
+
+
+def test_walk_files_prunes_excluded_directories(tree):
+    """
+    Test that excluded directories are never scanned.
+    """
+    scanned = []
+    real_scandir = os.scandir
+
+    def recording_scandir(path):
+        scanned.append(os.path.relpath(path, tree))
+        return real_scandir(path)
+
+    with patch("envcloak.walker.os.scandir", side_effect=recording_scandir):
+        walk_files(tree, exclude=["cache", "dev/"])
+    assert sorted(scanned) == [".", "prod"]
+
+
+def test_walk_files_ignore_file_and_skip(tree):
+    """
+    Test that .envcloakignore patterns apply and the skip directory is left out.
+    """
+    (tree / ".envcloakignore").write_text("# backups\n*.bak\n\nnested/\n")
+    assert read_ignore_file(tree) == ["*.bak", "nested/"]
+
+    entries = walk_files(tree, skip=tree / "prod")
+    assert _relative(entries) == ["app.env", "dev/db.env"]
+    assert "notes.bak" in _relative(walk_files(tree, use_ignore_file=False))
+
+
+def test_matches():
+    """
+    Test name versus path patterns.
+    """
+    assert matches("a/b/c.env", ["*.env"])
+    assert matches("a/b/c.env", ["a/*/c.env"])
+    assert not matches("a/b/c.env", ["b/c.env"])
+    assert matches("a/cache", ["cache/"], is_dir=True)
+    assert not matches("a/cache", ["cache/"])
+
+
+def test_cli_directory_round_trip_mirrors_tree(tree, tmp_path):
+    """
+    Test that encrypt/decrypt --directory recurse and mirror the tree.
+    """
+    runner = CliRunner()
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(os.urandom(KEY_SIZE))
+    (tree / ".envcloakignore").write_text("*.bak\n")
+    encrypted = tmp_path / "encrypted"
+    decrypted = tmp_path / "decrypted"
+
+    result = runner.invoke(
+        main,
+        [
+            "encrypt",
+            "--directory",
+            str(tree),
+            "--output",
+            str(encrypted),
+            "--key-file",
+            str(key_file),
+            "--exclude",
+            "cache/",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert _relative(walk_files(encrypted)) == [
+        "app.env.enc",
+        "dev/db.env.enc",
+        "dev/nested/deep.json.enc",
+        "prod/db.env.enc",
+    ]
+
+    result = runner.invoke(
+        main,
+        [
+            "decrypt",
+            "--directory",
+            str(encrypted),
+            "--output",
+            str(decrypted),
+            "--key-file",
+            str(key_file),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert (decrypted / "dev/nested/deep.json").read_text() == '{"K": "V"}'
+    assert (decrypted / "prod/db.env").read_text() == "DB=prod\n"
+
+    result = runner.invoke(
+        main,
+        [
+            "compare",
+            "--file1",
+            str(encrypted),
+            "--file2",
+            str(encrypted),
+            "--key1",
+            str(key_file),
+        ],
+    )
+    assert "identical" in result.output
+
+
+def test_cli_encrypt_directory_nothing_to_do(tree, tmp_path):
+    """
+    Test that a directory with no matching files is reported as empty.
+    """
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(os.urandom(KEY_SIZE))
+    result = CliRunner().invoke(
+        main,
+        [
+            "encrypt",
+            "--directory",
+            str(tree),
+            "--output",
+            str(tmp_path / "out"),
+            "--key-file",
+            str(key_file),
+            "--include",
+            "*.yaml",
+        ],
+    )
+    assert "No files to encrypt" in str(result.exception)
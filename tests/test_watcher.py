@@ -0,0 +1,109 @@
+import os
+import time
+import pytest
+from unittest.mock import patch
+from envcloak.watcher import EnvFileWatcher, EnvDiff, diff_env
+from envcloak.loader import EncryptedEnvLoader
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the watcher"
+        time.sleep(0.01)
+
+
+def test_diff_env():
+    """
+    Test the key-level diff.
+    """
+    diff = diff_env({"A": "1", "B": "2", "C": "3"}, {"A": "1", "B": "x", "D": "4"})
+    assert diff == EnvDiff(added={"D": "4"}, changed={"B": "x"}, removed={"C"})
+
+
+def test_check_reloads_only_changed_content(write_env, key_file, monkeypatch):
+    """
+    Test that check() decrypts only when the file hash changed and applies
+    only the changed keys to os.environ.
+    """
+    path = write_env("A=1\nB=2\n")
+    changes = []
+    watcher = EnvFileWatcher(
+        path,
+        key_file=key_file,
+        on_change=lambda diff, w: changes.append(diff),
+        apply_to_environ=True,
+    )
+    monkeypatch.delenv("A", raising=False)
+    monkeypatch.delenv("B", raising=False)
+    monkeypatch.setenv("C", "untouched")
+
+    assert watcher.check().added == {"A": "1", "B": "2"}
+    assert os.environ["A"] == "1"
+
+    with patch.object(EncryptedEnvLoader, "load") as load:
+        assert watcher.check() is None
+        load.assert_not_called()
+
+    # Same plaintext sealed again: decrypted, but nothing to report
+    write_env("A=1\nB=2\n")
+    assert watcher.check() is None
+
+    monkeypatch.setenv("A", "set-by-app")
+    write_env("B=3\nC=4\n")
+    diff = watcher.check()
+    assert diff == EnvDiff(added={"C": "4"}, changed={"B": "3"}, removed={"A"})
+    assert "A" not in os.environ
+    assert os.environ["B"] == "3"
+    assert os.environ["C"] == "4"
+    assert watcher.values == {"B": "3", "C": "4"}
+    assert len(changes) == 2
+
+
+@pytest.mark.parametrize("use_inotify", [False, None])
+def test_watcher_thread_debounces_writes(write_env, key_file, use_inotify):
+    """
+    Test that a burst of writes produces one reload, with inotify and with
+    stat polling.
+    """
+    path = write_env("VERSION=0\n")
+    changes = []
+    watcher = EnvFileWatcher(
+        path,
+        key_file=key_file,
+        debounce=0.3,
+        poll_interval=0.05,
+        use_inotify=use_inotify,
+    )
+    watcher.add_callback(lambda diff, w: changes.append(diff))
+    with watcher:
+        changes.clear()
+        for version in range(1, 4):
+            write_env(f"VERSION={version}\n")
+            time.sleep(0.05)
+        wait_for(lambda: changes)
+        time.sleep(0.4)
+    assert len(changes) == 1
+    assert changes[0].changed == {"VERSION": "3"}
+    assert watcher.values == {"VERSION": "3"}
+
+
+def test_watcher_keeps_values_on_error(write_env, key_file):
+    """
+    Test that a file that fails to decrypt is reported and the previous
+    values stay in place.
+    """
+    path = write_env("A=1\n")
+    errors = []
+    watcher = EnvFileWatcher(
+        path,
+        key_file=key_file,
+        on_error=lambda e, w: errors.append(e),
+        debounce=0.05,
+        poll_interval=0.05,
+        use_inotify=False,
+    )
+    with watcher:
+        path.write_bytes(b"not an encrypted file")
+        wait_for(lambda: errors)
+    assert watcher.values == {"A": "1"}
@@ -0,0 +1,166 @@
+import os
+import time
+import threading
+from unittest.mock import patch
+import pytest
+from click.testing import CliRunner
+from envcloak.cli import main
+from envcloak.constants import KEY_SIZE
+from envcloak.encryptor import encrypt_file, encrypt_file_binary
+from envcloak.exceptions import FileEncryptionException
+from envcloak.workers import FileJob, run_file_jobs, summarize
+
+
+def _jobs(sizes):
+    return [FileJob(f"f{i}", f"f{i}.enc", size) for i, size in enumerate(sizes)]
+
+
+def test_run_file_jobs_largest_first():
+    """
+    Test that jobs are started largest first (observable with one worker).
+    """
+    started = []
+    run_file_jobs(_jobs([5, 50, 1, 20]), lambda job: started.append(job.size), 1)
+    assert started == [50, 20, 5, 1]
+
+
+def test_run_file_jobs_collects_failures():
+    """
+    Test that a failing job does not stop the batch and results are sorted by path.
+    """
+    completed = []
+
+    def work(job):
+        if job.source == "f1":
+            raise ValueError("boom")
+
+    results = run_file_jobs(_jobs([1, 2, 3]), work, 3, completed.append)
+    assert [result.job.source for result in results] == ["f0", "f1", "f2"]
+    assert len(completed) == 3
+    assert isinstance(results[1].error, ValueError)
+    assert results[0].error is None and results[2].error is None
+
+    summary = summarize(results, "Encrypted")
+    assert summary.splitlines() == [
+        "Encrypted 2 of 3 file(s).",
+        "1 file(s) failed:",
+        "  f1: boom",
+    ]
+
+
+def test_run_file_jobs_runs_in_parallel():
+    """
+    Test that several workers run jobs concurrently.
+    """
+    barrier = threading.Barrier(3, timeout=5)
+    results = run_file_jobs(_jobs([1, 1, 1]), lambda job: barrier.wait(), 3)
+    assert all(result.error is None for result in results)
+
+
+def test_run_file_jobs_byte_budget():
+    """
+    Test that running jobs never exceed the byte budget, except a single oversized job.
+    """
+    lock = threading.Lock()
+    state = {"in_flight": 0, "peak": 0, "alone": []}
+
+    def work(job):
+        with lock:
+            state["in_flight"] += job.size
+            state["peak"] = max(state["peak"], state["in_flight"])
+            if job.size > 100:
+                state["alone"].append(state["in_flight"] == job.size)
+        time.sleep(0.01)
+        with lock:
+            state["in_flight"] -= job.size
+
+    results = run_file_jobs(_jobs([60, 50, 40, 30, 20, 150, 10]), work, 4, None, 100)
+    assert len(results) == 7
+    assert state["alone"] == [True]
+    assert state["peak"] <= 150
+
+
+@pytest.mark.parametrize("jobs", ["1", "4"])
+def test_cli_encrypt_directory_jobs(tmp_path, jobs):
+    """
+    Test `encrypt --directory --jobs` with one failing file.
+    """
+    source = tmp_path / "configs"
+    source.mkdir()
+    for i in range(6):
+        (source / f"app{i}.env").write_text(f"KEY{i}=" + "x" * i * 100)
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(os.urandom(KEY_SIZE))
+    output = tmp_path / "encrypted"
+
+    def flaky_encrypt(input_path, output_path, key):
+        if input_path.endswith("app3.env"):
+            raise FileEncryptionException(details="disk on fire")
+        encrypt_file(input_path, output_path, key)
+
+    with patch("envcloak.commands.encrypt.encrypt_file", side_effect=flaky_encrypt):
+        result = CliRunner().invoke(
+            main,
+            [
+                "encrypt",
+                "--directory",
+                str(source),
+                "--output",
+                str(output),
+                "--key-file",
+                str(key_file),
+                "--jobs",
+                jobs,
+            ],
+        )
+
+    assert result.exit_code == 1
+    assert result.output.count(" encrypted -> ") == 5
+    assert "Encrypted 5 of 6 file(s).\n1 file(s) failed:" in result.output
+    assert result.output.rstrip().endswith("disk on fire")
+    assert sorted(p.name for p in output.iterdir()) == [
+        f"app{i}.env.enc" for i in range(6) if i != 3
+    ]
+
+
+def test_cli_decrypt_directory_jobs(tmp_path):
+    """
+    Test `decrypt --directory --jobs` continues past a corrupted file.
+    """
+    key = os.urandom(KEY_SIZE)
+    key_file = tmp_path / "mykey.key"
+    key_file.write_bytes(key)
+    plain = tmp_path / "plain"
+    plain.mkdir()
+    source = tmp_path / "encrypted"
+    source.mkdir()
+    for i in range(5):
+        (plain / f"app{i}.env").write_text(f"KEY{i}=value{i}\n")
+        encrypt_file_binary(plain / f"app{i}.env", source / f"app{i}.env.enc", key)
+    (source / "app2.env.enc").write_bytes(b"corrupted")
+    output = tmp_path / "decrypted"
+
+    result = CliRunner().invoke(
+        main,
+        [
+            "decrypt",
+            "--directory",
+            str(source),
+            "--output",
+            str(output),
+            "--key-file",
+            str(key_file),
+            "--jobs",
+            "3",
+            "--max-in-flight-mb",
+            "1",
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert result.output.count(" decrypted -> ") == 4
+    assert "Decrypted 4 of 5 file(s)." in result.output
+    assert "app2.env.enc:" in result.output
+    for i in (0, 1, 3, 4):
+        assert (output / f"app{i}.env").read_text() == f"KEY{i}=value{i}\n"
+    assert not (output / "app2.env").exists()